@@ -0,0 +1,54 @@
+"""Shared Python client for the MCP servers hosted by ToolShed"""
+
+import importlib
+
+# Public names are resolved on first access so that `import toolshed_mcp`
+# (and the CLI) do not pay for httpx and every submodule up front.
+_EXPORTS = {
+    "AdaptiveLimit": "limiter",
+    "BatchReport": "batch",
+    "BatchRunner": "batch",
+    "CallScheduler": "scheduler",
+    "DiscoveryCache": "discovery",
+    "DiscoveryError": "discovery",
+    "FileText": "stream",
+    "FleetClient": "fleet",
+    "HashRing": "fleet",
+    "HealthMonitor": "health",
+    "IncrementalScanner": "scan",
+    "ListenEvent": "listen",
+    "Listener": "listen",
+    "MCPError": "session",
+    "MCPSession": "session",
+    "NotReady": "readiness",
+    "PRIORITIES": "scheduler",
+    "Profiler": "profiling",
+    "ReadyReport": "readiness",
+    "ResourceCache": "cache",
+    "ResultCache": "cache",
+    "ScanError": "scan",
+    "ScanIndex": "scan",
+    "ScanReport": "scan",
+    "ServerHealth": "health",
+    "ShardedScanner": "scan",
+    "SyncSession": "sync",
+    "ToolIndex": "search",
+    "ValidationError": "schema",
+    "ValidatorCache": "schema",
+    "wait_ready": "readiness",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
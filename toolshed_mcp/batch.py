@@ -0,0 +1,236 @@
+"""
+Resumable JSONL batch calls
+
+Input is one JSON object per line: {"server": ..., "tool": ...,
+"arguments": {...}}. Results are appended to an output JSONL file in
+completion order, each tagged with its 1-based input line number. The
+output file doubles as the checkpoint: on restart, lines it already
+holds a record for are skipped, so a crashed run picks up where it
+stopped without repeating finished calls.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+
+from .discovery import DiscoveryCache
+from .log import event, get_logger
+from .scheduler import CallScheduler
+from .schema import ValidationError
+from .session import MCPError
+
+log = get_logger("batch")
+
+
+class BatchReport:
+    """Counts for one run of a batch"""
+
+    def __init__(self):
+        self.total = 0
+        self.skipped = 0
+        self.ok = 0
+        self.errors = 0
+        self.elapsed = 0.0
+
+    def summary(self):
+        return {
+            "lines": self.total,
+            "skipped": self.skipped,
+            "ok": self.ok,
+            "errors": self.errors,
+            "elapsed_s": round(self.elapsed, 3),
+            "calls_per_second": round((self.ok + self.errors) / self.elapsed, 2) if self.elapsed else 0.0,
+        }
+
+
+def read_checkpoint(output_path, retry_errors=False):
+    """
+    Line numbers already finished according to an output file
+
+    A record torn by a crash mid-write is cut off so appending can resume
+    cleanly. With retry_errors, lines whose latest record is an error are
+    not counted as finished.
+    """
+    done = {}
+    if not os.path.exists(output_path):
+        return set()
+    with open(output_path, "rb+") as f:
+        # Line by line: the results can be far larger than memory
+        end = 0
+        for raw in f:
+            if not raw.endswith(b"\n"):
+                break
+            end += len(raw)
+            try:
+                record = json.loads(raw)
+            except ValueError:
+                continue
+            if isinstance(record, dict) and "line" in record:
+                done[record["line"]] = "error" not in record
+        if end < os.fstat(f.fileno()).st_size:
+            f.truncate(end)
+    return {line for line, ok in done.items() if ok or not retry_errors}
+
+
+def _error_record(e):
+    if isinstance(e, MCPError):
+        return {"type": "MCPError", "code": e.code, "message": e.message, "data": e.data}
+    if isinstance(e, ValidationError):
+        return {"type": "ValidationError", "message": str(e), "errors": [list(error) for error in e.errors]}
+    return {"type": type(e).__name__, "message": str(e)}
+
+
+class BatchRunner:
+    """
+    Run a JSONL file of tool calls with bounded concurrency per server
+
+    Calls to one server share a single session and go through a
+    CallScheduler at 'batch' priority, so no server sees more than its
+    limit in flight. A failed connect is retried by the next line, and a
+    session whose stream dropped is replaced. Input is read lazily and at most max_pending calls
+    are outstanding, so files far larger than memory stream through.
+
+    Args:
+        output_path: JSONL file results are appended to; also the checkpoint
+        concurrency: In-flight limit per server
+        server_limits: Per-server overrides of concurrency
+        default_server: Server for lines that do not name one
+        timeout: Per-call timeout in seconds
+        retry_errors: Re-run lines whose previous attempt ended in an error
+        cache: Optional ResultCache attached to every session
+        discovery: DiscoveryCache used to connect (default: the user cache)
+        max_pending: Most calls read ahead of completion at once
+        validate: Fetch each server's tool catalog and reject lines whose
+            arguments fail the tool's inputSchema without calling the server
+        adaptive: Adapt each server's limit to its latency and 429/503
+            answers, up to concurrency (see CallScheduler)
+    """
+
+    def __init__(self, output_path, concurrency=8, server_limits=None, default_server=None, timeout=30.0,
+                 retry_errors=False, cache=None, discovery=None, max_pending=1000, validate=True, adaptive=False):
+        self.output_path = output_path
+        self.default_server = default_server
+        self.timeout = timeout
+        self.retry_errors = retry_errors
+        self.cache = cache
+        self.discovery = discovery or DiscoveryCache()
+        self.max_pending = max_pending
+        self.validate = validate
+        self.scheduler = CallScheduler(max_concurrency=concurrency, server_limits=server_limits,
+                                       adaptive=adaptive)
+        self._sessions = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    async def _session(self, server):
+        # One connect per server even when many lines arrive at once
+        task = self._sessions.get(server)
+        stale = None
+        if task is not None and task.done():
+            if task.cancelled() or task.exception() is not None:
+                # The lines waiting on a failed connect fail with it; later lines try again
+                task = None
+            elif not task.result().connected:
+                # The stream dropped (e.g. the Fargate task restarted); reconnect
+                event(log, logging.WARNING, "batch reconnect", server=server)
+                stale = task.result()
+                task = None
+        if task is None:
+            task = asyncio.ensure_future(self._connect(server))
+            self._sessions[server] = task
+        if stale is not None:
+            await stale.close()
+        return await task
+
+    async def _connect(self, server):
+        session = await self.discovery.connect(server, timeout=self.timeout, validate=self.validate)
+        session.cache = self.cache
+        if self.validate:
+            await session.list_tools()
+        return session
+
+    async def _call(self, server, tool, arguments):
+        async def call():
+            # Looked up once the slot is granted, so queued calls pick up a reconnected session
+            session = await self._session(server)
+            return await session.call_tool(tool, arguments)
+
+        return await self.scheduler.submit(server, call, priority="batch")
+
+    async def _run_line(self, number, request, out, report):
+        record = {"line": number}
+        started = time.monotonic()
+        try:
+            if isinstance(request, ValueError):
+                raise request
+            if not isinstance(request, dict):
+                raise ValueError("Line is not a JSON object")
+            server = (request.get("server") or self.default_server or "").rstrip("/")
+            tool = request.get("tool")
+            record.update(server=server, tool=tool)
+            if not server or not tool:
+                raise ValueError("Line needs a tool and a server (or a default server)")
+            record["result"] = await self._call(server, tool, request.get("arguments") or {})
+            report.ok += 1
+        except Exception as e:
+            record["error"] = _error_record(e)
+            report.errors += 1
+            event(log, logging.INFO, "batch line failed", line=number, error=record["error"]["message"])
+        record["ms"] = round((time.monotonic() - started) * 1000, 3)
+        out.write(json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str) + "\n")
+        out.flush()
+
+    async def run(self, input_path):
+        """Run every unfinished line of input_path and return a BatchReport"""
+        report = BatchReport()
+        done = read_checkpoint(self.output_path, self.retry_errors)
+        if done:
+            event(log, logging.INFO, "batch resumed", output=self.output_path, finished=len(done))
+        os.makedirs(os.path.dirname(os.path.abspath(self.output_path)), exist_ok=True)
+        pending = asyncio.Semaphore(self.max_pending)
+        tasks = set()
+        started = time.monotonic()
+
+        def finished(task):
+            tasks.discard(task)
+            pending.release()
+
+        with open(self.output_path, "a", encoding="utf-8") as out:
+            try:
+                with open(input_path, "r", encoding="utf-8") as f:
+                    for number, raw in enumerate(f, 1):
+                        if not raw.strip():
+                            continue
+                        report.total += 1
+                        if number in done:
+                            report.skipped += 1
+                            continue
+                        try:
+                            request = json.loads(raw)
+                        except ValueError as e:
+                            request = e
+                        await pending.acquire()
+                        task = asyncio.create_task(self._run_line(number, request, out, report))
+                        tasks.add(task)
+                        task.add_done_callback(finished)
+                if tasks:
+                    await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+        report.elapsed = time.monotonic() - started
+        return report
+
+    async def close(self):
+        for task in self._sessions.values():
+            if task.done() and not task.cancelled() and task.exception() is None:
+                await task.result().close()
+            else:
+                task.cancel()
+        self._sessions.clear()
@@ -0,0 +1,246 @@
+import collections
+import fnmatch
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = os.path.expanduser("~/.cache/toolshed-mcp/results.db")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+DEFAULT_RESOURCE_BYTES = 64 * 1024 * 1024
+DEFAULT_RESOURCE_TTL = 60.0
+
+
+def canonical_json(value):
+    """Serialize a value so equal arguments always produce the same bytes"""
+    return json.dumps(value, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+
+
+class ResultCache:
+    """
+    Disk-backed, size-capped LRU cache for deterministic tool call results
+
+    Entries are keyed by server identity + tool name + a hash of the
+    canonicalized arguments. Only tools matching the allow-list are cached.
+    Safe to share across threads (a SyncSession uses it on its loop thread).
+
+    Args:
+        tools: Tool names or glob patterns (e.g. 'semgrep_*') that may be cached
+        path: SQLite file holding the entries
+        max_bytes: Total size of stored results before LRU eviction kicks in
+    """
+
+    def __init__(self, tools, path=DEFAULT_CACHE_PATH, max_bytes=DEFAULT_MAX_BYTES):
+        self.tools = list(tools)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        # Opened here but used from whichever thread runs the session; the lock serializes access
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            " key TEXT PRIMARY KEY, tool TEXT, size INTEGER,"
+            " accessed REAL, value BLOB)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+        self._db.commit()
+        self._size = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def allows(self, tool):
+        """Whether results of this tool may be cached"""
+        return any(fnmatch.fnmatchcase(tool, pattern) for pattern in self.tools)
+
+    @staticmethod
+    def key(server, tool, arguments):
+        """Content address of a tools/call request"""
+        digest = hashlib.sha256()
+        digest.update(f"{server}\0{tool}\0".encode())
+        digest.update(canonical_json(arguments).encode())
+        return digest.hexdigest()
+
+    def get(self, key):
+        """Return the cached result for key, or None"""
+        with self._lock:
+            row = self._db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._db.commit()
+        return json.loads(row[0])
+
+    def put(self, key, tool, result):
+        """Store a result, evicting least recently used entries past the cap"""
+        value = json.dumps(result, separators=(",", ":")).encode()
+        if len(value) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._db.execute("SELECT size FROM results WHERE key = ?", (key,)).fetchone()
+            if old is not None:
+                self._size -= old[0]
+            self._db.execute(
+                "INSERT OR REPLACE INTO results (key, tool, size, accessed, value) VALUES (?, ?, ?, ?, ?)",
+                (key, tool, len(value), time.time(), value),
+            )
+            self._size += len(value)
+            self._evict()
+            self._db.commit()
+
+    def _evict(self):
+        while self._size > self.max_bytes:
+            row = self._db.execute(
+                "SELECT key, size FROM results ORDER BY accessed LIMIT 1"
+            ).fetchone()
+            if row is None:
+                break
+            self._db.execute("DELETE FROM results WHERE key = ?", (row[0],))
+            self._size -= row[1]
+            self.evictions += 1
+
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._db.execute("DELETE FROM results")
+            self._db.commit()
+            self._size = 0
+
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self):
+        """Hit-rate and size statistics for reporting"""
+        with self._lock:
+            entries = self._db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 4),
+            "evictions": self.evictions,
+            "entries": entries,
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def resource_size(result):
+    """Approximate bytes held by a resources/read result"""
+    size = 0
+    for item in result.get("contents", []):
+        size += len(item.get("text") or "") + len(item.get("blob") or "") + len(item.get("uri") or "")
+    return size
+
+
+class ResourceCache:
+    """
+    In-memory, byte-budgeted LRU cache of resources/read results
+
+    Entries are keyed by server URL and URI. Resources the session is
+    subscribed to stay valid until the server reports an update (or the
+    stream they were subscribed on closes); others expire after `ttl`.
+    Invalidations bump a generation counter, so a read that raced with
+    one is not stored (see generation()).
+
+    Args:
+        max_bytes: Total size of cached contents before LRU eviction
+        ttl: Seconds an entry without a subscription stays fresh
+    """
+
+    def __init__(self, max_bytes=DEFAULT_RESOURCE_BYTES, ttl=DEFAULT_RESOURCE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._generations = {}          # (server, uri) -> invalidations so far
+        self._server_generations = {}   # server -> invalidate_subscribed() calls so far
+
+    def get(self, server, uri):
+        """Return the cached result, or None when missing or expired"""
+        key = (server, uri)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        result, size, expires = entry
+        if expires is not None and expires < time.monotonic():
+            self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return result
+
+    def generation(self, server, uri):
+        """Token to take before a read and pass to put(); it changes when the entry is invalidated"""
+        return self._server_generations.get(server, 0), self._generations.get((server, uri), 0)
+
+    def put(self, server, uri, result, subscribed=False, generation=None):
+        if generation is not None and generation != self.generation(server, uri):
+            # Invalidated while the read was in flight; the result may already be stale
+            return
+        size = resource_size(result)
+        if size > self.max_bytes:
+            return
+        key = (server, uri)
+        if key in self._entries:
+            self._drop(key)
+        expires = None if subscribed else time.monotonic() + self.ttl
+        self._entries[key] = (result, size, expires)
+        self._size += size
+        while self._size > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _drop(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+    def invalidate(self, server, uri):
+        """Forget one resource, e.g. on notifications/resources/updated"""
+        key = (server, uri)
+        self._generations[key] = self._generations.get(key, 0) + 1
+        if key in self._entries:
+            self._drop(key)
+            self.invalidations += 1
+
+    def invalidate_subscribed(self, server):
+        """Forget a server's subscription-backed entries once updates can no longer arrive"""
+        self._server_generations[server] = self._server_generations.get(server, 0) + 1
+        for key in [key for key, entry in self._entries.items() if key[0] == server and entry[2] is None]:
+            self._drop(key)
+            self.invalidations += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._size = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "entries": len(self._entries),
+            "bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
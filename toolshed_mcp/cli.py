@@ -0,0 +1,993 @@
+"""
+toolshed-mcp command line: probe, wait-ready, list-tools, index, search, call, batch, scan, listen, bench,
+replay
+
+Only argparse/json/sys are imported at module level. Each subcommand
+imports what it needs when it runs, so `probe` never loads httpx and a CI
+job calling `call` thousands of times does not pay for the scanner, the
+result cache or the benchmark code. `bench startup` checks this.
+"""
+import argparse
+import json
+import sys
+
+from .log import LOG_FORMATS, OUTPUT_MODES, Output, configure
+
+# Probe paths used by the one-off scripts (mcp_sse_client.py, mcp_client_test.py)
+PROBE_PATHS = ("/", "/sse", "/messages/", "/tools", "/v1", "/api")
+
+# Command lines `bench startup` runs for real: {url} is a local port that refuses
+# connections and {dir} a scratch directory, so each takes its usual import path and fails fast
+STARTUP_COMMANDS = {
+    "probe": ["probe", "{url}", "--timeout", "1"],
+    "wait-ready": ["wait-ready", "{url}", "--timeout", "0.5", "--max-delay", "0.1"],
+    "list-tools": ["list-tools", "{url}", "--timeout", "1"],
+    "index": ["index", "{url}", "--timeout", "1", "--index", "{dir}/index.json.gz"],
+    "search": ["search", "scan", "--index", "{dir}/index.json.gz"],
+    "call": ["call", "{url}", "echo", "{{}}", "--timeout", "1"],
+    "batch": ["batch", "{dir}/calls.jsonl", "-o", "{dir}/results.jsonl", "--server", "{url}", "--timeout", "1"],
+    "scan": ["scan", "{dir}/src", "--server", "{url}", "--index", "{dir}/scan-index.json", "--timeout", "1"],
+    "listen": ["listen", "{url}", "--timeout", "1"],
+    "bench calls": ["bench", "calls", "{url}", "echo", "--timeout", "1", "-n", "1"],
+    "bench threads": ["bench", "threads", "{url}", "echo", "--timeout", "1", "-n", "1", "-t", "1"],
+    "bench micro": ["bench", "micro", "--list"],
+    "replay": ["replay", "{dir}/recording.jsonl", "--port", "0"],
+}
+
+# Top-level modules a command must not load
+STARTUP_FORBIDDEN = {
+    "probe": ["httpx"],
+    "search": ["httpx"],
+    "call": ["sqlite3"],  # without --cache
+}
+
+# Errors a command ends with when the server is unreachable or refuses the call,
+# as (module, class); only modules already loaded are consulted, so catching imports nothing
+EXPECTED_ERRORS = (
+    ("toolshed_mcp.discovery", "DiscoveryError"),
+    ("toolshed_mcp.session", "MCPError"),
+    ("toolshed_mcp.schema", "ValidationError"),
+    ("toolshed_mcp.scan", "ScanError"),
+    ("toolshed_mcp.readiness", "NotReady"),
+    ("httpx", "HTTPError"),
+    ("asyncio", "TimeoutError"),
+    ("builtins", "TimeoutError"),
+    ("builtins", "ConnectionError"),
+)
+
+DEFAULT_STARTUP_BUDGET_MS = 250.0
+
+
+def _connect(args):
+    from .discovery import DiscoveryCache
+
+    return DiscoveryCache().connect(args.url, image=args.image, timeout=args.timeout, record=args.record)
+
+
+def _load_arguments(args):
+    if args.args_file:
+        with open(args.args_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    return json.loads(args.arguments) if args.arguments else {}
+
+
+def cmd_probe(args):
+    """Check which paths a server answers on, using only the standard library"""
+    import time
+    from http.client import HTTPConnection, HTTPSConnection
+    from urllib.parse import urlparse
+
+    parsed = urlparse(args.url)
+    connection_class = HTTPSConnection if parsed.scheme == "https" else HTTPConnection
+    base = args.url.rstrip("/")
+    reachable = False
+    for path in args.paths or PROBE_PATHS:
+        connection = connection_class(parsed.hostname, parsed.port, timeout=args.timeout)
+        headers = {"Accept": "text/event-stream"} if path.endswith("sse") else {}
+        started = time.perf_counter()
+        try:
+            # Only the status line and headers are read, so /sse does not block
+            connection.request("GET", path, headers=headers)
+            response = connection.getresponse()
+            elapsed = (time.perf_counter() - started) * 1000
+            content_type = response.getheader("Content-Type", "")
+            if args.out.pretty:
+                args.out.line(f"{base}{path}: {response.status} {response.reason} ({elapsed:.1f} ms) {content_type}")
+            else:
+                args.out.emit({
+                    "url": f"{base}{path}", "status": response.status, "reason": response.reason,
+                    "ms": round(elapsed, 1), "content_type": content_type,
+                })
+            reachable = reachable or response.status < 500
+        except OSError as e:
+            if args.out.pretty:
+                args.out.line(f"{base}{path}: Error - {e}")
+            else:
+                args.out.emit({"url": f"{base}{path}", "error": str(e)})
+        finally:
+            connection.close()
+    return 0 if reachable else 1
+
+
+def cmd_wait_ready(args):
+    """Wait until a new server answers initialize and tools/list"""
+    import asyncio
+
+    from .readiness import NotReady, append_metric, wait_ready
+
+    async def run():
+        report = await wait_ready(args.url, timeout=args.timeout, image=args.image, since=args.since,
+                                  max_delay=args.max_delay)
+        await report.session.close()
+        return report
+
+    try:
+        report = asyncio.run(run())
+    except NotReady as e:
+        args.out.emit({"ready": False, "url": args.url, "image": args.image, "error": str(e)})
+        return 1
+    if args.metrics_file:
+        append_metric(args.metrics_file, report)
+    args.out.emit(dict(report.summary(), ready=True))
+    return 0
+
+
+def cmd_list_tools(args):
+    """Print tools as their pages arrive, stopping early with --match/--limit"""
+    import asyncio
+    import fnmatch
+
+    def show(tool):
+        if args.out.pretty:
+            args.out.line(f"- {tool['name']}: {tool.get('description', '')}")
+        else:
+            args.out.emit(tool)
+
+    async def run():
+        session = await _connect(args)
+        tools = session.iter_tools()
+        shown = 0
+        try:
+            async for tool in tools:
+                if args.match and not fnmatch.fnmatchcase(tool.get("name", ""), args.match):
+                    continue
+                show(tool)
+                shown += 1
+                if args.limit and shown >= args.limit:
+                    break
+        finally:
+            await tools.aclose()
+            await session.close()
+
+    asyncio.run(run())
+    return 0
+
+
+def cmd_index(args):
+    """Add the complete catalogs of servers to the local tool index"""
+    import asyncio
+
+    from .discovery import DiscoveryCache
+    from .search import ToolIndex
+
+    index = ToolIndex(args.index) if args.index else ToolIndex()
+
+    async def run():
+        discovery = DiscoveryCache()
+        failed = False
+        for url in args.urls:
+            try:
+                session = await discovery.connect(url, image=args.image, timeout=args.timeout, record=args.record)
+                try:
+                    tools = await session.list_tools()
+                finally:
+                    await session.close()
+            except Exception as e:
+                failed = True
+                args.out.emit({"server": url, "error": str(e) or type(e).__name__})
+                continue
+            args.out.emit(dict(index.update(url, tools), server=url))
+        return failed
+
+    failed = asyncio.run(run())
+    if index.dirty:
+        index.save()
+    return 1 if failed else 0
+
+
+def cmd_search(args):
+    """Search the local tool index; never touches the network"""
+    from .search import ToolIndex
+
+    index = ToolIndex(args.index) if args.index else ToolIndex()
+    hits = index.search(" ".join(args.query), limit=args.limit, server=args.server)
+    for hit in hits:
+        if args.out.pretty:
+            args.out.line(f"{hit['score']:6.2f}  {hit['name']}  ({hit['server']})  {hit['description'][:80]}")
+        else:
+            args.out.emit(hit)
+    return 0 if hits else 1
+
+
+def cmd_call(args):
+    import asyncio
+
+    arguments = _load_arguments(args)
+    cache = None
+    if args.cache:
+        from .cache import ResultCache
+
+        cache = ResultCache(args.cache)
+
+    async def run():
+        session = await _connect(args)
+        session.cache = cache
+        try:
+            return await session.call_tool(args.tool, arguments)
+        finally:
+            await session.close()
+
+    result = asyncio.run(run())
+    args.out.emit(result)
+    return 1 if result.get("isError") else 0
+
+
+def cmd_batch(args):
+    """Run a JSONL file of calls, resuming from the output file if it exists"""
+    import asyncio
+
+    from .batch import BatchRunner
+
+    cache = None
+    if args.cache:
+        from .cache import ResultCache
+
+        cache = ResultCache(args.cache)
+
+    async def run():
+        async with BatchRunner(args.output_file, concurrency=args.concurrency, default_server=args.server,
+                               timeout=args.timeout, retry_errors=args.retry_errors, cache=cache,
+                               adaptive=args.adaptive) as runner:
+            report = await runner.run(args.input)
+            return report, runner.scheduler.stats()["servers"]
+
+    report, servers = asyncio.run(run())
+    summary = report.summary()
+    if args.adaptive:
+        summary["limits"] = {server: stats["limit"] for server, stats in servers.items()}
+    args.out.emit({"summary": summary})
+    return 1 if report.errors else 0
+
+
+def cmd_scan(args):
+    import asyncio
+
+    from .scan import IncrementalScanner, ShardedScanner
+
+    extensions = set(args.extensions.split(",")) if args.extensions else None
+
+    async def run():
+        if len(args.server) > 1 or args.sessions > 1:
+            backend = ShardedScanner(args.server, sessions_per_server=args.sessions,
+                                     config=args.config, timeout=args.timeout, record=args.record)
+            await backend.connect()
+        else:
+            args.url = args.server[0]
+            backend = await _connect(args)
+        try:
+            scanner = IncrementalScanner(backend, args.index, config=args.config)
+            return await scanner.scan_directory(args.path, extensions)
+        finally:
+            await backend.close()
+
+    report = asyncio.run(run())
+    for finding in report.findings:
+        if args.out.pretty:
+            line = finding.get("start", {}).get("line", 0)
+            message = finding.get("extra", {}).get("message", "")
+            args.out.line(f"{finding.get('path')}:{line} {finding.get('check_id')} {message}")
+        else:
+            args.out.emit(finding)
+    for error in report.errors:
+        if args.out.pretty:
+            args.out.line(f"{error.get('path') or '<scan>'}: {error.get('type', 'error')} {error.get('message', '')}")
+        else:
+            args.out.emit({"error": error})
+    args.out.emit({"summary": report.summary()})
+    return 1 if args.error and report.findings else 0
+
+
+def cmd_listen(args):
+    """Print every event on a server's stream until interrupted"""
+    import asyncio
+
+    from .listen import Listener
+
+    listener = Listener(args.url, sse_path=args.sse_path, history=args.history, timeout=args.timeout)
+
+    @listener.on_event
+    def show(record):
+        if args.out.pretty:
+            name = record.method or (f"response {record.id}" if record.id is not None else record.kind)
+            args.out.line(f"#{record.seq} {name} ({record.size} bytes)")
+        else:
+            args.out.emit(record.as_dict())
+        args.out.stream.flush()
+
+    try:
+        asyncio.run(listener.run())
+    except KeyboardInterrupt:
+        pass
+    args.out.emit({"summary": listener.stats()})
+    return 0
+
+
+def cmd_bench(args):
+    if args.bench_command == "startup":
+        return _bench_startup(args)
+    if args.bench_command == "listen":
+        return _bench_listen(args)
+    if args.bench_command == "validate":
+        return _bench_validate(args)
+    if args.bench_command == "upload":
+        return _bench_upload(args)
+    if args.bench_command == "threads":
+        return _bench_threads(args)
+    if args.bench_command == "search":
+        return _bench_search(args)
+    if args.bench_command == "micro":
+        return _bench_micro(args)
+    if args.bench_command == "compare":
+        return _bench_compare(args)
+    if args.bench_command == "ready":
+        from .readiness import summarize_metrics
+
+        args.out.emit(summarize_metrics(args.metrics_file))
+        return 0
+    return _bench_calls(args)
+
+
+def _bench_calls(args):
+    """Latency and throughput of repeated calls over one session"""
+    import asyncio
+    import time
+
+    from .metrics import LatencyWindow
+
+    arguments = _load_arguments(args)
+    latencies = LatencyWindow()
+
+    async def run():
+        session = await _connect(args)
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def one():
+            async with semaphore:
+                started = time.perf_counter()
+                await session.call_tool(args.tool, arguments, use_cache=False)
+                latencies.add(time.perf_counter() - started)
+
+        try:
+            started = time.perf_counter()
+            await asyncio.gather(*(one() for _ in range(args.count)))
+            return time.perf_counter() - started, session.transfer.summary()
+        finally:
+            await session.close()
+
+    elapsed, transfer = asyncio.run(run())
+    summary = latencies.summary()
+    summary["calls_per_second"] = round(args.count / elapsed, 2)
+    summary["transfer"] = transfer
+    args.out.emit(summary)
+    return 0
+
+
+def _bench_threads(args):
+    """Latency and throughput of a thread pool sharing one SyncSession"""
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+
+    from .discovery import DiscoveryCache
+    from .metrics import LatencyWindow
+    from .sync import SyncSession
+
+    arguments = _load_arguments(args)
+    latencies = LatencyWindow()
+
+    def one(_):
+        started = time.perf_counter()
+        session.call_tool(args.tool, arguments, use_cache=False)
+        latencies.add(time.perf_counter() - started)
+
+    with SyncSession(args.url, timeout=args.timeout, discovery=DiscoveryCache(), record=args.record) as session:
+        with ThreadPoolExecutor(args.threads) as pool:
+            started = time.perf_counter()
+            list(pool.map(one, range(args.count)))
+            elapsed = time.perf_counter() - started
+    summary = latencies.summary()
+    summary["threads"] = args.threads
+    summary["calls_per_second"] = round(args.count / elapsed, 2)
+    args.out.emit(summary)
+    return 0
+
+
+def _bench_search(args):
+    """
+    Build, query, update and reload times of a tool index
+
+    Indexes --tools synthetic tools spread over servers of 100 tools,
+    then times a fixed mix of exact, prefix, multi-word and misspelled
+    queries.
+    """
+    import os
+    import random
+    import tempfile
+    import time
+
+    from .metrics import LatencyWindow
+    from .search import ToolIndex
+
+    rng = random.Random(0)
+    verbs = "get list create delete update search scan read write query fetch run analyze find sync export".split()
+    nouns = "file repo issue pull_request user project bucket table record message document secret finding".split()
+    words = ("source code security vulnerability database storage cloud retrieve metadata returns json results "
+             "filter pagination token account region cluster container deploy workflow pipeline").split()
+    properties = ["path", "owner", "repoName", "pageSize", "query", "bucketName", "userId", "filePath"]
+
+    def tool(i):
+        return {
+            "name": f"vendor{i // 100}_{rng.choice(verbs)}_{rng.choice(nouns)}_{i}",
+            "description": " ".join(rng.choices(words, k=12)),
+            "inputSchema": {"type": "object",
+                            "properties": {name: {"type": "string"} for name in rng.sample(properties, 3)}},
+        }
+
+    catalogs = {}
+    for i in range(args.tools):
+        catalogs.setdefault(f"http://10.0.{i // 25000}.{i // 100 % 250}:8000", []).append(tool(i))
+    queries = ["scan file", "bucket", "pullRequest", "vendor12", "vendor7 list", "vulnerability repo",
+               "lst files", "secrt", "commit branch security", "get_user"]
+
+    with tempfile.TemporaryDirectory() as directory:
+        index = ToolIndex(os.path.join(directory, "index.json.gz"))
+        started = time.perf_counter()
+        for server, tools in catalogs.items():
+            index.update(server, tools)
+        build = time.perf_counter() - started
+
+        latencies = LatencyWindow(args.count)
+        for i in range(args.count):
+            query = queries[i % len(queries)]
+            started = time.perf_counter()
+            index.search(query)
+            latencies.add(time.perf_counter() - started)
+
+        server, tools = next(iter(catalogs.items()))
+        changed = tools[1:] + [dict(tools[0], description="Plans terraform changes")]
+        started = time.perf_counter()
+        index.update(server, changed)
+        update = time.perf_counter() - started
+
+        started = time.perf_counter()
+        index.save()
+        save = time.perf_counter() - started
+        size = os.path.getsize(index.path)
+        started = time.perf_counter()
+        ToolIndex(index.path)
+        load = time.perf_counter() - started
+
+    summary = latencies.summary()
+    summary.update({
+        "tools": len(index),
+        "servers": len(catalogs),
+        "build_s": round(build, 2),
+        "update_ms": round(update * 1000, 2),
+        "save_s": round(save, 2),
+        "load_s": round(load, 2),
+        "index_kb": size // 1024,
+    })
+    args.out.emit(summary)
+    return 0
+
+
+def _bench_micro(args):
+    """Run the hot-path microbenchmarks and record the results under the current commit"""
+    from .microbench import BENCHMARKS, ResultStore, current_commit, run_key, run_suite
+
+    if args.list:
+        for name, (description, _) in BENCHMARKS.items():
+            if args.out.pretty:
+                args.out.line(f"{name:<30} {description}")
+            else:
+                args.out.emit({"benchmark": name, "description": description})
+        return 0
+    results = run_suite(args.filter, repeat=args.repeat, min_time=args.min_time)
+    for name, result in results.items():
+        if args.out.pretty:
+            throughput = f"{result['mb_per_s']:8.1f} MB/s" if result["mb_per_s"] is not None else ""
+            args.out.line(f"{name:<30} {result['ns_per_op']:14,.1f} ns/op  {throughput}")
+        else:
+            args.out.emit(dict(result, benchmark=name))
+    if args.no_save:
+        return 0
+    commit, dirty = current_commit()
+    if args.commit:
+        commit, dirty = args.commit, False
+    if commit is None:
+        args.out.emit({"error": "Not in a git checkout; pass --commit to record the results"})
+        return 1
+    key = run_key(commit, dirty)
+    store = ResultStore(args.results)
+    if args.filter and key in store.runs:
+        # A partial run updates the commit's results instead of replacing them
+        results = dict(store.runs[key]["results"], **results)
+    store.record(key, results, dirty=dirty)
+    store.save()
+    return 0
+
+
+def _bench_compare(args):
+    """Compare two recorded microbenchmark runs; non-zero exit on regressions"""
+    from .microbench import ResultStore, compare, current_commit, run_key
+
+    store = ResultStore(args.results)
+    if not store.runs:
+        args.out.emit({"error": f"No runs recorded in {args.results}; run 'bench micro' first"})
+        return 1
+    head = args.head
+    if head is None:
+        commit, dirty = current_commit()
+        head = run_key(commit, dirty) if commit else list(store.runs)[-1]
+    try:
+        head = store.resolve(head)
+        base = store.resolve(args.base) if args.base else store.previous(head)
+    except (KeyError, ValueError) as e:
+        args.out.emit({"error": e.args[0]})
+        return 1
+    environments = {key: {k: store.runs[key].get(k) for k in ("python", "implementation", "machine")}
+                    for key in (base, head)}
+    if environments[base] != environments[head]:
+        args.out.emit({"warning": "runs come from different environments", "environments": environments})
+    rows = compare(store.runs[base]["results"], store.runs[head]["results"], args.threshold)
+    regressed = [row for row in rows if row["status"] == "regressed"]
+    for row in rows:
+        if args.out.pretty:
+            change = f"{row['change']:+8.1%}" if row["change"] is not None else " " * 8
+            args.out.line(f"{row['benchmark']:<30} {change}  {row['status']}")
+        else:
+            args.out.emit(row)
+    args.out.emit({"summary": {"base": base, "head": head, "threshold": args.threshold,
+                               "regressed": len(regressed),
+                               "improved": sum(row["status"] == "improved" for row in rows)}})
+    return 1 if regressed else 0
+
+
+def _bench_startup(args):
+    """
+    Import-time budget check for every subcommand
+
+    Runs each of STARTUP_COMMANDS once under `python -X importtime`,
+    against a port that refuses connections, to learn which modules the
+    handler really imports beyond a bare interpreter. Importing exactly
+    those is then timed, uninstrumented, in fresh interpreters; the best
+    time minus a bare interpreter start is compared against the budget.
+    Exits non-zero when a command is over budget or loads a module listed
+    in STARTUP_FORBIDDEN (httpx for probe, sqlite3 for call without
+    --cache), so CI can run it as a test.
+    """
+    import os
+    import signal
+    import socket
+    import subprocess
+    import tempfile
+    import time
+
+    def imported(command, stop_after=None):
+        """Modules imported at top level, in order, and the top-level packages of every module loaded"""
+        process = subprocess.Popen([sys.executable, "-X", "importtime", *command],
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        try:
+            _, stderr = process.communicate(timeout=stop_after or 60)
+        except subprocess.TimeoutExpired:
+            # listen runs until interrupted; its imports are done by then
+            process.send_signal(signal.SIGINT)
+            _, stderr = process.communicate()
+        modules, packages = [], set()
+        for line in stderr.splitlines()[1:]:  # the first row is the header
+            fields = line.split("|")
+            if line.startswith("import time:") and len(fields) == 3:
+                packages.add(fields[2].strip().split(".")[0])
+                if fields[2][:2] != "  ":
+                    modules.append(fields[2].strip())
+        return modules, packages
+
+    def best_of(command):
+        best = None
+        for _ in range(args.runs):
+            started = time.perf_counter()
+            subprocess.run(command, check=True, capture_output=True)
+            elapsed = (time.perf_counter() - started) * 1000
+            best = elapsed if best is None else min(best, elapsed)
+        return best
+
+    # Modules that fail to import (optional dependencies) are listed too
+    importer = ("import importlib, sys\nfor name in sys.argv[1:]:\n"
+                "    try:\n        importlib.import_module(name)\n    except ImportError:\n        pass")
+    baseline = best_of([sys.executable, "-c", "pass"])
+    preloaded = set(imported(["-c", "pass"])[0])
+    args.out.line(f"{'interpreter':<14} {baseline:8.1f} ms")
+    # Bound but not listening: connections are refused immediately
+    refusing = socket.socket()
+    refusing.bind(("127.0.0.1", 0))
+    url = f"http://127.0.0.1:{refusing.getsockname()[1]}"
+    failed = False
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            os.mkdir(os.path.join(directory, "src"))
+            with open(os.path.join(directory, "src", "module.py"), "w", encoding="utf-8") as f:
+                f.write("print('hi')\n")
+            with open(os.path.join(directory, "calls.jsonl"), "w", encoding="utf-8") as f:
+                f.write('{"tool": "echo", "arguments": {}}\n')
+            for name, command in STARTUP_COMMANDS.items():
+                command = [part.format(url=url, dir=directory) for part in command]
+                stop_after = 1.0 if command[0] == "listen" else None
+                modules, loaded = imported(["-m", "toolshed_mcp", "--output", "ndjson", *command], stop_after)
+                modules = [module for module in modules if module not in preloaded]
+                overhead = best_of([sys.executable, "-c", importer, *modules]) - baseline
+                over = overhead > args.budget_ms
+                leaked = sorted(loaded.intersection(STARTUP_FORBIDDEN.get(name, ())))
+                failed = failed or over or bool(leaked)
+                status = "OVER BUDGET" if over else (f"LOADS {', '.join(leaked).upper()}" if leaked else "ok")
+                if args.out.pretty:
+                    args.out.line(f"{name:<14} {overhead:8.1f} ms  {status}")
+                else:
+                    args.out.emit({"command": name, "import_ms": round(overhead, 1), "status": status,
+                                   "modules": len(modules)})
+    finally:
+        refusing.close()
+    return 1 if failed else 0
+
+
+def _bench_listen(args):
+    """
+    Soak test of the listener's memory use
+
+    Feeds synthetic stream bytes, split at awkward chunk boundaries,
+    through a Listener in-process and samples RSS as it goes. Exits
+    non-zero if RSS grows by more than the allowance after warm-up.
+    """
+    import time
+
+    from .listen import Listener
+    from .metrics import rss_bytes
+
+    events = []
+    for i in range(64):
+        if i % 4 == 0:
+            events.append(f'data: {{"jsonrpc":"2.0","method":"notifications/progress",'
+                          f'"params":{{"progressToken":{i},"progress":{i},"total":64}}}}\r\n\r\n')
+        elif i % 4 == 1:
+            events.append(": ping - 2025-01-01 00:00:00\r\n\r\n")
+        else:
+            events.append(f'event: message\r\ndata: {{"jsonrpc":"2.0","id":{i},"result":{{"content":'
+                          f'[{{"type":"text","text":"{"x" * (i * 8)}"}}],"isError":false}}}}\r\n\r\n')
+    stream = "".join(events).encode()
+    chunks = [stream[i:i + 1500] for i in range(0, len(stream), 1500)]
+    per_round = sum(1 for e in events if "data:" in e)
+
+    listener = Listener("http://soak.invalid", history=args.history)
+    rounds = max(1, args.events // per_round)
+    warmup = max(1, rounds // 10)
+    samples = []
+    started = time.perf_counter()
+    for n in range(rounds):
+        for chunk in chunks:
+            listener.feed(chunk)
+        if n == warmup or n % max(1, rounds // 20) == 0 or n == rounds - 1:
+            samples.append((listener.decoder.seq, rss_bytes()))
+    elapsed = time.perf_counter() - started
+
+    baseline = next(rss for seq, rss in samples if seq >= warmup * per_round)
+    growth = max(rss for _, rss in samples) - baseline
+    failed = growth > args.max_growth_mb * 1024 * 1024
+    if args.out.pretty:
+        for seq, rss in samples:
+            args.out.line(f"{seq:>12} events  {rss / 1024 / 1024:8.1f} MB")
+    args.out.emit({
+        "events": listener.decoder.seq,
+        "events_per_second": round(listener.decoder.seq / elapsed),
+        "rss_baseline_mb": round(baseline / 1024 / 1024, 2),
+        "rss_growth_mb": round(growth / 1024 / 1024, 2),
+        "status": "RSS GREW" if failed else "ok",
+    })
+    return 1 if failed else 0
+
+
+def _bench_validate(args):
+    """
+    Cost of compiling schemas and validating one call's arguments
+
+    Uses the tools/list result in --tools-file (or a semgrep_scan-like
+    schema) and arguments from --args-file (or a generated scan request
+    of --files files).
+    """
+    import time
+
+    from .schema import compile_schema
+
+    if args.tools_file:
+        with open(args.tools_file, "r", encoding="utf-8") as f:
+            catalog = json.load(f)
+        tools = catalog.get("tools", catalog) if isinstance(catalog, dict) else catalog
+        tool = next(t for t in tools if t["name"] == args.tool)
+        schema = tool["inputSchema"]
+    else:
+        schema = {
+            "type": "object",
+            "properties": {
+                "code_files": {"type": "array", "items": {
+                    "type": "object",
+                    "properties": {"filename": {"type": "string"}, "content": {"type": "string"}},
+                    "required": ["filename", "content"],
+                }},
+                "config": {"anyOf": [{"type": "string"}, {"type": "null"}]},
+            },
+            "required": ["code_files"],
+        }
+    if args.args_file:
+        with open(args.args_file, "r", encoding="utf-8") as f:
+            arguments = json.load(f)
+    else:
+        arguments = {
+            "code_files": [{"filename": f"src/module_{i}.py", "content": "print('hi')\n" * 20}
+                           for i in range(args.files)],
+            "config": "auto",
+        }
+
+    def per_call(fn, *fn_args):
+        best = None
+        for _ in range(5):
+            started = time.perf_counter()
+            for _ in range(args.count):
+                fn(*fn_args)
+            elapsed = (time.perf_counter() - started) / args.count
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1e6
+
+    validate = compile_schema(schema)
+    errors = validate(arguments)
+    args.out.emit({
+        "compile_us": round(per_call(compile_schema, schema), 2),
+        "validate_us": round(per_call(validate, arguments), 2),
+        "json_encode_us": round(per_call(json.dumps, arguments), 2),
+        "valid": not errors,
+        "errors": errors,
+    })
+    return 0
+
+
+def _bench_upload(args):
+    """Peak RSS of uploading a code bundle, streamed versus built in memory (see uploadbench)"""
+    from .uploadbench import run_uploads
+
+    for record in run_uploads(int(size) for size in args.mb.split(",")):
+        if args.out.pretty:
+            args.out.line(f"{record['payload_mb']:>8.1f} MB  {record['mode']:<9} peak +{record['peak_rss_mb']:8.1f} MB"
+                          f"  ({record['seconds']:.2f} s)")
+        else:
+            args.out.emit(record)
+    return 0
+
+
+def cmd_replay(args):
+    """Serve a recording as a fake server until interrupted"""
+    import asyncio
+
+    from .replay import ReplayServer
+
+    speed = None if args.speed == "max" else float(args.speed)
+
+    async def run():
+        async with ReplayServer(args.recording, speed=speed, host=args.host, port=args.port) as server:
+            args.out.emit({"replaying": args.recording, "url": server.url, "speed": args.speed})
+            args.out.stream.flush()
+            await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="toolshed-mcp", description="Client for ToolShed-hosted MCP servers")
+    parser.add_argument("--output", choices=OUTPUT_MODES, default="auto",
+                        help="Result format: pretty for terminals, ndjson for machines (default: auto)")
+    parser.add_argument("--log-level", default="warning", help="debug, info, warning or error")
+    parser.add_argument("--log-format", choices=LOG_FORMATS, default="text")
+    parser.add_argument("--record", metavar="FILE", help="Append all HTTP traffic to a session recording")
+    parser.add_argument("--profile", metavar="DIR", help="Write profiling output for this run to DIR")
+    parser.add_argument("--profile-mode", default="cprofile",
+                        help="Comma-separated profile modes: cprofile, memory, sample (default: cprofile)")
+    commands = parser.add_subparsers(dest="command")
+
+    def add_server_options(command):
+        command.add_argument("url", help="Server base URL, e.g. http://34.226.219.58:8000")
+        command.add_argument("--image", help="Container image, used as part of the discovery cache key")
+        command.add_argument("--timeout", type=float, default=30.0)
+
+    def add_argument_options(command):
+        command.add_argument("arguments", nargs="?", help="Tool arguments as a JSON object")
+        command.add_argument("--args-file", help="Read tool arguments from a JSON file")
+
+    probe = commands.add_parser("probe", help="Check which HTTP paths a server answers on")
+    probe.add_argument("url")
+    probe.add_argument("--paths", nargs="+", help=f"Paths to try (default: {' '.join(PROBE_PATHS)})")
+    probe.add_argument("--timeout", type=float, default=5.0)
+    probe.set_defaults(handler=cmd_probe)
+
+    wait_ready = commands.add_parser("wait-ready", help="Wait until a new server serves tools/list")
+    wait_ready.add_argument("url")
+    wait_ready.add_argument("--image", help="Container image the metric is recorded under")
+    wait_ready.add_argument("--timeout", type=float, default=300.0, help="Give up after this many seconds")
+    wait_ready.add_argument("--since", type=float,
+                            help="Unix time the task was started; time-to-first-tool counts from there")
+    wait_ready.add_argument("--max-delay", type=float, default=5.0, help="Longest pause between checks")
+    wait_ready.add_argument("--metrics-file", help="Append the time-to-first-tool record to this JSONL file")
+    wait_ready.set_defaults(handler=cmd_wait_ready)
+
+    list_tools = commands.add_parser("list-tools", help="List the tools a server offers")
+    add_server_options(list_tools)
+    list_tools.add_argument("--match", metavar="GLOB", help="Only tools whose name matches, e.g. 'semgrep_*'")
+    list_tools.add_argument("--limit", type=int, help="Stop after this many tools without fetching further pages")
+    list_tools.set_defaults(handler=cmd_list_tools)
+
+    index = commands.add_parser("index", help="Add servers' tool catalogs to the local search index")
+    index.add_argument("urls", nargs="+", metavar="url")
+    index.add_argument("--image", help="Container image, used as part of the discovery cache key")
+    index.add_argument("--timeout", type=float, default=30.0)
+    index.add_argument("--index", help="Index file (default: ~/.cache/toolshed-mcp/tool-index.json.gz)")
+    index.set_defaults(handler=cmd_index)
+
+    search = commands.add_parser("search", help="Find tools across indexed servers, offline")
+    search.add_argument("query", nargs="+")
+    search.add_argument("--server", help="Only tools of this server")
+    search.add_argument("--limit", type=int, default=10)
+    search.add_argument("--index", help="Index file (default: ~/.cache/toolshed-mcp/tool-index.json.gz)")
+    search.set_defaults(handler=cmd_search)
+
+    call = commands.add_parser("call", help="Call one tool")
+    add_server_options(call)
+    call.add_argument("tool")
+    add_argument_options(call)
+    call.add_argument("--cache", action="append", metavar="TOOL",
+                      help="Cache results of tools matching this name/glob (repeatable)")
+    call.set_defaults(handler=cmd_call)
+
+    batch = commands.add_parser("batch", help="Run a JSONL file of {server, tool, arguments} calls")
+    batch.add_argument("input")
+    batch.add_argument("-o", "--output-file", required=True,
+                       help="Results JSONL; rerunning with the same file resumes the batch")
+    batch.add_argument("--server", help="Server for lines that do not name one")
+    batch.add_argument("-c", "--concurrency", type=int, default=8,
+                       help="In-flight calls per server (the ceiling with --adaptive)")
+    batch.add_argument("--adaptive", action="store_true",
+                       help="Find each server's in-flight limit from latency and 429/503 answers")
+    batch.add_argument("--timeout", type=float, default=30.0)
+    batch.add_argument("--retry-errors", action="store_true", help="Re-run lines that previously failed")
+    batch.add_argument("--cache", action="append", metavar="TOOL",
+                       help="Cache results of tools matching this name/glob (repeatable)")
+    batch.set_defaults(handler=cmd_batch)
+
+    scan = commands.add_parser("scan", help="Incrementally scan a directory with semgrep")
+    scan.add_argument("path")
+    scan.add_argument("--server", action="append", required=True,
+                      help="Scan server URL; repeat to shard across replicas")
+    scan.add_argument("--sessions", type=int, default=1, help="Sessions per server")
+    scan.add_argument("--config", help="Semgrep config, e.g. auto or p/python")
+    scan.add_argument("--index", default=".toolshed/scan-index.json")
+    scan.add_argument("--extensions", help="Comma-separated file extensions, e.g. .py,.ts")
+    scan.add_argument("--image")
+    scan.add_argument("--timeout", type=float, default=120.0)
+    scan.add_argument("--error", action="store_true", help="Exit with status 1 when there are findings")
+    scan.set_defaults(handler=cmd_scan)
+
+    listen = commands.add_parser("listen", help="Print a server's events, constant memory, until interrupted")
+    listen.add_argument("url")
+    listen.add_argument("--sse-path", default="/sse")
+    listen.add_argument("--history", type=int, default=1000, help="Recent events kept in memory")
+    listen.add_argument("--timeout", type=float, default=30.0)
+    listen.set_defaults(handler=cmd_listen)
+
+    bench = commands.add_parser("bench", help="Benchmarks")
+    bench_commands = bench.add_subparsers(dest="bench_command", required=True)
+    calls = bench_commands.add_parser("calls", help="Latency of repeated tool calls")
+    add_server_options(calls)
+    calls.add_argument("tool")
+    add_argument_options(calls)
+    calls.add_argument("-n", "--count", type=int, default=100)
+    calls.add_argument("-c", "--concurrency", type=int, default=8)
+    threads = bench_commands.add_parser("threads", help="Thread pool driving one shared SyncSession")
+    add_server_options(threads)
+    threads.add_argument("tool")
+    add_argument_options(threads)
+    threads.add_argument("-n", "--count", type=int, default=1000)
+    threads.add_argument("-t", "--threads", type=int, default=64)
+    startup = bench_commands.add_parser("startup", help="Import-time budget check for each subcommand")
+    startup.add_argument("--budget-ms", type=float, default=DEFAULT_STARTUP_BUDGET_MS)
+    startup.add_argument("--runs", type=int, default=5)
+    soak = bench_commands.add_parser("listen", help="Soak test: listener RSS stays flat over many events")
+    soak.add_argument("-n", "--events", type=int, default=2_000_000)
+    soak.add_argument("--history", type=int, default=1000)
+    soak.add_argument("--max-growth-mb", type=float, default=2.0)
+    validate = bench_commands.add_parser("validate", help="Cost of validating arguments against an inputSchema")
+    validate.add_argument("--tools-file", help="Saved tools/list result to take the schema from")
+    validate.add_argument("--tool", default="semgrep_scan")
+    validate.add_argument("--args-file", help="Arguments to validate (default: generated scan request)")
+    validate.add_argument("--files", type=int, default=20, help="Files in the generated scan request")
+    validate.add_argument("-n", "--count", type=int, default=2000)
+    upload = bench_commands.add_parser("upload", help="Peak RSS of streamed versus in-memory uploads")
+    upload.add_argument("--mb", default="25,50,100", help="Comma-separated payload sizes in MB")
+    search_bench = bench_commands.add_parser("search", help="Build, query and reload times of the tool index")
+    search_bench.add_argument("--tools", type=int, default=30000)
+    search_bench.add_argument("-n", "--count", type=int, default=2000)
+    micro = bench_commands.add_parser("micro", help="Hot-path microbenchmarks, recorded per commit")
+    micro.add_argument("filter", nargs="*", help="Only benchmarks whose name contains one of these")
+    micro.add_argument("--results", default=".toolshed/microbench.json", help="Results file, keyed by commit")
+    micro.add_argument("--commit", help="Record under this name instead of the current git commit")
+    micro.add_argument("--repeat", type=int, default=5, help="Samples per benchmark; the best one counts")
+    micro.add_argument("--min-time", type=float, default=0.05, help="Minimum seconds per sample")
+    micro.add_argument("--no-save", action="store_true", help="Print the results without recording them")
+    micro.add_argument("--list", action="store_true", help="List the benchmarks and exit")
+    compare = bench_commands.add_parser("compare", help="Flag microbenchmark regressions between two commits")
+    compare.add_argument("base", nargs="?", help="Baseline commit (default: the run recorded before head)")
+    compare.add_argument("head", nargs="?", help="Commit to check (default: the current commit)")
+    compare.add_argument("--results", default=".toolshed/microbench.json")
+    compare.add_argument("--threshold", type=float, default=0.10,
+                         help="Slowdown that counts as a regression, as a fraction (default: 0.10)")
+    ready = bench_commands.add_parser("ready", help="Time-to-first-tool percentiles per image")
+    ready.add_argument("metrics_file", help="JSONL written by wait-ready --metrics-file")
+    bench.set_defaults(handler=cmd_bench)
+
+    replay = commands.add_parser("replay", help="Serve a session recording as a fake server")
+    replay.add_argument("recording")
+    replay.add_argument("--speed", default="1", help="Playback speed factor, or 'max' for no delays")
+    replay.add_argument("--host", default="127.0.0.1")
+    replay.add_argument("--port", type=int, default=8000)
+    replay.set_defaults(handler=cmd_replay)
+    return parser
+
+
+def _run_handler(args):
+    """Run the command; expected failures become an error record and exit status 1"""
+    try:
+        return args.handler(args)
+    except Exception as e:
+        expected = tuple(getattr(sys.modules[module], name) for module, name in EXPECTED_ERRORS
+                         if module in sys.modules)
+        if not isinstance(e, expected):
+            raise
+        args.out.emit({"error": str(e) or type(e).__name__, "type": type(e).__name__})
+        return 1
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 2
+    configure(args.log_level, args.log_format)
+    args.out = Output(args.output)
+    if not args.profile:
+        return _run_handler(args)
+
+    from .profiling import Profiler, modes_from_string
+
+    try:
+        profiler = Profiler(args.profile, modes_from_string(args.profile_mode))
+    except ValueError as e:
+        parser.error(str(e))
+    with profiler:
+        return _run_handler(args)
@@ -0,0 +1,78 @@
+"""
+Request body compression and transfer accounting
+
+Responses need nothing from us: httpx decompresses gzip/deflate (and
+zstd when the `zstandard` package is installed) as the event stream is
+read, as long as we ask for it with Accept-Encoding. Request bodies are
+compressed only once the server has said it accepts an encoding, via an
+Accept-Encoding header on any response (RFC 7694) or
+capabilities.experimental.compression in initialize. A 415 answer turns
+compression off for the session.
+"""
+import gzip
+import importlib.util
+
+HAS_ZSTD = importlib.util.find_spec("zstandard") is not None
+
+# Most preferred first
+REQUEST_ENCODINGS = ("zstd", "gzip") if HAS_ZSTD else ("gzip",)
+ACCEPT_ENCODING = ", ".join(REQUEST_ENCODINGS + ("deflate",))
+
+DEFAULT_MIN_BYTES = 1024
+
+
+def compress(body, encoding):
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=6, mtime=0)
+    if encoding == "zstd":
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=3).compress(body)
+    raise ValueError(f"Unsupported content encoding {encoding!r}")
+
+
+def pick_encoding(advertised):
+    """Our preferred encoding among those a server advertised, if any"""
+    offered = set()
+    for item in advertised or ():
+        for part in str(item).split(","):
+            name, _, params = part.strip().lower().partition(";")
+            if name and params.replace(" ", "") not in ("q=0", "q=0.0"):
+                offered.add(name)
+    for encoding in REQUEST_ENCODINGS:
+        if encoding in offered:
+            return encoding
+    return None
+
+
+class TransferStats:
+    """Bytes before and after compression for requests and the event stream"""
+
+    def __init__(self):
+        self.calls = 0
+        self.request_bytes = 0
+        self.request_wire_bytes = 0
+        self.compressed_calls = 0
+        self.stream_bytes = 0
+        self.stream_wire_bytes = 0
+
+    def record_request(self, raw, wire):
+        self.calls += 1
+        self.request_bytes += raw
+        self.request_wire_bytes += wire
+        if wire != raw:
+            self.compressed_calls += 1
+
+    def summary(self):
+        saved_requests = self.request_bytes - self.request_wire_bytes
+        saved_stream = max(0, self.stream_bytes - self.stream_wire_bytes) if self.stream_wire_bytes else 0
+        return {
+            "calls": self.calls,
+            "compressed_calls": self.compressed_calls,
+            "request_bytes": self.request_bytes,
+            "request_wire_bytes": self.request_wire_bytes,
+            "stream_bytes": self.stream_bytes,
+            "stream_wire_bytes": self.stream_wire_bytes,
+            "bytes_saved": saved_requests + saved_stream,
+            "bytes_saved_per_call": round((saved_requests + saved_stream) / self.calls, 1) if self.calls else 0.0,
+        }
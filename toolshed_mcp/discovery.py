@@ -0,0 +1,123 @@
+import json
+import os
+import time
+from urllib.parse import urlparse
+
+from .session import MCPSession
+from .storage import atomic_write
+
+DEFAULT_DISCOVERY_PATH = os.path.expanduser("~/.cache/toolshed-mcp/discovery.json")
+
+# Event stream paths seen on the servers we host, most common first
+SSE_PATHS = ("/sse", "/mcp/sse", "/v1/sse", "/")
+
+
+class DiscoveryError(Exception):
+    """No known transport answered on the server"""
+
+
+def endpoint_key(server_url, image=None):
+    """Cache key: host:port plus the container image when known"""
+    parsed = urlparse(server_url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    return f"{parsed.hostname}:{port}|{image or ''}"
+
+
+class DiscoveryCache:
+    """
+    Persistent store of what each server endpoint speaks
+
+    An entry records the working transport, event stream path, message
+    path, protocol version and the capabilities/serverInfo returned by
+    initialize. connect() trusts the entry and only re-probes when
+    connecting through it fails.
+
+    Args:
+        path: JSON file holding the entries
+        probe_timeout: Seconds allowed for each candidate during a re-probe
+    """
+
+    def __init__(self, path=DEFAULT_DISCOVERY_PATH, probe_timeout=5.0):
+        self.path = path
+        self.probe_timeout = probe_timeout
+        self.entries = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            # Missing or unreadable: endpoints are re-probed and the next save replaces it
+            return
+        if isinstance(entries, dict):
+            self.entries = entries
+
+    def get(self, server_url, image=None):
+        return self.entries.get(endpoint_key(server_url, image))
+
+    def put(self, server_url, image, session, initialize_result, sse_path):
+        entry = {
+            "transport": "sse",
+            "sse_path": sse_path,
+            "message_path": urlparse(session.messages_url).path,
+            "protocol_version": initialize_result.get("protocolVersion"),
+            "server_info": session.server_info,
+            "capabilities": session.capabilities,
+            "discovered_at": time.time(),
+        }
+        self.entries[endpoint_key(server_url, image)] = entry
+        self.save()
+        return entry
+
+    def invalidate(self, server_url, image=None):
+        if self.entries.pop(endpoint_key(server_url, image), None) is not None:
+            self.save()
+
+    def save(self):
+        """Write the entries atomically"""
+        atomic_write(self.path, lambda f: json.dump(self.entries, f, indent=2, sort_keys=True))
+
+    async def connect(self, server_url, image=None, **session_kwargs):
+        """
+        Return a connected, initialized session for server_url
+
+        Uses the cached entry when there is one; the connection and
+        initialize handshake double as its validation. If that fails, or no
+        entry exists, every candidate path is probed and the cache updated.
+        """
+        entry = self.get(server_url, image)
+        if entry is not None:
+            try:
+                session, result = await self._open(server_url, entry["sse_path"], session_kwargs)
+            except Exception:
+                self.invalidate(server_url, image)
+            else:
+                if session.server_info != entry.get("server_info") or session.capabilities != entry.get("capabilities"):
+                    self.put(server_url, image, session, result, entry["sse_path"])
+                return session
+        return await self.discover(server_url, image, **session_kwargs)
+
+    async def discover(self, server_url, image=None, **session_kwargs):
+        """Probe the candidate paths and remember the first that works"""
+        errors = {}
+        for sse_path in SSE_PATHS:
+            try:
+                session, result = await self._open(
+                    server_url, sse_path, dict(session_kwargs, timeout=self.probe_timeout)
+                )
+            except Exception as e:
+                errors[sse_path] = str(e) or type(e).__name__
+                continue
+            # Probing used probe_timeout; requests from here on get the caller's timeout
+            session.set_timeout(session_kwargs.get("timeout", 30.0))
+            self.put(server_url, image, session, result, sse_path)
+            return session
+        raise DiscoveryError(f"No MCP endpoint found on {server_url}: {errors}")
+
+    async def _open(self, server_url, sse_path, session_kwargs):
+        session = MCPSession(server_url, sse_path=sse_path, **session_kwargs)
+        try:
+            await session.connect()
+            result = await session.initialize()
+        except BaseException:
+            await session.close()
+            raise
+        return session, result
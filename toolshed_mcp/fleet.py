@@ -0,0 +1,336 @@
+import asyncio
+import bisect
+import hashlib
+import logging
+import math
+import time
+
+from .cache import canonical_json
+from .log import event, get_logger
+from .metrics import LatencyWindow
+from .schema import ValidationError
+from .session import MCPError, MCPSession
+
+log = get_logger("fleet")
+
+# Read-only requests that are safe to send twice
+HEDGE_METHODS = frozenset({
+    "ping", "tools/list", "resources/list", "resources/templates/list", "resources/read",
+    "prompts/list", "prompts/get",
+})
+# Latency samples needed before a call kind's p95 is trusted as a hedge delay
+HEDGE_MIN_SAMPLES = 20
+
+
+def _hash(value):
+    return int.from_bytes(hashlib.blake2b(value.encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    """
+    Consistent-hash ring with virtual nodes
+
+    Adding or removing a node only moves the keys that hash to that node's
+    points, roughly 1/n of the key space.
+    """
+
+    def __init__(self, nodes=(), vnodes=100):
+        self.vnodes = vnodes
+        self._points = []
+        self._owners = {}
+        for node in nodes:
+            self.add(node)
+
+    def __len__(self):
+        return len(set(self._owners.values()))
+
+    def __contains__(self, node):
+        return _hash(f"{node}#0") in self._owners
+
+    def add(self, node):
+        for i in range(self.vnodes):
+            point = _hash(f"{node}#{i}")
+            if point not in self._owners:
+                bisect.insort(self._points, point)
+            self._owners[point] = node
+
+    def remove(self, node):
+        for i in range(self.vnodes):
+            point = _hash(f"{node}#{i}")
+            if self._owners.get(point) == node:
+                del self._owners[point]
+                self._points.pop(bisect.bisect_left(self._points, point))
+
+    def iter_nodes(self, key):
+        """Distinct nodes in ring order starting at key's position"""
+        if not self._points:
+            return
+        start = bisect.bisect(self._points, _hash(key))
+        seen = set()
+        for i in range(len(self._points)):
+            node = self._owners[self._points[(start + i) % len(self._points)]]
+            if node not in seen:
+                seen.add(node)
+                yield node
+
+    def node_for(self, key):
+        return next(self.iter_nodes(key), None)
+
+
+class _Replica:
+    def __init__(self, url):
+        self.url = url
+        self.session = None
+        self.in_flight = 0
+        self.draining = False
+        self.lock = asyncio.Lock()
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+
+class FleetClient:
+    """
+    Route calls across replicas of one logical MCP server
+
+    Each call has a routing key (by default the tool name plus canonical
+    arguments, so repeated calls land on the replica whose cache is warm).
+    The key picks a replica on a consistent-hash ring; if that replica
+    already carries more than load_factor times the average in-flight load,
+    the call spills over to the next replica on the ring.
+
+    Args:
+        urls: Base URLs of the replicas
+        load_factor: Bound on a replica's load relative to the fleet average
+        vnodes: Virtual nodes per replica on the ring
+        timeout: Session timeout
+        health: Optional HealthMonitor; replicas it does not report healthy
+            are skipped while any healthy replica remains
+        hedge: Hedge idempotent calls: if one has not returned after the
+            observed hedge_quantile latency for its kind, send a duplicate
+            to another replica, take the first answer and cancel the other
+        hedge_quantile: Latency percentile after which a call is hedged
+        hedge_budget: Hedges allowed per idempotent call, on average
+        hedge_burst: Most hedges that can be saved up for a burst
+    """
+
+    def __init__(self, urls=(), load_factor=1.25, vnodes=100, timeout=30.0, health=None, hedge=False,
+                 hedge_quantile=95, hedge_budget=0.05, hedge_burst=10):
+        self.load_factor = load_factor
+        self.timeout = timeout
+        self.health = health
+        self.hedge = hedge
+        self.hedge_quantile = hedge_quantile
+        self.hedge_budget = hedge_budget
+        self.hedge_burst = hedge_burst
+        self.hedges = {"calls": 0, "sent": 0, "won": 0, "over_budget": 0}
+        self._hedge_tokens = 0.0
+        self._latencies = {}
+        self._hedge_delays = {}
+        self.ring = HashRing(vnodes=vnodes)
+        self.replicas = {}
+        for url in urls:
+            self.add_replica(url)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def add_replica(self, url):
+        """Put a replica on the ring; its session is opened on first use"""
+        url = url.rstrip("/")
+        if url not in self.replicas:
+            self.replicas[url] = _Replica(url)
+            self.ring.add(url)
+            if self.health is not None:
+                self.health.add(url)
+
+    async def remove_replica(self, url, drain_timeout=30.0):
+        """
+        Take a replica off the ring and close it once in-flight calls finish
+
+        New calls are routed elsewhere immediately; calls already running on
+        the replica get up to drain_timeout seconds to complete.
+        """
+        url = url.rstrip("/")
+        replica = self.replicas.get(url)
+        if replica is None:
+            return
+        replica.draining = True
+        self.ring.remove(url)
+        event(log, logging.INFO, "replica draining", url=url, in_flight=replica.in_flight)
+        try:
+            await asyncio.wait_for(replica.idle.wait(), drain_timeout)
+        except asyncio.TimeoutError:
+            pass
+        del self.replicas[url]
+        if self.health is not None:
+            # Stop probing it; otherwise the monitor tracks and logs it forever
+            await self.health.remove(url)
+        if replica.session is not None:
+            await replica.session.close()
+
+    def route(self, key, exclude=()):
+        """Pick the replica for a routing key, honouring the load bound"""
+        active = [r for r in self.replicas.values() if not r.draining and r.url not in exclude]
+        if not active:
+            raise ConnectionError("No replicas available")
+        if self.health is not None:
+            healthy = [r for r in active if self.health.is_available(r.url)]
+            # With every replica unhealthy, keep routing rather than fail outright
+            active = healthy or active
+        total = sum(r.in_flight for r in active) + 1
+        capacity = math.ceil(self.load_factor * total / len(active))
+        candidates = {r.url for r in active}
+        fallback = None
+        for url in self.ring.iter_nodes(key):
+            if url not in candidates:
+                continue
+            replica = self.replicas[url]
+            if replica.in_flight < capacity:
+                return replica
+            fallback = fallback or replica
+        return fallback
+
+    async def _session(self, replica):
+        async with replica.lock:
+            if replica.session is None or not replica.session.connected:
+                session = MCPSession(replica.url, timeout=self.timeout)
+                await session.connect()
+                await session.initialize()
+                replica.session = session
+        return replica.session
+
+    async def _run(self, key, call, kind=None):
+        if kind is None or not self.hedge:
+            return await self._run_on(self.route(key), call)
+        return await self._hedged(key, call, kind)
+
+    async def _run_on(self, replica, call, latencies=None):
+        replica.in_flight += 1
+        replica.idle.clear()
+        started = time.monotonic()
+        try:
+            session = await self._session(replica)
+            result = await call(session)
+        except MCPError:
+            self._observe(replica, ok=True)
+            raise
+        except ValidationError:
+            # Rejected locally before anything was sent; says nothing about the replica
+            raise
+        except asyncio.CancelledError:
+            # A lost hedge ran at least this long; dropping it would bias the percentile low
+            if latencies is not None:
+                latencies.add(time.monotonic() - started)
+            raise
+        except Exception as e:
+            self._observe(replica, ok=False, error=str(e) or type(e).__name__)
+            raise
+        else:
+            self._observe(replica, ok=True)
+            if latencies is not None:
+                latencies.add(time.monotonic() - started)
+            return result
+        finally:
+            replica.in_flight -= 1
+            if replica.in_flight == 0:
+                replica.idle.set()
+
+    async def _hedged(self, key, call, kind):
+        latencies = self._latencies.get(kind)
+        if latencies is None:
+            latencies = self._latencies[kind] = LatencyWindow(1000)
+        self.hedges["calls"] += 1
+        self._hedge_tokens = min(self.hedge_burst, self._hedge_tokens + self.hedge_budget)
+        first = self.route(key)
+        primary = asyncio.ensure_future(self._run_on(first, call, latencies))
+        if latencies.count < HEDGE_MIN_SAMPLES:
+            return await primary
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self._hedge_delay(kind, latencies))
+            if done:
+                return primary.result()
+            if self._hedge_tokens < 1.0:
+                self.hedges["over_budget"] += 1
+                return await primary
+            try:
+                second = self.route(key, exclude={first.url})
+            except ConnectionError:
+                # Nowhere else to send it
+                return await primary
+            self._hedge_tokens -= 1.0
+            self.hedges["sent"] += 1
+            event(log, logging.DEBUG, "hedging", kind=kind, slow=first.url, hedge=second.url)
+            tasks.add(asyncio.ensure_future(self._run_on(second, call, latencies)))
+            while True:
+                done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    tasks.discard(task)
+                    error = task.exception()
+                    # An MCPError is the server's answer; anything else may be one replica's fault
+                    if error is None or isinstance(error, MCPError) or not tasks:
+                        if task is not primary:
+                            self.hedges["won"] += 1
+                        return task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def _observe(self, replica, ok, error=None):
+        # Outcome only: a long tool call is work, not a slow replica, so its
+        # duration stays out of the probe latency that DEGRADED is judged on
+        if self.health is not None:
+            self.health.record(replica.url, None, ok=ok, error=error)
+
+    def _hedge_delay(self, kind, latencies):
+        # Re-sorting the window on every call is wasted work; refresh every few samples
+        counted, delay = self._hedge_delays.get(kind, (-HEDGE_MIN_SAMPLES, 0.0))
+        if latencies.count - counted >= HEDGE_MIN_SAMPLES:
+            delay = latencies.percentile(self.hedge_quantile)
+            self._hedge_delays[kind] = (latencies.count, delay)
+        return delay
+
+    async def request(self, method, params=None, key=None):
+        """Send a request to the replica chosen for key; read-only methods may be hedged"""
+        return await self._run(
+            key if key is not None else method,
+            lambda session: session.request(method, params),
+            kind=method if method in HEDGE_METHODS else None,
+        )
+
+    async def call_tool(self, name, arguments=None, key=None, idempotent=False):
+        """
+        Call a tool on one replica
+
+        Args:
+            key: Routing key; pass a user or playground session id for
+                session affinity. Defaults to the call's content.
+            idempotent: The tool has no side effects, so the call may be
+                hedged (when hedging is on)
+        """
+        arguments = arguments or {}
+        if key is None:
+            key = f"{name}:{canonical_json(arguments)}"
+        return await self._run(key, lambda session: session.call_tool(name, arguments),
+                               kind=f"tools/call:{name}" if idempotent else None)
+
+    def stats(self):
+        return {
+            url: {"in_flight": r.in_flight, "draining": r.draining, "connected": bool(r.session and r.session.connected)}
+            for url, r in self.replicas.items()
+        }
+
+    def hedge_stats(self):
+        """Hedge counts and the current hedge delay per call kind"""
+        return dict(self.hedges, delays_ms={
+            kind: round(delay * 1000, 2) for kind, (_, delay) in self._hedge_delays.items()
+        })
+
+    async def close(self):
+        for replica in list(self.replicas.values()):
+            if replica.session is not None:
+                await replica.session.close()
+                replica.session = None
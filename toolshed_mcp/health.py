@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import random
+import time
+
+import httpx
+
+from .log import event, get_logger
+from .session import MCPSession
+
+log = get_logger("health")
+
+HEALTHY = "healthy"
+DEGRADED = "degraded"
+DOWN = "down"
+
+
+class ServerHealth:
+    """Live health record for one server"""
+
+    def __init__(self, url):
+        self.url = url
+        self.status = HEALTHY
+        self.latency = None
+        self.error_rate = 0.0
+        self.consecutive_failures = 0
+        self.checks = 0
+        self.last_checked = None
+        self.last_error = None
+
+    def as_dict(self):
+        return {
+            "status": self.status,
+            "latency_ms": round(self.latency * 1000, 3) if self.latency is not None else None,
+            "error_rate": round(self.error_rate, 4),
+            "consecutive_failures": self.consecutive_failures,
+            "checks": self.checks,
+            "last_error": self.last_error,
+        }
+
+
+class HealthMonitor:
+    """
+    Background prober keeping a live health table of MCP servers
+
+    Each server is probed on its own jittered schedule. Latency and error
+    rate are tracked as EWMAs; a server is DOWN after `down_after`
+    consecutive failures and DEGRADED when its error rate or latency crosses
+    the thresholds. Real call outcomes can be fed in with record() so a
+    failing task is noticed between probes; pass latency=None for them,
+    since a call's duration depends on the tool and only probe latency is
+    compared against max_latency.
+
+    Args:
+        urls: Base URLs to monitor
+        interval: Mean seconds between probes of one server
+        jitter: Fractional spread applied to the interval
+        mode: 'http' (GET on the base URL, any non-5xx answer is up) or
+            'ping' (MCP ping over a kept-open session)
+        timeout: Probe timeout in seconds
+        alpha: EWMA smoothing factor
+        max_error_rate: Error rate above which a server is DEGRADED
+        max_latency: Seconds of EWMA latency above which a server is DEGRADED
+        down_after: Consecutive failures before a server is DOWN
+    """
+
+    def __init__(self, urls=(), interval=2.0, jitter=0.2, mode="http", timeout=2.0, alpha=0.3,
+                 max_error_rate=0.25, max_latency=1.0, down_after=3):
+        if mode not in ("http", "ping"):
+            raise ValueError(f"Unknown probe mode {mode!r}")
+        self.interval = interval
+        self.jitter = jitter
+        self.mode = mode
+        self.timeout = timeout
+        self.alpha = alpha
+        self.max_error_rate = max_error_rate
+        self.max_latency = max_latency
+        self.down_after = down_after
+        self.table = {}
+        self._tasks = {}
+        self._sessions = {}
+        self._client = None
+        for url in urls:
+            self.table[url.rstrip("/")] = ServerHealth(url.rstrip("/"))
+
+    async def __aenter__(self):
+        self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    def start(self):
+        """Start probing every registered server"""
+        if self._client is None:
+            self._client = httpx.AsyncClient(timeout=self.timeout)
+        for url in self.table:
+            self._start_probe(url)
+
+    def _start_probe(self, url):
+        if self._client is not None and url not in self._tasks:
+            self._tasks[url] = asyncio.create_task(self._probe_loop(url))
+
+    def add(self, url):
+        """Register a server; probing starts right away if the monitor runs"""
+        url = url.rstrip("/")
+        if url not in self.table:
+            self.table[url] = ServerHealth(url)
+        self._start_probe(url)
+
+    async def remove(self, url):
+        url = url.rstrip("/")
+        task = self._tasks.pop(url, None)
+        if task is not None:
+            task.cancel()
+            await asyncio.gather(task, return_exceptions=True)
+        session = self._sessions.pop(url, None)
+        if session is not None:
+            await session.close()
+        self.table.pop(url, None)
+
+    async def _probe_loop(self, url):
+        # Spread the first probes so servers are not all hit at once
+        await asyncio.sleep(random.uniform(0, self.interval * self.jitter))
+        while True:
+            started = time.monotonic()
+            try:
+                await asyncio.wait_for(self._probe(url), self.timeout)
+            except Exception as e:
+                self.record(url, None, ok=False, error=str(e) or type(e).__name__)
+            else:
+                self.record(url, time.monotonic() - started, ok=True)
+            delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            await asyncio.sleep(delay)
+
+    async def _probe(self, url):
+        if self.mode == "http":
+            response = await self._client.get(url)
+            if response.status_code >= 500:
+                raise ConnectionError(f"HTTP {response.status_code}")
+            return
+        session = self._sessions.get(url)
+        if session is None or not session.connected:
+            if session is not None:
+                await session.close()
+            session = MCPSession(url, timeout=self.timeout, client=self._client)
+            self._sessions[url] = session
+            await session.connect()
+        await session.request("ping")
+
+    def record(self, url, latency, ok=True, error=None):
+        """Fold one probe or real call outcome into the server's health; latency None leaves it unchanged"""
+        health = self.table.get(url.rstrip("/"))
+        if health is None:
+            return
+        health.checks += 1
+        health.last_checked = time.time()
+        health.error_rate += self.alpha * ((0.0 if ok else 1.0) - health.error_rate)
+        if ok:
+            health.consecutive_failures = 0
+            health.last_error = None
+            if latency is not None:
+                if health.latency is None:
+                    health.latency = latency
+                else:
+                    health.latency += self.alpha * (latency - health.latency)
+        else:
+            health.consecutive_failures += 1
+            health.last_error = error
+        status = self._classify(health)
+        if status != health.status:
+            event(log, logging.WARNING if status != HEALTHY else logging.INFO, "health changed",
+                  url=health.url, previous=health.status, status=status, error=health.last_error)
+        health.status = status
+
+    def _classify(self, health):
+        if health.consecutive_failures >= self.down_after:
+            return DOWN
+        if health.error_rate > self.max_error_rate:
+            return DEGRADED
+        if health.latency is not None and health.latency > self.max_latency:
+            return DEGRADED
+        return HEALTHY
+
+    def status(self, url):
+        health = self.table.get(url.rstrip("/"))
+        return health.status if health is not None else HEALTHY
+
+    def is_available(self, url):
+        """Whether routing should send new traffic to url"""
+        return self.status(url) == HEALTHY
+
+    def snapshot(self):
+        """Health table as plain dicts"""
+        return {url: health.as_dict() for url, health in self.table.items()}
+
+    async def stop(self):
+        tasks = list(self._tasks.values())
+        self._tasks.clear()
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for session in self._sessions.values():
+            await session.close()
+        self._sessions.clear()
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
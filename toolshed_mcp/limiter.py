@@ -0,0 +1,133 @@
+"""
+Adaptive in-flight limits (AIMD with a latency signal)
+
+A hand-picked concurrency limit is either too high for a small Fargate
+task or too low for a big one. AdaptiveLimit finds it from the calls
+themselves, like TCP congestion control: the limit grows while latency
+stays near the server's baseline and is cut multiplicatively when
+latency inflates or the server answers 429/503 (or a call times out).
+The baseline is the lowest latency seen recently, so it follows the
+server if its uncontended speed changes.
+"""
+import asyncio
+import logging
+import time
+
+from .log import event, get_logger
+
+log = get_logger("limiter")
+
+OVERLOAD_STATUSES = frozenset({429, 503})
+
+
+def is_overload(error):
+    """Whether a failed call means the server is overloaded"""
+    if isinstance(error, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None) in OVERLOAD_STATUSES
+
+
+class AdaptiveLimit:
+    """
+    In-flight limit for one server, adjusted after every call
+
+    Starts in slow start (+1 per call, doubling per round trip) until the
+    first cut, then grows by about one per round trip. A cut multiplies
+    the limit by `backoff`; after a cut, further signals are ignored for
+    one round trip so a single burst of slow calls counts once.
+
+    Args:
+        initial: Starting limit
+        min_limit: Floor of the limit
+        max_limit: Ceiling of the limit
+        tolerance: Latency above baseline * tolerance counts as congestion
+        backoff: Factor applied to the limit on congestion or overload
+        smoothing: Weight of a new sample in the smoothed latency
+        baseline_samples: Samples after which the baseline window rotates
+    """
+
+    def __init__(self, initial=4, min_limit=1, max_limit=256, tolerance=1.5, backoff=0.7, smoothing=0.2,
+                 baseline_samples=500):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.backoff = backoff
+        self.smoothing = smoothing
+        self.baseline_samples = baseline_samples
+        self.window = float(min(max(initial, min_limit), max_limit))
+        self.latency = None
+        self.slow_start = True
+        self.increases = 0
+        self.decreases = 0
+        self.overloads = 0
+        self._min_now = None
+        self._min_before = None
+        self._samples = 0
+        self._hold_until = 0.0
+
+    @property
+    def limit(self):
+        return max(self.min_limit, int(self.window))
+
+    @property
+    def baseline(self):
+        candidates = [value for value in (self._min_now, self._min_before) if value is not None]
+        return min(candidates) if candidates else None
+
+    def _observe(self, latency):
+        # Baseline = minimum over the current and previous window of samples
+        if self._min_now is None or latency < self._min_now:
+            self._min_now = latency
+        self._samples += 1
+        if self._samples >= self.baseline_samples:
+            self._min_before, self._min_now, self._samples = self._min_now, None, 0
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+
+    def _cut(self, reason, now):
+        if now < self._hold_until:
+            return
+        before = self.limit
+        self.window = max(float(self.min_limit), self.window * self.backoff)
+        self.slow_start = False
+        self.decreases += 1
+        self._hold_until = now + (self.latency or 0.0)
+        event(log, logging.DEBUG, "limit decreased", reason=reason, before=before, limit=self.limit)
+
+    def record(self, latency, in_flight, overloaded=False):
+        """
+        Feed back one finished call; returns the new limit
+
+        Args:
+            latency: Seconds the call took
+            in_flight: Calls in flight when it finished, itself included
+            overloaded: The server rejected it (429/503) or it timed out
+        """
+        now = time.monotonic()
+        if overloaded:
+            self.overloads += 1
+            self._cut("overload", now)
+            return self.limit
+        self._observe(latency)
+        baseline = self.baseline
+        if self.latency > baseline * self.tolerance:
+            self._cut("latency", now)
+        elif in_flight >= self.limit and self.window < self.max_limit and now >= self._hold_until:
+            # Only grow a window that is actually in use
+            self.window = min(float(self.max_limit), self.window + (1.0 if self.slow_start else 1.0 / self.window))
+            self.increases += 1
+        return self.limit
+
+    def stats(self):
+        return {
+            "limit": self.limit,
+            "baseline_ms": round(self.baseline * 1000, 2) if self.baseline is not None else None,
+            "latency_ms": round(self.latency * 1000, 2) if self.latency is not None else None,
+            "slow_start": self.slow_start,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "overloads": self.overloads,
+        }
@@ -0,0 +1,331 @@
+"""
+Constant-memory event listener
+
+For monitoring processes that stay attached to a server's event stream
+for days. Raw bytes from the stream are parsed in place in one reused
+buffer; each event becomes a small __slots__ record whose method and
+id are picked out of the bytes without decoding the JSON, and repeated
+names share one interned string. Only the last `history` records are
+kept, and per-name counters are capped, so memory stays flat however
+long the listener runs. Decode a record's message only when you need it.
+"""
+import asyncio
+import collections
+import json
+import logging
+import re
+import time
+from urllib.parse import urljoin
+
+import httpx
+
+from .log import event, get_logger
+from .session import CLIENT_INFO, PROTOCOL_VERSION, SSE_HEADERS
+
+log = get_logger("listen")
+
+_METHOD = re.compile(rb'"method"\s*:\s*"([^"\\]{1,200})"')
+_ID = re.compile(rb'"id"\s*:\s*(-?\d{1,20}|"[^"\\]{0,200}")')
+_MAX_NAMES = 1024
+
+
+class ListenEvent:
+    """One received event, without its decoded body"""
+
+    __slots__ = ("seq", "received", "kind", "method", "id", "size", "raw")
+
+    def __init__(self, seq, received, kind, method, id, size, raw):
+        self.seq = seq
+        self.received = received
+        self.kind = kind
+        self.method = method
+        self.id = id
+        self.size = size
+        self.raw = raw
+
+    @property
+    def message(self):
+        """Decoded JSON body; only available when raw data was kept"""
+        return json.loads(self.raw) if self.raw else None
+
+    def as_dict(self):
+        return {
+            "seq": self.seq, "ts": round(self.received, 6), "kind": self.kind,
+            "method": self.method, "id": self.id, "size": self.size,
+        }
+
+
+class EventDecoder:
+    """
+    Incremental SSE decoder working on one reused bytearray
+
+    Args:
+        keep_data: Keep each event's raw data bytes on its record
+        max_event_bytes: An event larger than this is dropped and counted
+    """
+
+    def __init__(self, keep_data=False, max_event_bytes=16 * 1024 * 1024):
+        self.keep_data = keep_data
+        self.max_event_bytes = max_event_bytes
+        self.seq = 0
+        self.oversized = 0
+        self._buffer = bytearray()
+        self._scan = 0
+        self._kind = None
+        self._data = None
+        self._after_cr = False
+        self._names = {}
+
+    def reset(self):
+        """Forget partial input, e.g. after reconnecting"""
+        self._buffer.clear()
+        self._scan = 0
+        self._kind = self._data = None
+        self._after_cr = False
+
+    def _name(self, value):
+        name = self._names.get(value)
+        if name is None:
+            name = value.decode("utf-8", "replace")
+            if len(self._names) < _MAX_NAMES:
+                self._names[value] = name
+        return name
+
+    def feed(self, chunk):
+        """Add bytes from the stream and yield the events they complete"""
+        if self._after_cr and chunk:
+            # The LF completing a CRLF whose CR ended the previous chunk
+            self._after_cr = False
+            if chunk[:1] == b"\n":
+                chunk = chunk[1:]
+        # Lines end at CRLF, LF or a bare CR. Bare CRs are rare, so a check per
+        # chunk decides whether lines must be searched for them too
+        bare_cr = b"\r" in chunk and chunk.count(b"\r") != chunk.count(b"\r\n")
+        buffer = self._buffer
+        buffer += chunk
+        start = self._scan
+        while True:
+            end = buffer.find(b"\n", self._scan)
+            line_end = buffer.find(b"\r", self._scan, end if end >= 0 else len(buffer)) if bare_cr else -1
+            if line_end >= 0:
+                if line_end + 1 < len(buffer):
+                    self._scan = line_end + 2 if buffer[line_end + 1] == 10 else line_end + 1
+                else:
+                    # A CR ending the buffer may be the first half of a CRLF
+                    self._scan = line_end + 1
+                    self._after_cr = True
+            elif end >= 0:
+                self._scan = end + 1
+                line_end = end - 1 if end > start and buffer[end - 1] == 13 else end
+            else:
+                break
+            if line_end == start:
+                record = self._finish()
+                if record is not None:
+                    yield record
+            elif buffer.startswith(b"data:", start, line_end):
+                value = start + 5
+                if value < line_end and buffer[value] == 32:
+                    value += 1
+                if self._data is None:
+                    self._data = (value, line_end)
+                else:
+                    # Multi-line data is rare; join it into its own bytes
+                    if isinstance(self._data, tuple):
+                        self._data = bytearray(buffer[self._data[0]:self._data[1]])
+                    self._data += b"\n" + buffer[value:line_end]
+            elif buffer.startswith(b"event:", start, line_end):
+                value = start + 6
+                if value < line_end and buffer[value] == 32:
+                    value += 1
+                self._kind = self._name(bytes(buffer[value:line_end]))
+            start = self._scan
+            if not isinstance(self._data, tuple):
+                # Nothing pending refers into the buffer; drop consumed lines
+                del buffer[:start]
+                self._scan -= start
+                start = 0
+        if len(buffer) > self.max_event_bytes:
+            self.oversized += 1
+            self.reset()
+
+    def _finish(self):
+        data, kind = self._data, self._kind or "message"
+        self._data = self._kind = None
+        if data is None:
+            return None
+        buffer = self._buffer
+        if isinstance(data, tuple):
+            source, begin, end = buffer, data[0], data[1]
+        else:
+            source, begin, end = data, 0, len(data)
+        # Top-level keys are looked for ahead of the body so that an "id"
+        # or "method" nested in params/result is not mistaken for them
+        limit = end
+        for key in (b'"params"', b'"result"', b'"error"'):
+            at = source.find(key, begin, limit)
+            if at >= 0:
+                limit = at
+        method_match = _METHOD.search(source, begin, limit)
+        id_match = _ID.search(source, begin, limit)
+        method = self._name(method_match.group(1)) if method_match else None
+        request_id = None
+        if id_match:
+            value = id_match.group(1)
+            request_id = self._name(value[1:-1]) if value[:1] == b'"' else int(value)
+        elif method_match is None and limit < end:
+            # Unusual key order: fall back to decoding this one message
+            method, request_id = self._decode_names(source[begin:end])
+        raw = None
+        if self.keep_data or kind == "endpoint":
+            raw = bytes(source[begin:end])
+        self.seq += 1
+        return ListenEvent(self.seq, time.time(), kind, method, request_id, end - begin, raw)
+
+
+    @staticmethod
+    def _decode_names(data):
+        try:
+            message = json.loads(data)
+        except ValueError:
+            return None, None
+        if not isinstance(message, dict):
+            return None, None
+        return message.get("method"), message.get("id")
+
+
+class Listener:
+    """
+    Long-running, constant-memory listener on one server's event stream
+
+    Reconnects with exponential backoff when the stream ends, and by
+    default runs the initialize handshake on each new session so the
+    server starts sending notifications.
+
+    Args:
+        server_url: Base URL of the server
+        sse_path: Path of the event stream
+        history: Number of recent events kept in `history`
+        keep_data: Keep raw event bytes on the records (needed for .message)
+        initialize: Run the MCP initialize handshake after connecting
+        timeout: Seconds allowed for connecting and for POSTs
+        reconnect_delay: First delay before reconnecting, doubled up to max_reconnect_delay
+    """
+
+    def __init__(self, server_url, sse_path="/sse", history=1000, keep_data=False, initialize=True,
+                 timeout=30.0, reconnect_delay=1.0, max_reconnect_delay=60.0):
+        self.server_url = server_url.rstrip("/")
+        self.sse_path = sse_path
+        self.initialize = initialize
+        self.timeout = timeout
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.decoder = EventDecoder(keep_data=keep_data)
+        self.history = collections.deque(maxlen=history)
+        self.counts = {}
+        self.bytes = 0
+        self.reconnects = 0
+        self.endpoint = None
+        self._handlers = []
+        self._stopping = False
+        self._client = None
+        self._task = None
+
+    def on_event(self, handler):
+        """Register a callback receiving every ListenEvent"""
+        self._handlers.append(handler)
+        return handler
+
+    def feed(self, chunk):
+        """Process stream bytes (after content decoding); returns the number of events they completed"""
+        self.bytes += len(chunk)
+        completed = 0
+        counts = self.counts
+        for record in self.decoder.feed(chunk):
+            completed += 1
+            name = record.method or record.kind
+            if name in counts:
+                counts[name] += 1
+            elif len(counts) < _MAX_NAMES:
+                counts[name] = 1
+            else:
+                counts["(other)"] = counts.get("(other)", 0) + 1
+            if record.kind == "endpoint":
+                self.endpoint = record.raw.decode("utf-8", "replace").strip()
+            self.history.append(record)
+            for handler in self._handlers:
+                handler(record)
+        return completed
+
+    async def run(self):
+        """Listen until stop() is called, reconnecting as needed"""
+        delay = self.reconnect_delay
+        self._task = asyncio.current_task()
+        self._client = httpx.AsyncClient(timeout=self.timeout)
+        try:
+            while not self._stopping:
+                started = time.monotonic()
+                try:
+                    await self._listen_once()
+                except (httpx.HTTPError, OSError) as e:
+                    event(log, logging.WARNING, "listener disconnected", url=self.server_url, error=str(e))
+                if self._stopping:
+                    break
+                if time.monotonic() - started > self.max_reconnect_delay:
+                    delay = self.reconnect_delay
+                self.reconnects += 1
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, self.max_reconnect_delay)
+        except asyncio.CancelledError:
+            if not self._stopping:
+                raise
+        finally:
+            self._task = None
+            await self._client.aclose()
+            self._client = None
+
+    async def _listen_once(self):
+        self.decoder.reset()
+        self.endpoint = None
+        handshake = None
+        async with self._client.stream(
+            "GET", f"{self.server_url}{self.sse_path}", headers=SSE_HEADERS,
+            timeout=httpx.Timeout(self.timeout, read=None),
+        ) as response:
+            response.raise_for_status()
+            event(log, logging.INFO, "listener connected", url=self.server_url)
+            try:
+                # Decoded bytes: the stream may be gzip-encoded (we send Accept-Encoding)
+                async for chunk in response.aiter_bytes():
+                    self.feed(chunk)
+                    if handshake is None and self.initialize and self.endpoint:
+                        messages_url = urljoin(self.server_url + "/", self.endpoint)
+                        handshake = asyncio.create_task(self._handshake(messages_url))
+            finally:
+                if handshake is not None and not handshake.done():
+                    handshake.cancel()
+
+    async def _handshake(self, messages_url):
+        try:
+            await self._client.post(messages_url, json={
+                "jsonrpc": "2.0", "id": 0, "method": "initialize",
+                "params": {"protocolVersion": PROTOCOL_VERSION, "capabilities": {}, "clientInfo": CLIENT_INFO},
+            })
+            await self._client.post(messages_url, json={"jsonrpc": "2.0", "method": "notifications/initialized"})
+        except httpx.HTTPError as e:
+            event(log, logging.WARNING, "listener handshake failed", url=self.server_url, error=str(e))
+
+    def stop(self):
+        """Make run() return"""
+        self._stopping = True
+        if self._task is not None:
+            self._task.cancel()
+
+    def stats(self):
+        return {
+            "events": self.decoder.seq,
+            "bytes": self.bytes,
+            "reconnects": self.reconnects,
+            "oversized": self.decoder.oversized,
+            "counts": dict(self.counts),
+        }
@@ -0,0 +1,133 @@
+"""
+Structured event logging and result output
+
+Diagnostics go through the standard logging module under the
+'toolshed_mcp' logger as named events with key/value fields. event()
+checks the level before building anything, and expensive field values
+can be wrapped in Lazy so they are only computed for records that are
+actually written. Results go through Output, which pretty-prints for a
+terminal and writes NDJSON otherwise.
+"""
+import json
+import logging
+import sys
+import time
+
+LOGGER_NAME = "toolshed_mcp"
+LOG_FORMATS = ("text", "json")
+OUTPUT_MODES = ("auto", "pretty", "ndjson")
+
+# Library use without configure() stays quiet instead of reaching logging's
+# last-resort handler, which would print bare event names without their fields
+logging.getLogger(LOGGER_NAME).addHandler(logging.NullHandler())
+
+
+def get_logger(name):
+    return logging.getLogger(f"{LOGGER_NAME}.{name}")
+
+
+class Lazy:
+    """Field value computed only when the record is formatted"""
+
+    __slots__ = ("fn", "args")
+
+    def __init__(self, fn, *args):
+        self.fn = fn
+        self.args = args
+
+    def value(self):
+        return self.fn(*self.args)
+
+    def __str__(self):
+        return str(self.value())
+
+
+def event(logger, level, name, **fields):
+    """Log a named event with fields, doing no work when level is disabled"""
+    if logger.isEnabledFor(level):
+        logger.log(level, name, extra={"fields": fields})
+
+
+def _field_value(value):
+    return value.value() if isinstance(value, Lazy) else value
+
+
+class NDJSONFormatter(logging.Formatter):
+    """One compact JSON object per record"""
+
+    def format(self, record):
+        data = {
+            "ts": round(record.created, 6),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        for key, value in getattr(record, "fields", {}).items():
+            data[key] = _field_value(value)
+        if record.exc_info:
+            data["exc"] = self.formatException(record.exc_info)
+        return json.dumps(data, default=str, separators=(",", ":"))
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable 'time LEVEL logger event key=value ...' lines"""
+
+    def format(self, record):
+        clock = time.strftime("%H:%M:%S", time.localtime(record.created))
+        parts = [f"{clock}.{int(record.msecs):03d}", record.levelname, record.name, record.getMessage()]
+        for key, value in getattr(record, "fields", {}).items():
+            value = _field_value(value)
+            if not isinstance(value, str):
+                value = json.dumps(value, default=str, separators=(",", ":"))
+            parts.append(f"{key}={value}")
+        line = " ".join(parts)
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+def configure(level="warning", fmt="text", stream=None):
+    """Send toolshed_mcp events to stream (stderr by default)"""
+    if fmt not in LOG_FORMATS:
+        raise ValueError(f"Unknown log format {fmt!r}, expected one of {LOG_FORMATS}")
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(NDJSONFormatter() if fmt == "json" else TextFormatter())
+    logger = logging.getLogger(LOGGER_NAME)
+    logger.handlers[:] = [handler]
+    logger.setLevel(level.upper())
+    logger.propagate = False
+    return logger
+
+
+class Output:
+    """
+    Writer for command results
+
+    'pretty' indents JSON for people; 'ndjson' writes one compact object
+    per line for machines; 'auto' picks pretty only when the stream is a
+    terminal.
+    """
+
+    def __init__(self, mode="auto", stream=None):
+        if mode not in OUTPUT_MODES:
+            raise ValueError(f"Unknown output mode {mode!r}, expected one of {OUTPUT_MODES}")
+        self.stream = stream or sys.stdout
+        if mode == "auto":
+            mode = "pretty" if self.stream.isatty() else "ndjson"
+        self.mode = mode
+
+    @property
+    def pretty(self):
+        return self.mode == "pretty"
+
+    def emit(self, record):
+        if self.pretty:
+            text = json.dumps(record, indent=2, ensure_ascii=False, default=str)
+        else:
+            text = json.dumps(record, separators=(",", ":"), ensure_ascii=False, default=str)
+        self.stream.write(text + "\n")
+
+    def line(self, text):
+        """Plain text for interactive use; ignored in NDJSON mode"""
+        if self.pretty:
+            self.stream.write(text + "\n")
@@ -0,0 +1,51 @@
+import collections
+import math
+import os
+import sys
+
+
+def percentile(values, q):
+    """Nearest-rank percentile (q in 0-100) of an unsorted sequence"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+class LatencyWindow:
+    """Bounded window of recent latency samples, in seconds"""
+
+    def __init__(self, size=10000):
+        self.samples = collections.deque(maxlen=size)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def percentile(self, q):
+        return percentile(self.samples, q)
+
+    def summary(self):
+        """Count and p50/p95/p99/max in milliseconds"""
+        samples = list(self.samples)
+        return {
+            "count": self.count,
+            "p50_ms": round(percentile(samples, 50) * 1000, 3),
+            "p95_ms": round(percentile(samples, 95) * 1000, 3),
+            "p99_ms": round(percentile(samples, 99) * 1000, 3),
+            "max_ms": round(max(samples, default=0.0) * 1000, 3),
+        }
+
+
+def rss_bytes():
+    """Current resident set size of this process, or peak RSS where /proc is missing"""
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
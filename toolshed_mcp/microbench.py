@@ -0,0 +1,387 @@
+"""
+Microbenchmarks of the client's hot paths, tracked per commit
+
+Each benchmark runs one hot path of the session on a fixture shaped like
+real traffic:
+- an idle-heavy event stream where keep-alive pings outnumber events
+- a multi-megabyte semgrep result
+- bursts of small responses answered out of order
+- large scan requests
+
+Timing follows timeit: gc is off, the loop count is raised until one
+sample takes long enough to time, and the best of several samples is the
+figure of record. Results are stored as JSON keyed by commit, so a later
+run can be compared against any earlier one. A run on a work tree with
+uncommitted changes is kept under "<commit>-dirty", next to the clean run
+of the commit it was made on. compare() flags every
+benchmark that got slower by more than the threshold.
+"""
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import time
+
+from .storage import atomic_write
+
+DEFAULT_RESULTS_PATH = ".toolshed/microbench.json"
+DEFAULT_THRESHOLD = 0.10
+DIRTY_SUFFIX = "-dirty"
+
+# name -> (description, setup); setup(loop) returns (run, ops per run, bytes per run)
+BENCHMARKS = {}
+
+
+def benchmark(name, description):
+    """Register a setup function under name"""
+
+    def register(setup):
+        BENCHMARKS[name] = (description, setup)
+        return setup
+
+    return register
+
+
+def _ping_stream_lines(events=200, pings_per_event=20):
+    # sse-starlette (used by the MCP SDK) sends ": ping - <timestamp>" on idle streams
+    lines = ["event: endpoint", "data: /messages/?session_id=5f0e4c2a9b1d4e7f8a6b3c2d1e0f9a8b", ""]
+    for i in range(events):
+        for j in range(pings_per_event):
+            lines.append(f": ping - 2025-05-14 09:{i % 60:02d}:{j % 60:02d}.{i * 7919 % 1000000:06d}+00:00")
+        lines.append("event: message")
+        message = {"jsonrpc": "2.0", "method": "notifications/progress",
+                   "params": {"progressToken": i, "progress": i, "total": events}}
+        lines.append(f"data: {json.dumps(message)}")
+        lines.append("")
+    return lines
+
+
+def _semgrep_result(findings=2000):
+    rng = random.Random(0)
+    rules = [f"python.lang.security.audit.rule-{i}" for i in range(40)]
+    results = []
+    for i in range(findings):
+        line = rng.randint(1, 2000)
+        results.append({
+            "check_id": rng.choice(rules),
+            "path": f"src/service_{i % 97}/module_{i % 13}.py",
+            "start": {"line": line, "col": 5, "offset": line * 40},
+            "end": {"line": line + 2, "col": 31, "offset": line * 40 + 110},
+            "extra": {
+                "message": "Detected subprocess function with argument tainted by user input. "
+                           "Audit the use of this call to make sure it is not controllable by an attacker.",
+                "metadata": {
+                    "cwe": ["CWE-78: Improper Neutralization of Special Elements used in an OS Command"],
+                    "owasp": ["A01:2017 - Injection", "A03:2021 - Injection"],
+                    "references": ["https://docs.python.org/3/library/subprocess.html"],
+                    "category": "security", "confidence": "MEDIUM", "likelihood": "LOW", "impact": "HIGH",
+                    "technology": ["python"], "subcategory": ["audit"], "license": "Semgrep Rules License v1.0",
+                },
+                "severity": "ERROR",
+                "fingerprint": f"{rng.getrandbits(128):032x}",
+                "lines": "    subprocess.run(command, shell=True, check=True)",
+                "is_ignored": False,
+                "engine_kind": "OSS",
+            },
+        })
+    payload = {"results": results, "errors": [], "version": "1.85.0",
+               "paths": {"scanned": sorted({r["path"] for r in results})}}
+    return {"content": [{"type": "text", "text": json.dumps(payload, indent=2)}], "isError": False}
+
+
+def _scan_request(files=50, file_bytes=20000):
+    line = "def handler(event, context):  # a typical line of source code\n"
+    content = line * (file_bytes // len(line))
+    return {
+        "jsonrpc": "2.0", "id": 7, "method": "tools/call",
+        "params": {"name": "semgrep_scan", "arguments": {
+            "code_files": [{"filename": f"src/module_{i}.py", "content": content} for i in range(files)],
+            "config": "auto",
+        }},
+    }
+
+
+def _session():
+    from .session import MCPSession
+
+    return MCPSession("http://127.0.0.1:8000")
+
+
+@benchmark("sse.parse_pings", "SSEParser.feed on a stream of 20 keep-alive pings per event, per line")
+def _parse_pings(loop):
+    from .session import SSEParser
+
+    lines = _ping_stream_lines()
+
+    def run():
+        parser = SSEParser()
+        feed = parser.feed
+        for line in lines:
+            feed(line)
+
+    return run, len(lines), sum(len(line) + 1 for line in lines)
+
+
+@benchmark("sse.iter_events", "iter_sse over the ping-heavy stream, regions included, per line")
+def _iter_events(loop):
+    from .session import iter_sse
+
+    lines = _ping_stream_lines()
+
+    async def source():
+        for line in lines:
+            yield line
+
+    async def consume():
+        async for _ in iter_sse(source()):
+            pass
+
+    return lambda: loop.run_until_complete(consume()), len(lines), sum(len(line) + 1 for line in lines)
+
+
+@benchmark("decode.small_responses", "json.loads of small tools/call responses, per response")
+def _decode_small(loop):
+    messages = [json.dumps({"jsonrpc": "2.0", "id": i, "result": {
+        "content": [{"type": "text", "text": f"ok {i}"}], "isError": False}}) for i in range(1000)]
+
+    def run():
+        for data in messages:
+            json.loads(data)
+
+    return run, len(messages), sum(len(data) for data in messages)
+
+
+@benchmark("dispatch.responses", "Decode and match 1000 responses to pending requests, out of order, per response")
+def _dispatch_responses(loop):
+    session = _session()
+    ids = list(range(1, 1001))
+    random.Random(0).shuffle(ids)
+    messages = [json.dumps({"jsonrpc": "2.0", "id": i, "result": {
+        "content": [{"type": "text", "text": f"ok {i}"}], "isError": False}}) for i in ids]
+    pending = session._pending
+
+    def run():
+        for i in range(1, 1001):
+            pending[i] = loop.create_future()
+        for data in messages:
+            session._dispatch("message", data)
+
+    return run, len(messages), sum(len(data) for data in messages)
+
+
+@benchmark("decode.semgrep_result", "Dispatch a 2000-finding semgrep response and parse its findings")
+def _decode_semgrep(loop):
+    from .scan import parse_findings
+
+    session = _session()
+    data = json.dumps({"jsonrpc": "2.0", "id": 1, "result": _semgrep_result()})
+
+    def run():
+        future = session._pending[1] = loop.create_future()
+        session._dispatch("message", data)
+        parse_findings(future.result()["result"])
+
+    return run, 1, len(data)
+
+
+@benchmark("encode.scan_request", "JSON body of a 50-file, 1 MB semgrep_scan request")
+def _encode_scan(loop):
+    from .session import encode_body
+
+    payload = _scan_request()
+    return lambda: encode_body(payload), 1, len(encode_body(payload))
+
+
+@benchmark("encode.scan_request_gzip", "Gzip the 50-file scan request body")
+def _encode_scan_gzip(loop):
+    from .compression import compress
+    from .session import encode_body
+
+    body = encode_body(_scan_request())
+    return lambda: compress(body, "gzip"), 1, len(body)
+
+
+@benchmark("encode.scan_request_streamed", "Chunked JSON encoding (iter_json) of the 50-file scan request")
+def _encode_scan_streamed(loop):
+    from .stream import iter_json
+
+    payload = _scan_request()
+
+    def run():
+        for _ in iter_json(payload):
+            pass
+
+    return run, 1, sum(len(chunk) for chunk in iter_json(payload))
+
+
+def measure(run, repeat=5, min_time=0.05):
+    """
+    Seconds per call of run(): (best, median) over repeat samples
+
+    Args:
+        run: Function to time
+        repeat: Samples taken
+        min_time: Each sample loops run() until it takes at least this long
+    """
+    timer = time.perf_counter
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        loops = 1
+        while True:
+            started = timer()
+            for _ in range(loops):
+                run()
+            elapsed = timer() - started
+            if elapsed >= min_time:
+                break
+            loops = max(loops * 2, int(loops * min_time / max(elapsed, 1e-9) * 1.2))
+        samples = [elapsed / loops]
+        for _ in range(repeat - 1):
+            started = timer()
+            for _ in range(loops):
+                run()
+            samples.append((timer() - started) / loops)
+    finally:
+        if enabled:
+            gc.enable()
+    return min(samples), statistics.median(samples)
+
+
+def run_suite(names=None, repeat=5, min_time=0.05):
+    """
+    Run the benchmarks whose name contains one of names (all by default)
+
+    Returns name -> {ns_per_op, median_ns_per_op, mb_per_s, ops}.
+    """
+    loop = asyncio.new_event_loop()
+    results = {}
+    try:
+        for name, (description, setup) in BENCHMARKS.items():
+            if names and not any(part in name for part in names):
+                continue
+            run, ops, size = setup(loop)
+            run()  # warm up caches and lazy imports
+            best, median = measure(run, repeat, min_time)
+            results[name] = {
+                "ns_per_op": round(best / ops * 1e9, 1),
+                "median_ns_per_op": round(median / ops * 1e9, 1),
+                "mb_per_s": round(size / best / 1e6, 1) if size else None,
+                "ops": ops,
+            }
+    finally:
+        loop.close()
+    return results
+
+
+def current_commit(cwd=None):
+    """Short hash of HEAD plus whether the work tree has changes, or (None, False) outside git"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short=12", "HEAD"], cwd=cwd, check=True,
+                                capture_output=True, text=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], cwd=cwd, check=True,
+                                capture_output=True, text=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return None, False
+    return commit, bool(status.strip())
+
+
+def run_key(commit, dirty=False):
+    """Key a run is recorded under; dirty runs never replace the commit's clean run"""
+    return f"{commit}{DIRTY_SUFFIX}" if dirty else commit
+
+
+def environment():
+    return {"python": platform.python_version(), "implementation": platform.python_implementation(),
+            "machine": platform.machine(), "system": platform.system()}
+
+
+class ResultStore:
+    """
+    JSON file of benchmark runs keyed by commit
+
+    A second run under the same key replaces the first. Runs made with
+    uncommitted changes use the run_key() of the commit plus "-dirty".
+
+    Args:
+        path: File the runs are loaded from and saved to
+    """
+
+    def __init__(self, path=DEFAULT_RESULTS_PATH):
+        self.path = path
+        self.runs = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.runs = json.load(f).get("runs", {})
+
+    def record(self, commit, results, dirty=False):
+        # Re-insert so the latest run is last and order stays chronological
+        self.runs.pop(commit, None)
+        self.runs[commit] = dict(environment(), at=round(time.time(), 3), dirty=dirty, results=results)
+
+    def save(self):
+        """Write the runs atomically"""
+        atomic_write(self.path, lambda f: json.dump({"version": 1, "runs": self.runs}, f, indent=1))
+
+    def resolve(self, commit):
+        """The recorded run whose commit commit is a prefix of; add "-dirty" for the dirty run"""
+        if commit in self.runs:
+            return commit
+        dirty = commit.endswith(DIRTY_SUFFIX)
+        commit = commit[:-len(DIRTY_SUFFIX)] if dirty else commit
+        matches = []
+        for key in self.runs:
+            if key.endswith(DIRTY_SUFFIX) != dirty:
+                continue
+            recorded = key[:-len(DIRTY_SUFFIX)] if dirty else key
+            if recorded.startswith(commit) or commit.startswith(recorded):
+                matches.append(key)
+        if len(matches) != 1:
+            raise KeyError(f"{commit!r} matches {len(matches)} recorded runs in {self.path}")
+        return matches[0]
+
+    def previous(self, commit):
+        """
+        The run to compare commit against
+
+        A dirty run is compared against the clean run of its own commit when
+        there is one. Otherwise it is the latest clean run recorded before commit.
+        """
+        if commit.endswith(DIRTY_SUFFIX) and commit[:-len(DIRTY_SUFFIX)] in self.runs:
+            return commit[:-len(DIRTY_SUFFIX)]
+        keys = list(self.runs)
+        for key in reversed(keys[:keys.index(commit)]):
+            if not key.endswith(DIRTY_SUFFIX):
+                return key
+        raise KeyError(f"No clean run recorded before {commit!r} in {self.path}")
+
+
+def compare(base, head, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare two runs' results benchmark by benchmark
+
+    A benchmark regressed when head's best time per op exceeds base's by
+    more than threshold (0.10 = 10%), and improved when it is faster by
+    the same margin. Returns one dict per benchmark in either run.
+    """
+    rows = []
+    for name in list(base) + [name for name in head if name not in base]:
+        before = base.get(name, {}).get("ns_per_op")
+        after = head.get(name, {}).get("ns_per_op")
+        if before is None or after is None:
+            status, change = ("new" if before is None else "missing"), None
+        else:
+            change = after / before - 1
+            if change > threshold:
+                status = "regressed"
+            elif change < -threshold / (1 + threshold):
+                status = "improved"
+            else:
+                status = "ok"
+        rows.append({"benchmark": name, "base_ns": before, "head_ns": after,
+                     "change": round(change, 4) if change is not None else None, "status": status})
+    return rows
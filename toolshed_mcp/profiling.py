@@ -0,0 +1,227 @@
+"""
+Opt-in profiling of the client
+
+Nothing here runs unless a Profiler is started, either in code, by the
+CLI's --profile option, or by setting TOOLSHED_MCP_PROFILE to a
+directory before the library is imported (TOOLSHED_MCP_PROFILE_MODES
+picks the modes, comma separated). Each run writes its files to that
+directory under one run id:
+
+    <run>.pstats            cProfile stats, for `python -m pstats` or snakeviz
+    <run>.regions.json      call count and wall time of the named regions
+    <run>.folded            sampled stacks in folded form, for flamegraph.pl
+                            or speedscope
+    <run>-<n>-<label>.tracemalloc / .txt
+                            tracemalloc snapshot and its top allocation
+                            sites, taken at every session close and at stop
+
+Named regions (parse, decode, dispatch, send, wait) wrap the session's
+hot paths. Their times are wall clock and inclusive, and regions on
+concurrent calls overlap, so they tell where time goes rather than
+adding up to the run time.
+"""
+import atexit
+import json
+import os
+import sys
+import threading
+import time
+from collections import Counter
+
+PROFILE_MODES = ("cprofile", "memory", "sample")
+ENV_DIR = "TOOLSHED_MCP_PROFILE"
+ENV_MODES = "TOOLSHED_MCP_PROFILE_MODES"
+
+_active = None
+
+
+class _NullRegion:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_REGION = _NullRegion()
+
+
+class _Region:
+    __slots__ = ("totals", "name", "started")
+
+    def __init__(self, totals, name):
+        self.totals = totals
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        elapsed = time.perf_counter() - self.started
+        totals = self.totals.get(self.name)
+        if totals is None:
+            self.totals[self.name] = [1, elapsed, elapsed]
+        else:
+            totals[0] += 1
+            totals[1] += elapsed
+            if elapsed > totals[2]:
+                totals[2] = elapsed
+        return False
+
+
+def region(name):
+    """Context manager timing a named region; free when not profiling"""
+    profiler = _active
+    if profiler is None:
+        return _NULL_REGION
+    return _Region(profiler.regions, name)
+
+
+def checkpoint(label):
+    """Take a memory snapshot if a memory profile is running"""
+    if _active is not None:
+        _active.snapshot(label)
+
+
+class Profiler:
+    """
+    One profiling run
+
+    Args:
+        directory: Where the run's files are written
+        modes: Any of PROFILE_MODES
+        sample_interval: Seconds between stack samples in 'sample' mode
+        max_snapshots: Most tracemalloc snapshots taken during the run
+        top: Allocation sites listed in each snapshot summary
+    """
+
+    def __init__(self, directory, modes=("cprofile",), sample_interval=0.01, max_snapshots=20, top=25):
+        unknown = set(modes) - set(PROFILE_MODES)
+        if unknown:
+            raise ValueError(f"Unknown profile modes {sorted(unknown)}, expected some of {PROFILE_MODES}")
+        self.directory = directory
+        self.modes = tuple(modes)
+        self.sample_interval = sample_interval
+        self.max_snapshots = max_snapshots
+        self.top = top
+        self.run_id = None
+        self.regions = {}
+        self.samples = Counter()
+        self.files = []
+        self._profile = None
+        self._snapshots = 0
+        self._sampler = None
+        self._stop_sampling = threading.Event()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        global _active
+        if _active is not None:
+            raise RuntimeError("A profiler is already running")
+        os.makedirs(self.directory, exist_ok=True)
+        self.run_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}"
+        # Imported here so that importing the library stays cheap
+        import cProfile
+        import tracemalloc
+
+        if "memory" in self.modes and not tracemalloc.is_tracing():
+            tracemalloc.start(25)
+        if "sample" in self.modes:
+            self._stop_sampling.clear()
+            self._sampler = threading.Thread(target=self._sample, name="toolshed-mcp-sampler", daemon=True)
+            self._sampler.start()
+        if "cprofile" in self.modes:
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        _active = self
+        return self
+
+    def _path(self, suffix):
+        path = os.path.join(self.directory, f"{self.run_id}{suffix}")
+        self.files.append(path)
+        return path
+
+    def _sample(self):
+        own = threading.get_ident()
+        while not self._stop_sampling.wait(self.sample_interval):
+            for ident, frame in sys._current_frames().items():
+                if ident == own:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+                    frame = frame.f_back
+                self.samples[";".join(reversed(stack))] += 1
+
+    def snapshot(self, label):
+        """Dump a tracemalloc snapshot and a summary of its top allocation sites"""
+        import tracemalloc
+
+        if "memory" not in self.modes or not tracemalloc.is_tracing() or self._snapshots >= self.max_snapshots:
+            return
+        self._snapshots += 1
+        name = "".join(c if c.isalnum() or c in "-_." else "_" for c in label)
+        snapshot = tracemalloc.take_snapshot()
+        snapshot.dump(self._path(f"-{self._snapshots:02d}-{name}.tracemalloc"))
+        current, peak = tracemalloc.get_traced_memory()
+        with open(self._path(f"-{self._snapshots:02d}-{name}.txt"), "w", encoding="utf-8") as f:
+            f.write(f"traced: {current} bytes, peak: {peak} bytes\n")
+            for stat in snapshot.statistics("lineno")[:self.top]:
+                f.write(f"{stat}\n")
+
+    def stop(self):
+        """Stop profiling and write the run's files; returns their paths"""
+        global _active
+        if _active is not self:
+            return self.files
+        _active = None
+        if self._profile is not None:
+            self._profile.disable()
+            self._profile.dump_stats(self._path(".pstats"))
+            self._profile = None
+        if self._sampler is not None:
+            self._stop_sampling.set()
+            self._sampler.join()
+            self._sampler = None
+            with open(self._path(".folded"), "w", encoding="utf-8") as f:
+                for stack, count in self.samples.most_common():
+                    f.write(f"{stack} {count}\n")
+        if "memory" in self.modes:
+            import tracemalloc
+
+            self._snapshots = min(self._snapshots, self.max_snapshots - 1)
+            self.snapshot("stop")
+            tracemalloc.stop()
+        with open(self._path(".regions.json"), "w", encoding="utf-8") as f:
+            json.dump({
+                name: {"count": count, "total_ms": round(total * 1000, 3), "max_ms": round(peak * 1000, 3)}
+                for name, (count, total, peak) in sorted(self.regions.items())
+            }, f, indent=2)
+        return self.files
+
+
+def modes_from_string(value):
+    return tuple(mode.strip() for mode in value.split(",") if mode.strip())
+
+
+def start_from_env():
+    """Start a profiler for the process when TOOLSHED_MCP_PROFILE is set"""
+    directory = os.environ.get(ENV_DIR)
+    if not directory or _active is not None:
+        return None
+    profiler = Profiler(directory, modes_from_string(os.environ.get(ENV_MODES, "cprofile")))
+    profiler.start()
+    atexit.register(profiler.stop)
+    return profiler
+
+
+start_from_env()
@@ -0,0 +1,145 @@
+"""
+Readiness gate for freshly started servers
+
+wait_ready() replaces fixed sleeps before talking to a new Fargate
+task. It polls the endpoint with cheap HTTP checks spaced by jittered
+exponential backoff. Once the app answers, it tries the real thing:
+connect, initialize and tools/list. It returns as soon as that
+succeeds, together with the open session and the time-to-first-tool.
+"""
+import asyncio
+import json
+import logging
+import os
+import random
+import time
+
+import httpx
+
+from .discovery import DiscoveryCache
+from .log import event, get_logger
+
+log = get_logger("readiness")
+
+
+class NotReady(Exception):
+    """The server did not become ready before the deadline"""
+
+
+class ReadyReport:
+    """Outcome of a readiness wait; `session` is connected and initialized"""
+
+    def __init__(self, url, image, session, tools, attempts, http_after, ready_after):
+        self.url = url
+        self.image = image
+        self.session = session
+        self.tools = tools
+        self.attempts = attempts
+        self.http_after = http_after
+        self.ready_after = ready_after
+
+    def summary(self):
+        return {
+            "url": self.url,
+            "image": self.image,
+            "tools": len(self.tools),
+            "attempts": self.attempts,
+            "time_to_http_ms": round(self.http_after * 1000, 1) if self.http_after is not None else None,
+            "time_to_first_tool_ms": round(self.ready_after * 1000, 1),
+            "at": round(time.time(), 3),
+        }
+
+
+async def wait_ready(server_url, timeout=300.0, image=None, since=None, initial_delay=0.25, max_delay=5.0,
+                     check_timeout=3.0, session_timeout=30.0, discovery=None, **session_kwargs):
+    """
+    Wait until server_url serves tools/list and return a ReadyReport
+
+    Args:
+        server_url: Base URL of the new server
+        timeout: Seconds to wait before raising NotReady
+        image: Container image, recorded with the metric and used as the
+            discovery cache key
+        since: time.time() at which the task was started; time-to-first-tool
+            is measured from there instead of from the call
+        initial_delay: First pause between checks, doubled up to max_delay
+        check_timeout: Timeout of each individual check, including the
+            connect and tools/list of the session
+        session_timeout: Request timeout of the returned session
+        discovery: DiscoveryCache used to connect (default: the user cache)
+        **session_kwargs: Passed on to the session
+    """
+    discovery = discovery or DiscoveryCache(probe_timeout=check_timeout)
+    started = time.monotonic()
+    origin = started - (time.time() - since) if since is not None else started
+    deadline = started + timeout
+    delay = initial_delay
+    attempts = 0
+    http_after = None
+    last_error = None
+
+    async with httpx.AsyncClient(timeout=check_timeout) as client:
+        while True:
+            attempts += 1
+            try:
+                if http_after is None:
+                    # Cheap check first: is anything answering on the port?
+                    response = await client.get(server_url)
+                    if response.status_code >= 500:
+                        raise ConnectionError(f"HTTP {response.status_code}")
+                    http_after = time.monotonic() - origin
+                    event(log, logging.INFO, "server answering", url=server_url, attempts=attempts,
+                          ms=round(http_after * 1000, 1))
+                session = await discovery.connect(server_url, image=image, timeout=check_timeout, **session_kwargs)
+                try:
+                    tools = await session.list_tools()
+                except BaseException:
+                    await session.close()
+                    raise
+            except Exception as e:
+                last_error = str(e) or type(e).__name__
+                event(log, logging.DEBUG, "not ready", url=server_url, attempts=attempts, error=last_error)
+            else:
+                # Checks fail fast; the session handed back gets the normal timeout
+                session.set_timeout(session_timeout)
+                report = ReadyReport(server_url, image, session, tools, attempts, http_after,
+                                     time.monotonic() - origin)
+                event(log, logging.INFO, "ready", **report.summary())
+                return report
+
+            now = time.monotonic()
+            if now >= deadline:
+                raise NotReady(f"{server_url} not ready after {timeout:.0f} s ({attempts} checks): {last_error}")
+            pause = min(delay, max_delay) * random.uniform(0.8, 1.2)
+            delay *= 2
+            await asyncio.sleep(min(pause, deadline - now))
+
+
+def append_metric(path, report):
+    """Append a report's summary to a JSONL metrics file"""
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps(report.summary(), separators=(",", ":")) + "\n")
+
+
+def summarize_metrics(path):
+    """Time-to-first-tool percentiles per image from a metrics file"""
+    from .metrics import percentile
+
+    by_image = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            by_image.setdefault(record.get("image") or "<none>", []).append(record["time_to_first_tool_ms"])
+    return {
+        image: {
+            "runs": len(values),
+            "p50_ms": percentile(values, 50),
+            "p95_ms": percentile(values, 95),
+            "max_ms": max(values),
+        }
+        for image, values in sorted(by_image.items())
+    }
@@ -0,0 +1,369 @@
+"""
+Session record-and-replay
+
+A recording is an append-only binary file of records, each a 17 byte
+header (kind, exchange id, seconds since the recording started, payload
+length) followed by the payload. Every process appending to the file
+first writes a START record, so runs can be appended one after another.
+One HTTP exchange produces a REQUEST
+record (JSON metadata, a newline, then the body), a RESPONSE record (status
+and headers), one CHUNK record per body chunk as received from the
+wire, and an END record. SSE streams are therefore captured byte for byte
+with their arrival times.
+
+ReplayServer serves a recording back as a fake MCP server at recorded
+speed, N times faster, or as fast as the client can take it.
+"""
+import asyncio
+import json
+import re
+import struct
+import time
+from http import HTTPStatus
+from urllib.parse import parse_qs, urlparse
+
+import httpx
+
+START = 0
+REQUEST = 1
+RESPONSE = 2
+CHUNK = 3
+END = 4
+
+_HEADER = struct.Struct("<BIdI")
+_SESSION_ID = re.compile(rb"session_id=([A-Za-z0-9_-]+)")
+_RECORDED_HEADERS = ("content-type", "content-encoding")
+
+
+class Recorder:
+    """
+    Append-only writer of recording records
+
+    Use Recorder.open(path): sessions recording to the same file share one
+    writer, so exchange ids stay unique within the run.
+    """
+
+    _open = {}
+
+    def __init__(self, path):
+        self.path = path
+        self._file = open(path, "ab")
+        self._started = time.monotonic()
+        self._next_id = 0
+        self._users = 0
+        self.write(START, 0, json.dumps({"started": time.time()}).encode())
+
+    @classmethod
+    def open(cls, path):
+        recorder = cls._open.get(path)
+        if recorder is None:
+            recorder = cls._open[path] = cls(path)
+        recorder._users += 1
+        return recorder
+
+    def new_exchange(self):
+        self._next_id += 1
+        return self._next_id
+
+    def write(self, kind, exchange, payload=b""):
+        offset = time.monotonic() - self._started
+        self._file.write(_HEADER.pack(kind, exchange, offset, len(payload)))
+        self._file.write(payload)
+        self._file.flush()
+
+    def close(self):
+        """Release one user; the file is closed when the last one is done"""
+        self._users -= 1
+        if self._users <= 0:
+            self._file.close()
+            if Recorder._open.get(self.path) is self:
+                del Recorder._open[self.path]
+
+
+def read_records(path):
+    """Yield (kind, exchange, offset, payload) from a recording"""
+    with open(path, "rb") as f:
+        while True:
+            header = f.read(_HEADER.size)
+            if len(header) < _HEADER.size:
+                return
+            kind, exchange, offset, length = _HEADER.unpack(header)
+            yield kind, exchange, offset, f.read(length)
+
+
+class _RecordingStream(httpx.AsyncByteStream):
+    def __init__(self, stream, recorder, exchange):
+        self._stream = stream
+        self._recorder = recorder
+        self._exchange = exchange
+
+    async def __aiter__(self):
+        async for chunk in self._stream:
+            self._recorder.write(CHUNK, self._exchange, chunk)
+            yield chunk
+
+    async def aclose(self):
+        self._recorder.write(END, self._exchange)
+        await self._stream.aclose()
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """httpx transport that records every exchange passing through it"""
+
+    def __init__(self, recorder, transport=None):
+        self.recorder = recorder
+        self.transport = transport or httpx.AsyncHTTPTransport()
+
+    async def handle_async_request(self, request):
+        exchange = self.recorder.new_exchange()
+        meta = {"method": request.method, "url": str(request.url)}
+        if "content-length" in request.headers:
+            body = await request.aread()
+        else:
+            # Streamed bodies are not buffered just to record them
+            body = b""
+            meta["streamed"] = True
+        meta = json.dumps(meta).encode()
+        self.recorder.write(REQUEST, exchange, meta + b"\n" + body)
+
+        response = await self.transport.handle_async_request(request)
+        headers = {k: v for k, v in response.headers.items() if k.lower() in _RECORDED_HEADERS}
+        self.recorder.write(RESPONSE, exchange, json.dumps(
+            {"status": response.status_code, "headers": headers}
+        ).encode())
+        return httpx.Response(
+            status_code=response.status_code,
+            headers=response.headers,
+            stream=_RecordingStream(response.stream, self.recorder, exchange),
+            extensions=response.extensions,
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+        self.recorder.close()
+
+
+def recording_client(path, **client_kwargs):
+    """httpx.AsyncClient that appends everything it sends and receives to path"""
+    return httpx.AsyncClient(transport=RecordingTransport(Recorder.open(path)), **client_kwargs)
+
+
+class _Exchange:
+    def __init__(self, exchange):
+        self.id = exchange
+        self.method = None
+        self.url = None
+        self.body = b""
+        self.requested_at = 0.0
+        self.status = 200
+        self.headers = {}
+        self.chunks = []
+
+    @property
+    def is_stream(self):
+        return self.method == "GET" and self.headers.get("content-type", "").startswith("text/event-stream")
+
+
+def load_recording(path):
+    """
+    Group a recording's records into exchanges, ordered by request time
+
+    Runs appended to the same file are laid end to end on one timeline.
+    """
+    exchanges = {}
+    run = 0
+    base = 0.0
+    latest = 0.0
+    for kind, exchange_id, offset, payload in read_records(path):
+        if kind == START:
+            run += 1
+            base = latest
+            continue
+        offset += base
+        latest = max(latest, offset)
+        key = (run, exchange_id)
+        exchange = exchanges.setdefault(key, _Exchange(key))
+        if kind == REQUEST:
+            meta, _, body = payload.partition(b"\n")
+            meta = json.loads(meta)
+            exchange.method = meta["method"]
+            exchange.url = meta["url"]
+            exchange.body = body
+            exchange.requested_at = offset
+        elif kind == RESPONSE:
+            meta = json.loads(payload)
+            exchange.status = meta["status"]
+            exchange.headers = {k.lower(): v for k, v in meta["headers"].items()}
+        elif kind == CHUNK:
+            exchange.chunks.append((offset, payload))
+    return sorted(exchanges.values(), key=lambda e: e.requested_at)
+
+
+class _ReplayStream:
+    """One recorded event stream and the POSTs its chunks depend on"""
+
+    def __init__(self, exchange, posts):
+        self.exchange = exchange
+        self.session_id = None
+        for _, chunk in exchange.chunks:
+            match = _SESSION_ID.search(chunk)
+            if match:
+                self.session_id = match.group(1).decode()
+                break
+        self.posts = posts.get(self.session_id, [])
+        self.received = 0
+        self.arrived = asyncio.Event()
+
+    def schedule(self):
+        """(chunk, POSTs that must have arrived first, delay after that point)"""
+        previous = self.exchange.requested_at
+        for offset, chunk in self.exchange.chunks:
+            required = sum(1 for post in self.posts if post.requested_at < offset)
+            anchor = max(previous, self.posts[required - 1].requested_at if required else previous)
+            yield chunk, required, max(0.0, offset - anchor)
+            previous = offset
+
+
+class ReplayServer:
+    """
+    Serve a recording as a fake MCP server
+
+    Each incoming event-stream GET is served the next recorded stream. A
+    chunk that followed a POST in the recording is held back until the
+    client has sent that many POSTs for the session, then released after
+    the recorded gap divided by speed (speed=None means no delays).
+    """
+
+    def __init__(self, path, speed=1.0, host="127.0.0.1", port=0):
+        self.speed = speed
+        self.host = host
+        self.port = port
+        exchanges = load_recording(path)
+        posts = {}
+        for exchange in exchanges:
+            if exchange.method == "POST":
+                session_id = parse_qs(urlparse(exchange.url).query).get("session_id", [None])[0]
+                posts.setdefault(session_id, []).append(exchange)
+        self._streams = [_ReplayStream(e, posts) for e in exchanges if e.is_stream]
+        self._by_session = {s.session_id: s for s in self._streams}
+        self._others = [e for e in exchanges if not e.is_stream and e.method != "POST"]
+        self._server = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}"
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.stop()
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                method, target, _ = request_line.split(" ", 2)
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                await _read_body(reader, headers)
+                if method == "GET" and "text/event-stream" in headers.get("accept", "") and self._streams:
+                    await self._serve_stream(self._streams.pop(0), writer)
+                    return
+                if method == "POST":
+                    self._serve_post(target, writer)
+                else:
+                    self._serve_other(method, target, writer)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _serve_stream(self, stream, writer):
+        exchange = stream.exchange
+        writer.write(_status_line(exchange.status, exchange.headers, close=True))
+        for chunk, required, delay in stream.schedule():
+            while stream.received < required:
+                stream.arrived.clear()
+                await stream.arrived.wait()
+            if self.speed and delay:
+                await asyncio.sleep(delay / self.speed)
+            writer.write(chunk)
+            await writer.drain()
+
+    def _serve_post(self, target, writer):
+        session_id = parse_qs(urlparse(target).query).get("session_id", [None])[0]
+        stream = self._by_session.get(session_id)
+        if stream is None:
+            writer.write(_response(404, {}, b"Not Found"))
+            return
+        index = stream.received
+        stream.received += 1
+        stream.arrived.set()
+        if index < len(stream.posts):
+            recorded = stream.posts[index]
+            body = b"".join(chunk for _, chunk in recorded.chunks)
+            writer.write(_response(recorded.status, recorded.headers, body))
+        else:
+            writer.write(_response(202, {}, b"Accepted"))
+
+    def _serve_other(self, method, target, writer):
+        for i, exchange in enumerate(self._others):
+            recorded = urlparse(exchange.url)
+            path = recorded.path + (f"?{recorded.query}" if recorded.query else "")
+            if exchange.method == method and path == target:
+                self._others.pop(i)
+                body = b"".join(chunk for _, chunk in exchange.chunks)
+                writer.write(_response(exchange.status, exchange.headers, body))
+                return
+        writer.write(_response(404, {}, b"Not Found"))
+
+
+async def _read_body(reader, headers):
+    if "content-length" in headers:
+        return await reader.readexactly(int(headers["content-length"]))
+    if headers.get("transfer-encoding", "").lower() == "chunked":
+        body = bytearray()
+        while True:
+            size = int((await reader.readline()).split(b";")[0].strip(), 16)
+            if size == 0:
+                await reader.readline()
+                return bytes(body)
+            body += await reader.readexactly(size)
+            await reader.readline()
+    return b""
+
+
+def _status_line(status, headers, close=False):
+    try:
+        reason = HTTPStatus(status).phrase
+    except ValueError:
+        reason = "Unknown"
+    lines = [f"HTTP/1.1 {status} {reason}"]
+    lines += [f"{name}: {value}" for name, value in headers.items()]
+    if close:
+        lines.append("Connection: close")
+    return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+
+def _response(status, headers, body):
+    headers = dict(headers, **{"content-length": str(len(body))})
+    return _status_line(status, headers) + body
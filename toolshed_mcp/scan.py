@@ -0,0 +1,438 @@
+import asyncio
+import hashlib
+import heapq
+import json
+import logging
+import os
+
+from .cache import canonical_json
+from .log import event, get_logger
+from .session import MCPSession
+from .storage import atomic_write
+from .stream import FileText
+
+log = get_logger("scan")
+
+DEFAULT_TOOL = "semgrep_scan"
+SKIP_DIRS = {".git", "node_modules", "__pycache__", ".next", ".venv", "venv", "dist", "build"}
+
+
+class ScanError(Exception):
+    """The scan tool reported an error instead of findings"""
+
+
+def collect_files(root, extensions=None, skip_dirs=SKIP_DIRS):
+    """Return sorted paths (relative to root) of the files to scan"""
+    paths = []
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = [d for d in dirnames if d not in skip_dirs]
+        for filename in filenames:
+            if extensions and os.path.splitext(filename)[1] not in extensions:
+                continue
+            full = os.path.join(dirpath, filename)
+            paths.append(os.path.relpath(full, root).replace(os.sep, "/"))
+    return sorted(paths)
+
+
+def file_digest(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def error_path(error):
+    """File a semgrep error entry refers to, or None for errors not tied to a file"""
+    path = error.get("path")
+    if path:
+        return path
+    for span in error.get("spans") or ():
+        if isinstance(span, dict) and span.get("file"):
+            return span["file"]
+    return None
+
+
+def match_path(path, known):
+    """
+    The path in known that path refers to, or None
+
+    Servers scan copies of the submitted files, so a finding may name
+    '/tmp/semgrep_scan_x1y2/src/app.py' for 'src/app.py'. The longest
+    trailing run of components found in known wins.
+    """
+    if not path:
+        return None
+    if path in known:
+        return path
+    parts = path.replace("\\", "/").split("/")
+    for i in range(1, len(parts)):
+        candidate = "/".join(parts[i:])
+        if candidate in known:
+            return candidate
+    return None
+
+
+def parse_findings(result, errors=None):
+    """
+    Extract semgrep findings from a tools/call result
+
+    Args:
+        result: tools/call result holding semgrep's JSON output
+        errors: Optional list that semgrep's `errors` entries (files it
+            timed out or failed to parse, ...) are appended to
+    """
+    if result.get("isError"):
+        texts = [c.get("text", "") for c in result.get("content", []) if c.get("type") == "text"]
+        raise ScanError("; ".join(texts) or "scan tool returned an error")
+    findings = []
+    for item in result.get("content", []):
+        if item.get("type") != "text":
+            continue
+        try:
+            payload = json.loads(item["text"])
+        except (json.JSONDecodeError, KeyError):
+            continue
+        if isinstance(payload, dict):
+            findings.extend(payload.get("results", []))
+            if errors is not None:
+                errors.extend(error for error in payload.get("errors") or () if isinstance(error, dict))
+    return findings
+
+
+def finding_key(finding):
+    """Sort/dedupe key identifying one finding"""
+    start = finding.get("start", {})
+    end = finding.get("end", {})
+    return (
+        finding.get("path", ""),
+        start.get("line", 0),
+        start.get("col", 0),
+        end.get("line", 0),
+        end.get("col", 0),
+        finding.get("check_id", ""),
+    )
+
+
+def scan_arguments(files, config=None):
+    """Build semgrep_scan arguments for {path: content}; content may be a FileText"""
+    arguments = {
+        "code_files": [{"filename": path, "content": content} for path, content in files.items()]
+    }
+    if config:
+        arguments["config"] = config
+    return arguments
+
+
+async def scan_files(session, files, tool=DEFAULT_TOOL, config=None, errors=None):
+    """Scan {path: content} in a single tool call and return the findings (errors: see parse_findings)"""
+    if not files:
+        return []
+    result = await session.call_tool(tool, scan_arguments(files, config))
+    return parse_findings(result, errors)
+
+
+class ScanIndex:
+    """
+    Persistent map of file path -> (content hash, findings)
+
+    The index is only valid for the server, tool and config it was built
+    with; a different fingerprint starts it over empty.
+    """
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.files = {}
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # Missing or corrupt: a full scan rebuilds it
+            return
+        if isinstance(data, dict) and data.get("fingerprint") == fingerprint:
+            self.files = data.get("files", {})
+
+    def save(self):
+        """Write the index atomically"""
+        data = {"fingerprint": self.fingerprint, "files": self.files}
+        atomic_write(self.path, lambda f: json.dump(data, f, separators=(",", ":")))
+
+
+class ScanReport:
+    """Merged result of an incremental scan"""
+
+    def __init__(self, findings, scanned, reused, removed, errors=()):
+        self.findings = findings
+        self.scanned = scanned
+        self.reused = reused
+        self.removed = removed
+        self.errors = list(errors)
+
+    def summary(self):
+        return {
+            "findings": len(self.findings),
+            "scanned": len(self.scanned),
+            "reused": len(self.reused),
+            "removed": len(self.removed),
+            "errors": len(self.errors),
+        }
+
+
+class IncrementalScanner:
+    """
+    Scan a repository, submitting only files whose content changed
+
+    Findings of unchanged files come from the index, so a rescan costs
+    roughly the size of the diff rather than the size of the repository.
+
+    Args:
+        session: Initialized MCPSession (or anything with call_tool), or a
+            ShardedScanner to fan the changed files out across replicas
+        index_path: JSON file holding the hash index between runs
+        tool: Scan tool name
+        config: Semgrep config passed to the tool (e.g. 'auto', 'p/python')
+        batch_bytes: Upper bound on file content per tool call
+    """
+
+    def __init__(self, session, index_path, tool=DEFAULT_TOOL, config=None, batch_bytes=4 * 1024 * 1024):
+        self.session = session
+        self.index_path = index_path
+        self.tool = tool
+        self.config = config
+        self.batch_bytes = batch_bytes
+
+    def fingerprint(self):
+        server = getattr(self.session, "server_key", "")
+        return file_digest(canonical_json([server, self.tool, self.config]).encode())
+
+    async def scan_directory(self, root, extensions=None):
+        """Scan every file under root"""
+        paths = collect_files(root, extensions)
+        return await self.scan(
+            paths,
+            lambda path: _read(os.path.join(root, path)),
+            stream=lambda path: FileText(os.path.join(root, path)),
+        )
+
+    async def scan(self, paths, read, stream=None):
+        """
+        Scan the given paths
+
+        Args:
+            paths: Relative paths making up the complete file set
+            read: Callable returning the bytes of a path
+            stream: Optional callable returning a FileText for a path; changed
+                files are then streamed to the server instead of being held
+                in memory until their batch is sent
+        """
+        index = ScanIndex(self.index_path, self.fingerprint())
+        previous = index.files
+        current = {}
+        changed = {}
+        for path in paths:
+            data = read(path)
+            digest = file_digest(data)
+            entry = previous.get(path)
+            if entry is not None and entry["sha256"] == digest:
+                current[path] = entry
+            else:
+                changed[path] = stream(path) if stream else data.decode("utf-8", errors="replace")
+                current[path] = {"sha256": digest, "findings": []}
+
+        errors = []
+        unmatched = []
+        for finding in await self._scan_changed(changed, errors):
+            path = match_path(finding.get("path"), changed)
+            if path is not None:
+                current[path]["findings"].append(dict(finding, path=path))
+            else:
+                unmatched.append(finding)
+
+        # Files semgrep failed on are reported but not indexed, so the next run scans them again
+        failed = {match_path(error_path(error), changed) for error in errors} - {None}
+        if unmatched:
+            # Their files cannot be told apart, so none of the changed files is trusted to the index
+            failed = set(changed)
+            event(log, logging.WARNING, "findings for unknown paths", count=len(unmatched),
+                  paths=sorted({str(f.get("path")) for f in unmatched})[:10])
+        for error in errors:
+            event(log, logging.WARNING, "scan error", path=error_path(error), type=error.get("type"),
+                  severity=error.get("level"), message=error.get("message"))
+
+        removed = sorted(set(previous) - set(current))
+        event(log, logging.INFO, "incremental scan", changed=len(changed),
+              unchanged=len(current) - len(changed), removed=len(removed), failed=len(failed))
+        index.files = {path: entry for path, entry in current.items() if path not in failed}
+        index.save()
+
+        findings = [f for path in sorted(current) for f in current[path]["findings"]] + unmatched
+        findings.sort(key=finding_key)
+        reused = sorted(set(current) - set(changed))
+        return ScanReport(findings, sorted(changed), reused, removed, errors)
+
+    async def _scan_changed(self, files, errors):
+        if isinstance(self.session, ShardedScanner):
+            return await self.session.scan_files(files, errors)
+        findings = []
+        for batch in self._batches(files):
+            findings.extend(await scan_files(self.session, batch, self.tool, self.config, errors))
+        return findings
+
+    def _batches(self, files):
+        batch = {}
+        size = 0
+        for path, content in files.items():
+            if batch and size + len(content) > self.batch_bytes:
+                yield batch
+                batch = {}
+                size = 0
+            batch[path] = content
+            size += len(content)
+        if batch:
+            yield batch
+
+
+def make_shards(files, count):
+    """
+    Split {path: content} into at most count shards of similar total size
+
+    Largest files are placed first, each into the currently lightest shard,
+    so the result is deterministic for a given file set.
+    """
+    count = max(1, min(count, len(files)))
+    heap = [(0, i) for i in range(count)]
+    shards = [{} for _ in range(count)]
+    for path in sorted(files, key=lambda p: (-len(files[p]), p)):
+        size, i = heapq.heappop(heap)
+        shards[i][path] = files[path]
+        heapq.heappush(heap, (size + len(files[path]), i))
+    return [shard for shard in shards if shard]
+
+
+def merge_findings(batches):
+    """Merge finding lists, dropping duplicates, in a deterministic order"""
+    merged = {}
+    for findings in batches:
+        for finding in findings:
+            merged.setdefault(finding_key(finding), finding)
+    return [merged[key] for key in sorted(merged)]
+
+
+class ShardedScanner:
+    """
+    Scan a file set in parallel across several sessions and server replicas
+
+    Files are split into size-balanced shards which a worker per session
+    pulls from a shared queue; failed shards are re-queued up to `retries`
+    times so another session (or replica) can pick them up.
+
+    Args:
+        server_urls: Base URLs of replicas running the same scan server
+        sessions_per_server: Concurrent sessions opened to each replica
+        tool: Scan tool name
+        config: Semgrep config passed to the tool
+        shards_per_worker: Shards created per session, for load balancing
+        retries: Extra attempts per shard before the scan fails
+        record: Optional recording file for every session's traffic
+    """
+
+    def __init__(self, server_urls, sessions_per_server=2, tool=DEFAULT_TOOL, config=None,
+                 shards_per_worker=4, retries=2, timeout=120.0, record=None):
+        self.server_urls = list(server_urls)
+        self.sessions_per_server = sessions_per_server
+        self.tool = tool
+        self.config = config
+        self.shards_per_worker = shards_per_worker
+        self.retries = retries
+        self.timeout = timeout
+        self.record = record
+        self.sessions = []
+        self.failed_urls = {}
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @property
+    def server_key(self):
+        return self.sessions[0].server_key if self.sessions else ""
+
+    async def connect(self):
+        """Open and initialize all sessions; unreachable replicas are skipped"""
+        async def open_session(url):
+            session = MCPSession(url, timeout=self.timeout, record=self.record)
+            try:
+                await session.connect()
+                await session.initialize()
+            except Exception:
+                await session.close()
+                raise
+            return session
+
+        urls = [url for url in self.server_urls for _ in range(self.sessions_per_server)]
+        results = await asyncio.gather(*(open_session(url) for url in urls), return_exceptions=True)
+        for url, result in zip(urls, results):
+            if isinstance(result, BaseException):
+                self.failed_urls[url] = result
+            else:
+                self.sessions.append(result)
+        if not self.sessions:
+            raise ConnectionError(f"No scan server reachable: {self.failed_urls}")
+
+    async def scan_files(self, files, errors=None):
+        """Scan {path: content} and return merged, deduplicated findings (errors: see parse_findings)"""
+        if not files:
+            return []
+        queue = asyncio.Queue()
+        for shard in make_shards(files, len(self.sessions) * self.shards_per_worker):
+            queue.put_nowait((shard, 0))
+        results = []
+
+        async def worker(session):
+            while True:
+                shard, attempt = await queue.get()
+                try:
+                    shard_errors = []
+                    results.append(await scan_files(session, shard, self.tool, self.config, shard_errors))
+                    if errors is not None:
+                        # Only from the attempt that succeeded, so a retried shard is not counted twice
+                        errors.extend(shard_errors)
+                except ScanError:
+                    raise
+                except Exception as e:
+                    if attempt >= self.retries:
+                        raise ScanError(f"Shard of {len(shard)} files failed: {e}") from e
+                    event(log, logging.WARNING, "shard retry", server=session.server_url,
+                          files=len(shard), attempt=attempt + 1, error=str(e) or type(e).__name__)
+                    queue.put_nowait((shard, attempt + 1))
+                    if not session.connected:
+                        # This session's stream is gone; leave the shard to the others
+                        return
+                finally:
+                    queue.task_done()
+
+        workers = [asyncio.create_task(worker(session)) for session in self.sessions]
+        done = asyncio.create_task(queue.join())
+        try:
+            while not done.done():
+                alive = [task for task in workers if not task.done()]
+                if not alive:
+                    raise ScanError("All scan sessions failed before the scan completed")
+                await asyncio.wait([done, *alive], return_when=asyncio.FIRST_COMPLETED)
+                for task in workers:
+                    if task.done() and not task.cancelled() and task.exception():
+                        raise task.exception()
+        finally:
+            for task in [done, *workers]:
+                task.cancel()
+            await asyncio.gather(done, *workers, return_exceptions=True)
+        return merge_findings(results)
+
+    async def close(self):
+        await asyncio.gather(*(session.close() for session in self.sessions), return_exceptions=True)
+        self.sessions = []
+
+
+def _read(path):
+    with open(path, "rb") as f:
+        return f.read()
@@ -0,0 +1,153 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from .limiter import AdaptiveLimit, is_overload
+from .metrics import LatencyWindow
+
+PRIORITIES = ("interactive", "default", "batch")
+
+
+class _ServerQueue:
+    """Waiting calls and in-flight count for one server"""
+
+    def __init__(self, limit, limiter=None):
+        self.limit = limiter.limit if limiter is not None else limit
+        self.limiter = limiter
+        self.in_flight = 0
+        self.heaps = {priority: [] for priority in PRIORITIES}
+        self.virtual_time = {priority: 0.0 for priority in PRIORITIES}
+        self.finish = {}
+
+    def queued(self):
+        return sum(len(heap) for heap in self.heaps.values())
+
+
+class CallScheduler:
+    """
+    Client-side scheduler for calls against a fleet of servers
+
+    Calls wait in per-server queues. A free slot always goes to the highest
+    priority class with waiting calls; within a class, tenants share slots
+    in proportion to their weights (self-clocked weighted fair queuing), so
+    one tenant's bulk traffic cannot starve another's.
+
+    Args:
+        max_concurrency: Default in-flight limit per server
+        server_limits: Per-server overrides of max_concurrency
+        weights: Tenant name -> share weight (default 1)
+        adaptive: Let an AdaptiveLimit find each server's limit, with the
+            configured limit as its ceiling; a dict sets AdaptiveLimit options
+    """
+
+    def __init__(self, max_concurrency=8, server_limits=None, weights=None, adaptive=False):
+        self.max_concurrency = max_concurrency
+        self.server_limits = dict(server_limits or {})
+        self.weights = dict(weights or {})
+        self.adaptive = adaptive
+        self.delays = {priority: LatencyWindow() for priority in PRIORITIES}
+        self._servers = {}
+        self._seq = itertools.count()
+
+    def _queue(self, server):
+        queue = self._servers.get(server)
+        if queue is None:
+            limit = self.server_limits.get(server, self.max_concurrency)
+            limiter = None
+            if self.adaptive:
+                options = dict(self.adaptive) if isinstance(self.adaptive, dict) else {}
+                options.setdefault("max_limit", limit)
+                options.setdefault("initial", min(4, options["max_limit"]))
+                limiter = AdaptiveLimit(**options)
+            queue = _ServerQueue(limit, limiter)
+            self._servers[server] = queue
+        return queue
+
+    async def submit(self, server, fn, *args, priority="default", tenant="default", cost=1.0):
+        """
+        Run fn(*args) once the scheduler grants it a slot on server
+
+        Args:
+            server: Key of the server the call goes to (usually its URL)
+            fn: Coroutine function performing the call
+            priority: One of PRIORITIES
+            tenant: Fair-share group the call is accounted to
+            cost: Relative size of the call for fair-share accounting
+        """
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority {priority!r}, expected one of {PRIORITIES}")
+        queue = self._queue(server)
+        enqueued = time.monotonic()
+
+        if queue.in_flight < queue.limit and not queue.queued():
+            queue.in_flight += 1
+        else:
+            waiter = asyncio.get_running_loop().create_future()
+            start = max(queue.virtual_time[priority], queue.finish.get((priority, tenant), 0.0))
+            finish = start + cost / self.weights.get(tenant, 1.0)
+            queue.finish[(priority, tenant)] = finish
+            heapq.heappush(queue.heaps[priority], (finish, next(self._seq), waiter))
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Granted a slot just as we were cancelled; hand it on
+                    self._release(queue)
+                raise
+
+        started = time.monotonic()
+        self.delays[priority].add(started - enqueued)
+        overloaded = None
+        try:
+            result = await fn(*args)
+            overloaded = False
+            return result
+        except Exception as e:
+            # Other failures (tool errors, bad arguments) say nothing about load
+            if is_overload(e):
+                overloaded = True
+            raise
+        finally:
+            if queue.limiter is not None and overloaded is not None:
+                queue.limit = queue.limiter.record(time.monotonic() - started, queue.in_flight, overloaded)
+            self._release(queue)
+
+    def _release(self, queue):
+        queue.in_flight -= 1
+        while queue.in_flight < queue.limit:
+            waiter = self._next_waiter(queue)
+            if waiter is None:
+                return
+            queue.in_flight += 1
+            waiter.set_result(None)
+
+    def _next_waiter(self, queue):
+        for priority in PRIORITIES:
+            heap = queue.heaps[priority]
+            while heap:
+                finish, _, waiter = heapq.heappop(heap)
+                if waiter.cancelled():
+                    continue
+                queue.virtual_time[priority] = finish
+                return waiter
+        return None
+
+    async def call_tool(self, session, name, arguments=None, priority="default", tenant="default"):
+        """Schedule session.call_tool against the session's server"""
+        return await self.submit(
+            session.server_url, session.call_tool, name, arguments,
+            priority=priority, tenant=tenant,
+        )
+
+    def stats(self):
+        """Queueing delay per priority class; queue depth and current limit per server"""
+        servers = {}
+        for server, queue in self._servers.items():
+            servers[server] = {"in_flight": queue.in_flight, "queued": queue.queued(), "limit": queue.limit}
+            if queue.limiter is not None:
+                servers[server]["adaptive"] = queue.limiter.stats()
+        return {
+            "queueing_delay": {priority: window.summary() for priority, window in self.delays.items()},
+            "servers": servers,
+        }
@@ -0,0 +1,355 @@
+"""
+Client-side validation of tool arguments against inputSchema
+
+Each schema is compiled once into nested closures. Calling the result
+checks a value without walking the schema dict again, so validating a
+call costs about as much as reading its arguments. The compiler covers
+the JSON Schema keywords that tool schemas use: type, enum, const,
+properties, patternProperties, required, additionalProperties,
+items/prefixItems, length and range bounds, pattern, allOf/anyOf/oneOf/not,
+and local $refs. It
+ignores annotations and any keyword it does not know, so an unusual
+schema is validated less strictly, never more strictly.
+"""
+import re
+
+MAX_ERRORS = 10
+
+
+class ValidationError(Exception):
+    """Arguments rejected by the tool's inputSchema before sending"""
+
+    def __init__(self, tool, errors):
+        self.tool = tool
+        self.errors = errors
+        details = "; ".join(f"{path or '<root>'}: {message}" for path, message in errors)
+        super().__init__(f"Invalid arguments for {tool}: {details}")
+
+
+def _as_json(value):
+    # json.dumps sends tuples as arrays, so compare them as lists
+    if isinstance(value, (list, tuple)):
+        return [_as_json(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _as_json(item) for key, item in value.items()}
+    return value
+
+
+def _is_integer(value):
+    if isinstance(value, bool):
+        return False
+    return isinstance(value, int) or (isinstance(value, float) and value.is_integer())
+
+
+_TYPE_CHECKS = {
+    "string": lambda v: isinstance(v, str),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "integer": _is_integer,
+    "boolean": lambda v: isinstance(v, bool),
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, (list, tuple)),
+    "null": lambda v: v is None,
+}
+
+
+def _format_path(path):
+    # Paths are built as cheap (parent, key) pairs and only spelled out
+    # for the errors that are reported
+    parts = []
+    while path is not None:
+        path, key = path
+        parts.append(f"[{key}]" if isinstance(key, int) else f".{key}")
+    return "".join(reversed(parts)).lstrip(".")
+
+
+class _Compiler:
+    def __init__(self, root):
+        self.root = root
+        self.refs = {}
+
+    def ref(self, pointer):
+        validator = self.refs.get(pointer)
+        if validator is not None:
+            return validator
+        if not pointer.startswith("#"):
+            # Remote refs are not fetched; accept anything
+            return _accept
+        target = self.root
+        for part in pointer.lstrip("#").strip("/").split("/"):
+            if not part:
+                continue
+            part = part.replace("~1", "/").replace("~0", "~")
+            target = target[int(part)] if isinstance(target, list) else target.get(part)
+            if target is None:
+                return _accept
+        # Registered before compiling so recursive schemas terminate
+        compiled = []
+        self.refs[pointer] = lambda value, path, errors: compiled[0](value, path, errors)
+        compiled.append(self.compile(target))
+        return self.refs[pointer]
+
+    def compile(self, schema):
+        if schema is True or schema == {}:
+            return _accept
+        if schema is False:
+            return _reject
+        if not isinstance(schema, dict):
+            return _accept
+        checks = []
+        if "$ref" in schema:
+            checks.append(self.ref(schema["$ref"]))
+
+        types = schema.get("type")
+        if types is not None:
+            names = [types] if isinstance(types, str) else list(types)
+            # A type name we do not know might match anything; checking only the known ones would reject it
+            tests = [_TYPE_CHECKS[name] for name in names] if all(name in _TYPE_CHECKS for name in names) else []
+            expected = " or ".join(names)
+            if tests:
+                def check_type(value, path, errors, tests=tests, expected=expected):
+                    for test in tests:
+                        if test(value):
+                            return True
+                    errors.append((path, f"expected {expected}, got {type(value).__name__}"))
+                    return False
+                checks.append(check_type)
+
+        if "enum" in schema:
+            options = schema["enum"]
+
+            def check_enum(value, path, errors):
+                if isinstance(value, (list, tuple, dict)):
+                    value = _as_json(value)
+                if value not in options:
+                    errors.append((path, f"must be one of {options}"))
+            checks.append(check_enum)
+
+        if "const" in schema:
+            constant = schema["const"]
+
+            def check_const(value, path, errors):
+                if isinstance(value, (list, tuple, dict)):
+                    value = _as_json(value)
+                if value != constant:
+                    errors.append((path, f"must be {constant!r}"))
+            checks.append(check_const)
+
+        checks.extend(self._object_checks(schema))
+        checks.extend(self._array_checks(schema))
+        checks.extend(self._scalar_checks(schema))
+        checks.extend(self._combinators(schema))
+
+        if not checks:
+            return _accept
+        if len(checks) == 1:
+            return checks[0]
+
+        def validate(value, path, errors):
+            for check in checks:
+                # A failed type check makes the remaining keywords meaningless
+                if check(value, path, errors) is False:
+                    return False
+        return validate
+
+    def _object_checks(self, schema):
+        properties = {name: self.compile(sub) for name, sub in (schema.get("properties") or {}).items()}
+        required = list(schema.get("required") or ())
+        patterns = []
+        for pattern, sub in (schema.get("patternProperties") or {}).items():
+            try:
+                patterns.append((re.compile(pattern), self.compile(sub)))
+            except re.error:
+                # Which names the pattern covers is unknown, so nothing counts as additional
+                patterns = None
+                break
+        additional = schema.get("additionalProperties", True)
+        extra = None if additional is True or patterns is None else self.compile(additional)
+        patterns = patterns or []
+        if not properties and not required and extra is None and not patterns:
+            return []
+
+        def check_object(value, path, errors):
+            if not isinstance(value, dict):
+                return
+            for name in required:
+                if name not in value:
+                    errors.append((path, f"missing required property {name!r}"))
+            for name, item in value.items():
+                validator = properties.get(name)
+                matched = False
+                for pattern, sub in patterns:
+                    if pattern.search(name):
+                        matched = True
+                        sub(item, (path, name), errors)
+                if validator is not None:
+                    validator(item, (path, name), errors)
+                elif not matched and extra is _reject:
+                    errors.append((path, f"unexpected property {name!r}"))
+                elif not matched and extra is not None:
+                    extra(item, (path, name), errors)
+                if len(errors) >= MAX_ERRORS:
+                    return
+        return [check_object]
+
+    def _array_checks(self, schema):
+        checks = []
+        items = schema.get("items")
+        prefix = schema.get("prefixItems")
+        if isinstance(items, list):
+            prefix, items = items, schema.get("additionalItems", True)
+        prefix = [self.compile(sub) for sub in prefix or ()]
+        rest = self.compile(items) if items is not None else _accept
+        if prefix or rest is not _accept:
+            def check_items(value, path, errors):
+                if not isinstance(value, (list, tuple)):
+                    return
+                for i, item in enumerate(value):
+                    (prefix[i] if i < len(prefix) else rest)(item, (path, i), errors)
+                    if len(errors) >= MAX_ERRORS:
+                        return
+            checks.append(check_items)
+        low, high = schema.get("minItems"), schema.get("maxItems")
+        if low is not None or high is not None:
+            def check_count(value, path, errors):
+                if isinstance(value, (list, tuple)):
+                    if low is not None and len(value) < low:
+                        errors.append((path, f"needs at least {low} items"))
+                    if high is not None and len(value) > high:
+                        errors.append((path, f"allows at most {high} items"))
+            checks.append(check_count)
+        return checks
+
+    def _scalar_checks(self, schema):
+        checks = []
+        low, high = schema.get("minLength"), schema.get("maxLength")
+        if low is not None or high is not None:
+            def check_length(value, path, errors):
+                if isinstance(value, str):
+                    if low is not None and len(value) < low:
+                        errors.append((path, f"shorter than {low} characters"))
+                    if high is not None and len(value) > high:
+                        errors.append((path, f"longer than {high} characters"))
+            checks.append(check_length)
+        if "pattern" in schema:
+            try:
+                pattern = re.compile(schema["pattern"])
+            except re.error:
+                pattern = None
+            if pattern is not None:
+                def check_pattern(value, path, errors):
+                    if isinstance(value, str) and not pattern.search(value):
+                        errors.append((path, f"does not match {pattern.pattern!r}"))
+                checks.append(check_pattern)
+        bounds = [(schema.get(key), key) for key in ("minimum", "maximum", "exclusiveMinimum", "exclusiveMaximum")]
+        if any(bound is not None and not isinstance(bound, bool) for bound, _ in bounds):
+            minimum, maximum, exclusive_min, exclusive_max = (bound for bound, _ in bounds)
+
+            def check_range(value, path, errors):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    return
+                if minimum is not None and value < minimum:
+                    errors.append((path, f"less than minimum {minimum}"))
+                if maximum is not None and value > maximum:
+                    errors.append((path, f"greater than maximum {maximum}"))
+                if exclusive_min is not None and not isinstance(exclusive_min, bool) and value <= exclusive_min:
+                    errors.append((path, f"must be greater than {exclusive_min}"))
+                if exclusive_max is not None and not isinstance(exclusive_max, bool) and value >= exclusive_max:
+                    errors.append((path, f"must be less than {exclusive_max}"))
+            checks.append(check_range)
+        return checks
+
+    def _combinators(self, schema):
+        checks = []
+        for sub in schema.get("allOf") or ():
+            checks.append(self.compile(sub))
+        if "anyOf" in schema or "oneOf" in schema:
+            keyword = "anyOf" if "anyOf" in schema else "oneOf"
+            options = [self.compile(sub) for sub in schema[keyword]]
+
+            def check_options(value, path, errors):
+                matched = 0
+                for option in options:
+                    scratch = []
+                    option(value, path, scratch)
+                    if not scratch:
+                        matched += 1
+                        if keyword == "anyOf":
+                            return
+                if keyword == "anyOf" or matched != 1:
+                    errors.append((path, f"must match {'exactly one' if keyword == 'oneOf' else 'at least one'} "
+                                         f"of {len(options)} schemas"))
+            checks.append(check_options)
+        if "not" in schema:
+            negated = self.compile(schema["not"])
+
+            def check_not(value, path, errors):
+                scratch = []
+                negated(value, path, scratch)
+                if not scratch:
+                    errors.append((path, "must not match the 'not' schema"))
+            checks.append(check_not)
+        return checks
+
+
+def _accept(value, path, errors):
+    return None
+
+
+def _reject(value, path, errors):
+    errors.append((path, "no value is allowed here"))
+    return False
+
+
+def compile_schema(schema):
+    """Compile a JSON schema into validate(value) -> list of (path, message) errors"""
+    validator = _Compiler(schema).compile(schema)
+
+    def validate(value):
+        errors = []
+        validator(value, None, errors)
+        return [(_format_path(path), message) for path, message in errors[:MAX_ERRORS]]
+    return validate
+
+
+class ValidatorCache:
+    """
+    Compiled validators for a server's tool catalog
+
+    update() takes a tools/list result and recompiles only schemas that
+    changed; tools that disappeared are dropped. Tools the cache has not
+    seen are not validated.
+    """
+
+    def __init__(self):
+        self._validators = {}
+
+    def __contains__(self, name):
+        return name in self._validators
+
+    def __len__(self):
+        return len(self._validators)
+
+    def update(self, tools):
+        validators = {}
+        for tool in tools:
+            schema = tool.get("inputSchema")
+            if schema is None:
+                continue
+            known = self._validators.get(tool["name"])
+            if known is not None and known[0] == schema:
+                validators[tool["name"]] = known
+            else:
+                validators[tool["name"]] = (schema, compile_schema(schema))
+        self._validators = validators
+
+    def clear(self):
+        self._validators = {}
+
+    def check(self, name, arguments):
+        """Raise ValidationError if arguments do not satisfy the tool's schema"""
+        known = self._validators.get(name)
+        if known is None:
+            return
+        errors = known[1](arguments)
+        if errors:
+            raise ValidationError(name, errors)
@@ -0,0 +1,400 @@
+"""
+Local search over the tool catalogs of every known server
+
+ToolIndex is an inverted index over tool names, descriptions and input
+schema property names. It answers "which server has a tool for X"
+without touching the network. Each server's catalog comes from a
+complete tools/list. Updating it re-indexes only the tools whose
+definition changed.
+
+Postings are compact arrays of doc ids, one per term and field (name,
+property, description), appended in doc id order. Every doc in one such
+array scores the same for a query word, so a query walks the rarest
+word's arrays best first and stops once the top results cannot be beaten.
+Replaced tools are tombstoned and squeezed out when the index is saved.
+Query words match exactly, as a prefix of indexed terms (search as you
+type), or, failing both, with one typo: every edit-distance-1 variant of
+the word is looked up, so fuzzy matching needs no extra index.
+"""
+import array
+import base64
+import bisect
+import gzip
+import hashlib
+import heapq
+import json
+import math
+import os
+import re
+import sys
+
+from .storage import atomic_write
+
+DEFAULT_INDEX_PATH = os.path.expanduser("~/.cache/toolshed-mcp/tool-index.json.gz")
+
+# Postings classes, best first; a term is filed under the best field it appears in
+NAME, PROPERTY, DESCRIPTION = 0, 1, 2
+FIELD_WEIGHTS = (3.0, 1.5, 1.0)
+
+PREFIX_FACTOR = 0.7
+FUZZY_FACTOR = 0.5
+MAX_PREFIX_TERMS = 64
+MIN_FUZZY_LENGTH = 4
+
+_STOPWORDS = frozenset(
+    "a an and are as at be by can for from has have if in into is it its of on or that the this to "
+    "use used uses using was will with you your".split()
+)
+_WORD = re.compile(r"[A-Za-z0-9]+")
+# camelCase parts; digits stay with their letters so s3, ec2 and v2 survive
+_CAMEL = re.compile(r"[A-Z0-9]+(?=[A-Z][a-z])|[A-Z]?[a-z0-9]+|[A-Z0-9]+")
+_ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+
+def _parts(text):
+    for word in _WORD.findall(text):
+        for part in _CAMEL.findall(word):
+            yield part.lower()
+
+
+def identifier_terms(text):
+    """Terms of an identifier: its snake, kebab and camelCase parts"""
+    return set(_parts(text))
+
+
+def text_terms(text):
+    return {word for word in (w.lower() for w in _WORD.findall(text)) if len(word) > 1 and word not in _STOPWORDS}
+
+
+def _property_names(schema, depth=0):
+    if not isinstance(schema, dict) or depth > 4:
+        return
+    for name, sub in (schema.get("properties") or {}).items():
+        yield name
+        yield from _property_names(sub, depth + 1)
+    items = schema.get("items")
+    if isinstance(items, dict):
+        yield from _property_names(items, depth + 1)
+
+
+def _tool_terms(tool):
+    """term -> best field it appears in"""
+    fields = {}
+    for term in text_terms(tool.get("description") or ""):
+        fields[term] = DESCRIPTION
+    for name in _property_names(tool.get("inputSchema")):
+        for term in identifier_terms(name):
+            fields[term] = PROPERTY
+    for term in identifier_terms(tool.get("name", "")):
+        fields[term] = NAME
+    return fields
+
+
+def _digest(tool):
+    # Same serialization as cache.canonical_json, without importing the cache (and sqlite3)
+    data = json.dumps(tool, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(data.encode(), digest_size=8).hexdigest()
+
+
+def _edits(word):
+    """Every string one insertion, deletion, substitution or transposition away"""
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    variants = {a + b[1:] for a, b in splits if b}
+    variants.update(a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1)
+    variants.update(a + c + b[1:] for a, b in splits if b for c in _ALPHABET)
+    variants.update(a + c + b for a, b in splits for c in _ALPHABET)
+    variants.discard(word)
+    return variants
+
+
+class ToolIndex:
+    """
+    Persistent inverted index of tools across servers
+
+    Args:
+        path: Gzipped JSON file the index is loaded from and saved to
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._docs = []                             # doc id -> [server, name, description], None once replaced
+        self._keys = {}                             # (server, name) -> (doc id, digest)
+        self._postings = tuple({} for _ in FIELD_WEIGHTS)  # per field: term -> array('I') of doc ids
+        self._df = {}                               # term -> postings across fields, replaced docs included
+        self._terms = []                            # sorted vocabulary, for prefix lookups
+        self._live = 0
+        self.dirty = False
+        if path and os.path.exists(path):
+            self._load()
+
+    def __len__(self):
+        return self._live
+
+    def servers(self):
+        return sorted({server for server, _ in self._keys})
+
+    def _add(self, server, tool, digest):
+        doc = len(self._docs)
+        self._docs.append([server, tool["name"], tool.get("description") or ""])
+        self._keys[(server, tool["name"])] = (doc, digest)
+        self._live += 1
+        for term, field in _tool_terms(tool).items():
+            postings = self._postings[field].get(term)
+            if postings is None:
+                postings = self._postings[field][term] = array.array("I")
+            postings.append(doc)
+            df = self._df.get(term)
+            if df is None:
+                bisect.insort(self._terms, term)
+            self._df[term] = (df or 0) + 1
+
+    def _drop(self, key):
+        doc, _ = self._keys.pop(key)
+        self._docs[doc] = None
+        self._live -= 1
+
+    def update(self, server, tools):
+        """
+        Replace a server's catalog with a complete tools/list result
+
+        Only added or changed tools are tokenized; returns counts of added,
+        changed, removed and unchanged tools.
+        """
+        counts = {"added": 0, "changed": 0, "removed": 0, "unchanged": 0}
+        seen = set()
+        for tool in tools:
+            name = tool.get("name")
+            if not name or name in seen:
+                continue
+            seen.add(name)
+            digest = _digest(tool)
+            known = self._keys.get((server, name))
+            if known is not None and known[1] == digest:
+                counts["unchanged"] += 1
+                continue
+            if known is not None:
+                self._drop((server, name))
+                counts["changed"] += 1
+            else:
+                counts["added"] += 1
+            self._add(server, tool, digest)
+        for key in [key for key in self._keys if key[0] == server and key[1] not in seen]:
+            self._drop(key)
+            counts["removed"] += 1
+        if counts["added"] or counts["changed"] or counts["removed"]:
+            self.dirty = True
+        return counts
+
+    def remove_server(self, server):
+        for key in [key for key in self._keys if key[0] == server]:
+            self._drop(key)
+            self.dirty = True
+
+    def _variants(self, word):
+        """Indexed terms a query word matches, with their match factor"""
+        matches = {}
+        if word in self._df:
+            matches[word] = 1.0
+        if len(word) > 1:
+            start = bisect.bisect_left(self._terms, word)
+            for term in self._terms[start:start + MAX_PREFIX_TERMS + 1]:
+                if not term.startswith(word):
+                    break
+                matches.setdefault(term, PREFIX_FACTOR)
+        if not matches and len(word) >= MIN_FUZZY_LENGTH:
+            for variant in _edits(word):
+                if variant in self._df:
+                    matches[variant] = FUZZY_FACTOR
+        return matches
+
+    def _groups(self, word):
+        """(score, doc ids) for each matching term and field, best first"""
+        total = max(self._live, 1)
+        groups = []
+        for term, factor in self._variants(word).items():
+            idf = math.log(1.0 + total / self._df[term])
+            for field, postings in enumerate(self._postings):
+                docs = postings.get(term)
+                if docs:
+                    groups.append((factor * idf * FIELD_WEIGHTS[field], docs))
+        groups.sort(key=lambda group: group[0], reverse=True)
+        return groups
+
+    @staticmethod
+    def _word_lookup(groups, size, candidates):
+        """
+        doc -> the word's score, or None when the doc lacks the word
+
+        Binary-searches the sorted postings, best group first, until enough
+        lookups have been made that a dict pays off. The dict only holds
+        docs in candidates(), the set of docs that can be asked about.
+        """
+        budget = size // 16 + 1
+        scores = None
+
+        def lookup(doc):
+            nonlocal budget, scores
+            if scores is not None:
+                return scores.get(doc)
+            budget -= 1
+            if budget < 0:
+                wanted = candidates()
+                scores = {}
+                # Intersected and built in C; better groups go last so they win
+                for score, docs in reversed(groups):
+                    scores.update(dict.fromkeys(wanted.intersection(docs), score))
+                return scores.get(doc)
+            for score, docs in groups:
+                i = bisect.bisect_left(docs, doc)
+                if i < len(docs) and docs[i] == doc:
+                    return score
+            return None
+        return lookup
+
+    def search(self, query, limit=10, server=None):
+        """
+        Tools best matching a free-text query, as dicts with a score
+
+        Results match as many query words as possible: every word the
+        index knows if any tool has them all, else the most words any tool
+        has. Words the index has never seen are ignored.
+        """
+        words = []
+        for part in _parts(query):
+            if part not in _STOPWORDS and part not in words:
+                words.append(part)
+        per_word = [(sum(len(docs) for _, docs in groups), groups) for groups in map(self._groups, words) if groups]
+        if not per_word:
+            return []
+        per_word.sort(key=lambda item: item[0])
+        best = self._search_all(per_word, limit, server)
+        docs = self._docs
+        return [
+            {"server": docs[doc][0], "name": docs[doc][1], "description": docs[doc][2], "score": round(score, 3)}
+            for score, doc in sorted(best, key=lambda item: (-item[0], item[1]))
+        ]
+
+    def _search_all(self, per_word, limit, server):
+        """
+        Top docs in one pass: the rarest word drives, best groups first
+
+        Each doc lands in the heap for the number of other words it
+        matches. The fullest non-empty heap is the answer, and once the
+        all-words heap is full and no remaining group can beat it, the pass
+        stops.
+        """
+        driver = per_word[0][1]
+        driver_docs = []
+
+        def candidates():
+            if not driver_docs:
+                driver_docs.append(set().union(*(docs for _, docs in driver)))
+            return driver_docs[0]
+
+        others = [self._word_lookup(groups, size, candidates) for size, groups in per_word[1:]]
+        headroom = sum(groups[0][0] for _, groups in per_word[1:])
+        heaps = [[] for _ in range(len(others) + 1)]
+        top = heaps[-1]
+        # A doc shows up in several groups only when the word matched several terms
+        seen = set() if len(driver) > 1 else None
+        docs = self._docs
+        for score, group in driver:
+            if len(top) >= limit and top[0][0] >= score + headroom:
+                break
+            for doc in group:
+                if len(top) >= limit and top[0][0] >= score + headroom:
+                    break
+                if seen is not None:
+                    if doc in seen:
+                        continue
+                    seen.add(doc)
+                entry = docs[doc]
+                if entry is None or (server is not None and entry[0] != server):
+                    continue
+                total = score
+                matched = 0
+                for lookup in others:
+                    other = lookup(doc)
+                    if other is not None:
+                        total += other
+                        matched += 1
+                heap = heaps[matched]
+                if len(heap) < limit:
+                    heapq.heappush(heap, (total, -doc))
+                elif total > heap[0][0]:
+                    heapq.heapreplace(heap, (total, -doc))
+        for heap in reversed(heaps):
+            if heap:
+                return [(total, -negative) for total, negative in heap]
+        return []
+
+    def compact(self):
+        """Renumber live docs densely and drop replaced docs' postings"""
+        if self._live == len(self._docs):
+            return
+        renumber = {}
+        docs = []
+        for doc, entry in enumerate(self._docs):
+            if entry is not None:
+                renumber[doc] = len(docs)
+                docs.append(entry)
+        df = {}
+        for postings in self._postings:
+            for term in list(postings):
+                kept = array.array("I", (renumber[doc] for doc in postings[term] if doc in renumber))
+                if kept:
+                    postings[term] = kept
+                    df[term] = df.get(term, 0) + len(kept)
+                else:
+                    del postings[term]
+        self._keys = {key: (renumber[doc], digest) for key, (doc, digest) in self._keys.items()}
+        self._docs = docs
+        self._df = df
+        self._terms = sorted(df)
+
+    def save(self):
+        """Compact and write the index atomically"""
+        self.compact()
+        digests = [None] * len(self._docs)
+        for doc, digest in self._keys.values():
+            digests[doc] = digest
+        data = {
+            "version": 2,
+            "byteorder": sys.byteorder,
+            "docs": [entry + [digest] for entry, digest in zip(self._docs, digests)],
+            "postings": [
+                {term: base64.b64encode(docs.tobytes()).decode("ascii") for term, docs in postings.items()}
+                for postings in self._postings
+            ],
+        }
+
+        def write(raw):
+            with gzip.open(raw, "wt", encoding="utf-8", compresslevel=6) as f:
+                json.dump(data, f, separators=(",", ":"))
+
+        atomic_write(self.path, write, binary=True)
+        self.dirty = False
+
+    def _load(self):
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            # A corrupt index is rebuilt from the next catalogs
+            return
+        if data.get("version") != 2:
+            return
+        swap = data.get("byteorder") != sys.byteorder
+        for doc, (server, name, description, digest) in enumerate(data["docs"]):
+            self._docs.append([server, name, description])
+            self._keys[(server, name)] = (doc, digest)
+        for postings, encoded in zip(self._postings, data["postings"]):
+            for term, value in encoded.items():
+                docs = array.array("I")
+                docs.frombytes(base64.b64decode(value))
+                if swap:
+                    docs.byteswap()
+                postings[term] = docs
+                self._df[term] = self._df.get(term, 0) + len(docs)
+        self._terms = sorted(self._df)
+        self._live = len(self._docs)
@@ -0,0 +1,620 @@
+import asyncio
+import codecs
+import itertools
+import json
+import logging
+import re
+from urllib.parse import parse_qs, urljoin, urlparse
+
+import httpx
+
+from .compression import ACCEPT_ENCODING, DEFAULT_MIN_BYTES, TransferStats, compress, pick_encoding
+from .log import event, get_logger
+from .profiling import checkpoint, region
+from .schema import ValidatorCache
+from .stream import StreamedBody, has_iterators, has_streams
+
+log = get_logger("session")
+
+PROTOCOL_VERSION = "2024-11-05"
+CLIENT_INFO = {"name": "toolshed-mcp", "version": "0.1.0"}
+
+SSE_HEADERS = {
+    "Accept": "text/event-stream",
+    "Accept-Encoding": ACCEPT_ENCODING,
+    "Cache-Control": "no-cache",
+}
+
+_LINE_BREAK = re.compile(r"\r\n|\r|\n")
+
+
+# (capability, list method) requested by prefetch
+_PREFETCH = (("tools", "tools/list"), ("resources", "resources/list"), ("prompts", "prompts/list"))
+_LIST_CHANGED = {
+    "notifications/tools/list_changed": "tools/list",
+    "notifications/resources/list_changed": "resources/list",
+    "notifications/prompts/list_changed": "prompts/list",
+}
+
+
+class MCPError(Exception):
+    """Error object returned by the server in a JSON-RPC response"""
+
+    def __init__(self, code, message, data=None):
+        super().__init__(f"{message} (code {code})")
+        self.code = code
+        self.message = message
+        self.data = data
+
+
+class SSEParser:
+    """Incremental SSE parser fed one line at a time"""
+
+    __slots__ = ("kind", "data")
+
+    def __init__(self):
+        self.kind = "message"
+        self.data = []
+
+    def feed(self, line):
+        """Consume a line; return (event type, data) when it completes an event"""
+        if not line:
+            ready = (self.kind, "\n".join(self.data)) if self.data else None
+            self.kind = "message"
+            self.data = []
+            return ready
+        if line.startswith(":"):
+            # Comment lines carry the server's keep-alive pings
+            return None
+        field, _, value = line.partition(":")
+        if value.startswith(" "):
+            value = value[1:]
+        if field == "event":
+            self.kind = value
+        elif field == "data":
+            self.data.append(value)
+        return None
+
+    def flush(self):
+        return (self.kind, "\n".join(self.data)) if self.data else None
+
+
+def encode_body(payload):
+    """Compact UTF-8 JSON body of a JSON-RPC message"""
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+async def iter_lines(chunks):
+    """Decode an async iterator of UTF-8 bytes into lines ending at CRLF, LF or CR, as SSE defines them"""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        text = pending + decoder.decode(chunk)
+        # A CR at the end may be the first half of a CRLF split across chunks
+        held = text.endswith("\r")
+        lines = _LINE_BREAK.split(text[:-1] if held else text)
+        pending = lines.pop() + ("\r" if held else "")
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        for line in _LINE_BREAK.split(pending.rstrip("\r")):
+            yield line
+
+
+async def iter_sse(lines):
+    """Turn an async iterator of SSE lines into (event type, data) pairs"""
+    parser = SSEParser()
+    async for line in lines:
+        with region("parse"):
+            ready = parser.feed(line)
+        if ready is not None:
+            yield ready
+    ready = parser.flush()
+    if ready is not None:
+        yield ready
+
+
+class MCPSession:
+    """
+    One MCP session over the SSE transport used by our hosted servers
+
+    The server announces its message endpoint (``/messages/?session_id=...``)
+    in the first ``endpoint`` event; requests are POSTed there and the
+    JSON-RPC responses come back on the open event stream, matched by id.
+
+    Args:
+        server_url: Base URL of the server, e.g. 'http://34.226.219.58:8000'
+        timeout: Seconds to wait for the endpoint event and for each response
+        client: Optional shared httpx.AsyncClient
+        cache: Optional ResultCache consulted by call_tool
+        sse_path: Path of the event stream on the server
+        record: Append the session's HTTP traffic to this recording file
+            (see replay.py); ignored when client is given
+        validate: Check call_tool arguments against the inputSchema of tools
+            seen in list_tools() before sending them
+        compress: 'auto' to compress request bodies once the server
+            advertises an encoding, an encoding name to always use it, or
+            None to never compress
+        compress_min_bytes: Smaller request bodies are sent as they are
+        resource_cache: Optional ResourceCache consulted by read_resource
+        prefetch: After initialize, request tools/list, resources/list and
+            prompts/list (those the server advertises) concurrently in the
+            background; the first list_tools()/list_resources()/
+            list_prompts() call is then answered from that result
+        tool_index: Optional ToolIndex that every complete tools/list pass
+            updates with this server's catalog
+    """
+
+    def __init__(self, server_url, timeout=30.0, client=None, cache=None, sse_path="/sse", record=None,
+                 validate=True, compress="auto", compress_min_bytes=DEFAULT_MIN_BYTES, prefetch=False,
+                 resource_cache=None, tool_index=None):
+        self.server_url = server_url.rstrip("/")
+        self.sse_path = sse_path
+        self.timeout = timeout
+        self.cache = cache
+        self.record = record
+        self.validate = validate
+        self.validators = ValidatorCache()
+        self.compress = compress
+        self.compress_min_bytes = compress_min_bytes
+        self.transfer = TransferStats()
+        self.prefetch = prefetch
+        self.resource_cache = resource_cache
+        self.tool_index = tool_index
+        self._prefetched = {}
+        self._subscriptions = set()
+        self._cancel_notices = set()
+        self._closing = False
+        self._request_encoding = None if compress in ("auto", None) else compress
+        self._encoding_accepted = False
+        self.messages_url = None
+        self.session_id = None
+        self.server_info = None
+        self.capabilities = {}
+        self._client = client
+        self._owns_client = client is None
+        self._stream = None
+        self._reader = None
+        self._endpoint = None
+        self._pending = {}
+        self._ids = itertools.count(1)
+        self._notification_handlers = []
+
+    async def __aenter__(self):
+        await self.connect()
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    @property
+    def server_key(self):
+        """Identity of the server behind this session, stable across replicas"""
+        if self.server_info:
+            return f"{self.server_info.get('name')}@{self.server_info.get('version')}"
+        return self.server_url
+
+    @property
+    def connected(self):
+        """Whether the event stream is still being read"""
+        return self._reader is not None and not self._reader.done()
+
+    async def connect(self):
+        """Open the event stream and wait for the server's message endpoint"""
+        self._closing = False
+        if self._client is None:
+            if self.record:
+                from .replay import recording_client
+
+                self._client = recording_client(self.record, timeout=self.timeout)
+            else:
+                self._client = httpx.AsyncClient(timeout=self.timeout)
+        self._stream = self._client.stream(
+            "GET",
+            f"{self.server_url}{self.sse_path}",
+            headers=SSE_HEADERS,
+            timeout=httpx.Timeout(self.timeout, read=None),
+        )
+        response = await self._stream.__aenter__()
+        response.raise_for_status()
+        self._learn_encodings(response.headers.get_list("accept-encoding"))
+
+        self._endpoint = asyncio.get_running_loop().create_future()
+        self._reader = asyncio.create_task(self._read_events(response))
+        endpoint = await asyncio.wait_for(asyncio.shield(self._endpoint), self.timeout)
+
+        self.messages_url = urljoin(self.server_url + "/", endpoint)
+        query = parse_qs(urlparse(self.messages_url).query)
+        self.session_id = query.get("session_id", [None])[0]
+        event(log, logging.INFO, "connected", url=self.server_url, session_id=self.session_id)
+        return self
+
+    async def _read_events(self, response):
+        """Background task dispatching every event on the stream"""
+        error = None
+        transfer = self.transfer
+
+        async def chunks():
+            # Decoded bytes: the stream may be gzip-encoded (we send Accept-Encoding)
+            async for chunk in response.aiter_bytes():
+                transfer.stream_bytes += len(chunk)
+                transfer.stream_wire_bytes = response.num_bytes_downloaded
+                yield chunk
+
+        try:
+            async for kind, data in iter_sse(iter_lines(chunks())):
+                self._dispatch(kind, data)
+        except Exception as e:
+            error = e
+        finally:
+            event(log, logging.INFO, "stream closed", url=self.server_url,
+                  session_id=self.session_id, error=str(error) if error else None)
+            # Updates for our subscriptions can no longer reach us
+            self._subscriptions.clear()
+            if self.resource_cache is not None:
+                self.resource_cache.invalidate_subscribed(self.server_url)
+            self._fail_pending(error or ConnectionError("SSE stream closed"))
+
+    def _dispatch(self, kind, data):
+        with region("dispatch"):
+            self._dispatch_event(kind, data)
+
+    def _dispatch_event(self, kind, data):
+        if kind == "endpoint":
+            if not self._endpoint.done():
+                self._endpoint.set_result(data.strip())
+            return
+        try:
+            with region("decode"):
+                message = json.loads(data)
+        except json.JSONDecodeError:
+            return
+        if not isinstance(message, dict):
+            return
+        if "method" not in message:
+            event(log, logging.DEBUG, "response", id=message.get("id"), error="error" in message)
+            future = self._pending.pop(message.get("id"), None)
+            if future is not None and not future.done():
+                future.set_result(message)
+            return
+        event(log, logging.DEBUG, "notification", method=message["method"])
+        if message["method"] == "notifications/tools/list_changed":
+            self.validators.clear()
+        if message["method"] in _LIST_CHANGED:
+            self._drop_prefetched(_LIST_CHANGED[message["method"]])
+        if message["method"] == "notifications/resources/updated" and self.resource_cache is not None:
+            uri = (message.get("params") or {}).get("uri")
+            if uri:
+                self.resource_cache.invalidate(self.server_url, uri)
+        for handler in list(self._notification_handlers):
+            handler(message)
+
+    def _fail_pending(self, error):
+        if self._endpoint is not None and not self._endpoint.done():
+            self._endpoint.set_exception(error)
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    def on_notification(self, handler):
+        """Register a callback for server-initiated messages"""
+        self._notification_handlers.append(handler)
+        return handler
+
+    def _learn_encodings(self, advertised):
+        if self.compress == "auto" and self._request_encoding is None:
+            self._request_encoding = pick_encoding(advertised)
+
+    async def _post(self, payload):
+        if has_streams(payload):
+            return await self._post_streamed(payload)
+        with region("send"):
+            body = encode_body(payload)
+            encoding = self._request_encoding if len(body) >= self.compress_min_bytes else None
+            content = compress(body, encoding) if encoding else body
+            headers = {"Content-Type": "application/json"}
+            if encoding:
+                headers["Content-Encoding"] = encoding
+            response = await self._client.post(self.messages_url, content=content, headers=headers)
+            if response.status_code == 415 and encoding:
+                event(log, logging.INFO, "compression refused", url=self.server_url, encoding=encoding)
+                self._request_encoding = None
+                self.compress = None
+                content = body
+                response = await self._client.post(self.messages_url, content=body,
+                                                   headers={"Content-Type": "application/json"})
+            response.raise_for_status()
+            if encoding:
+                self._encoding_accepted = True
+            self.transfer.record_request(len(body), len(content))
+            self._learn_encodings(response.headers.get_list("accept-encoding"))
+        return response
+
+    async def _post_streamed(self, payload):
+        """POST a payload holding FileText/iterator values as a chunked body"""
+        with region("send"):
+            one_shot = has_iterators(payload)
+            encoding = self._request_encoding
+            if one_shot and not self._encoding_accepted:
+                # A 415 could not be retried: the iterators are used up by the first attempt
+                encoding = None
+            body = StreamedBody(payload, encoding)
+            headers = {"Content-Type": "application/json"}
+            if encoding:
+                headers["Content-Encoding"] = encoding
+            response = await self._client.post(self.messages_url, content=body, headers=headers)
+            if response.status_code == 415 and encoding:
+                event(log, logging.INFO, "compression refused", url=self.server_url, encoding=encoding,
+                      resent=not one_shot)
+                self._request_encoding = None
+                self.compress = None
+                if not one_shot:
+                    body = StreamedBody(payload)
+                    response = await self._client.post(self.messages_url, content=body,
+                                                       headers={"Content-Type": "application/json"})
+            # A refused one-shot body raises here instead of being resent with empty iterators
+            response.raise_for_status()
+            if encoding and response.status_code != 415:
+                self._encoding_accepted = True
+            self.transfer.record_request(body.raw_bytes, body.wire_bytes)
+            self._learn_encodings(response.headers.get_list("accept-encoding"))
+        return response
+
+    async def request(self, method, params=None, timeout=None):
+        """Send a JSON-RPC request and wait for its result on the stream"""
+        request_id = next(self._ids)
+        payload = {"jsonrpc": "2.0", "id": request_id, "method": method}
+        if params is not None:
+            payload["params"] = params
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        event(log, logging.DEBUG, "request", id=request_id, method=method)
+        try:
+            await self._post(payload)
+            with region("wait"):
+                message = await asyncio.wait_for(future, timeout or self.timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError):
+            # Possibly mid-POST; servers ignore cancellations of ids they never saw.
+            # wait_for() cancels the future, so "no answer yet" means cancelled or pending
+            if future.cancelled() or not future.done():
+                self._send_cancelled(request_id)
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+
+        if "error" in message:
+            error = message["error"]
+            raise MCPError(error.get("code"), error.get("message"), error.get("data"))
+        return message.get("result")
+
+    def _send_cancelled(self, request_id):
+        # Tell the server to stop work nobody is waiting for (a lost hedge,
+        # an abandoned call); best effort, in the background
+        if self._closing or not self.connected:
+            return
+        task = asyncio.create_task(self.notify("notifications/cancelled", {"requestId": request_id}))
+        self._cancel_notices.add(task)
+        task.add_done_callback(lambda t: self._cancel_notices.discard(t) or t.cancelled() or t.exception())
+
+    async def notify(self, method, params=None):
+        """Send a JSON-RPC notification (no response expected)"""
+        payload = {"jsonrpc": "2.0", "method": method}
+        if params is not None:
+            payload["params"] = params
+        await self._post(payload)
+
+    async def initialize(self):
+        """Run the initialize handshake and record the server's capabilities"""
+        result = await self.request("initialize", {
+            "protocolVersion": PROTOCOL_VERSION,
+            "capabilities": {},
+            "clientInfo": CLIENT_INFO,
+        })
+        self.server_info = result.get("serverInfo")
+        self.capabilities = result.get("capabilities") or {}
+        self._learn_encodings((self.capabilities.get("experimental") or {}).get("compression"))
+        await self.notify("notifications/initialized")
+        if self.prefetch:
+            self._start_prefetch()
+        return result
+
+    def _start_prefetch(self):
+        for capability, method in _PREFETCH:
+            if capability in self.capabilities and method not in self._prefetched:
+                task = asyncio.create_task(self.request(method))
+                # Failures are retried by the real call; don't log them as unretrieved
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+                self._prefetched[method] = task
+
+    def _drop_prefetched(self, method):
+        task = self._prefetched.pop(method, None)
+        if task is not None:
+            task.cancel()
+
+    async def _list(self, method):
+        """Result of a list request, taken from the prefetch when there is one"""
+        task = self._prefetched.pop(method, None)
+        if task is not None:
+            try:
+                result = await task
+            except (asyncio.CancelledError, Exception):
+                pass
+            else:
+                event(log, logging.DEBUG, "prefetch hit", method=method)
+                return result
+        return await self.request(method)
+
+    async def iter_pages(self, method, params=None):
+        """
+        Yield each page of a paginated list request as it arrives
+
+        Follows nextCursor until the server stops returning one. Leaving
+        the loop early stops fetching, so a caller after one item does not
+        download and decode the rest of the listing. The first page comes
+        from the prefetch when there is one.
+        """
+        if params:
+            result = await self.request(method, params)
+        else:
+            result = await self._list(method)
+        seen = set()
+        while True:
+            yield result
+            cursor = result.get("nextCursor")
+            if not cursor:
+                return
+            if cursor in seen:
+                event(log, logging.WARNING, "pagination loop", url=self.server_url, method=method, cursor=cursor)
+                return
+            seen.add(cursor)
+            result = await self.request(method, dict(params or {}, cursor=cursor))
+
+    async def _iter_items(self, method, key):
+        async for page in self.iter_pages(method):
+            for item in page.get(key, ()):
+                yield item
+
+    async def iter_tools(self):
+        """Yield tool definitions page by page; a complete pass refreshes the validators"""
+        tools = []
+        async for page in self.iter_pages("tools/list"):
+            items = page.get("tools", [])
+            tools.extend(items)
+            for tool in items:
+                yield tool
+        # Only a complete listing may replace the validators or the indexed catalog
+        self.validators.update(tools)
+        if self.tool_index is not None:
+            self.tool_index.update(self.server_url, tools)
+
+    async def find_tool(self, name):
+        """A tool's definition, fetching only the pages up to the one that holds it"""
+        tools = self.iter_tools()
+        try:
+            async for tool in tools:
+                if tool.get("name") == name:
+                    return tool
+        finally:
+            await tools.aclose()
+        return None
+
+    async def list_tools(self):
+        """Return the server's tool definitions (every page) and refresh the argument validators"""
+        return [tool async for tool in self.iter_tools()]
+
+    def iter_resources(self):
+        """Yield resources page by page"""
+        return self._iter_items("resources/list", "resources")
+
+    async def list_resources(self):
+        """Return the server's resources (every page)"""
+        return [resource async for resource in self.iter_resources()]
+
+    async def read_resource(self, uri, use_cache=True):
+        """
+        Return the contents of a resource
+
+        With a resource cache, a repeated read is served locally. If the
+        server supports subscriptions the session subscribes before the
+        first read, and the entry stays valid until
+        notifications/resources/updated arrives for it; otherwise it
+        expires after the cache's TTL.
+        """
+        cache = self.resource_cache if use_cache else None
+        if cache is None:
+            return await self.request("resources/read", {"uri": uri})
+        # Keyed by URL: deployments of the same image share serverInfo but not their resources
+        cached = cache.get(self.server_url, uri)
+        if cached is not None:
+            event(log, logging.DEBUG, "resource cache hit", uri=uri)
+            return cached
+        generation = cache.generation(self.server_url, uri)
+        subscribed = await self._subscribe(uri)
+        result = await self.request("resources/read", {"uri": uri})
+        # An update that arrived while reading (even ahead of the response) makes the result stale
+        cache.put(self.server_url, uri, result, subscribed=subscribed, generation=generation)
+        return result
+
+    async def _subscribe(self, uri):
+        if uri in self._subscriptions:
+            return True
+        if not (self.capabilities.get("resources") or {}).get("subscribe"):
+            return False
+        try:
+            await self.request("resources/subscribe", {"uri": uri})
+        except MCPError as e:
+            event(log, logging.DEBUG, "subscribe failed", uri=uri, error=str(e))
+            return False
+        self._subscriptions.add(uri)
+        return True
+
+    def iter_prompts(self):
+        """Yield prompts page by page"""
+        return self._iter_items("prompts/list", "prompts")
+
+    async def list_prompts(self):
+        """Return the server's prompts (every page)"""
+        return [prompt async for prompt in self.iter_prompts()]
+
+    async def call_tool(self, name, arguments=None, use_cache=True):
+        """
+        Call a tool and return its result
+
+        When the session has a cache and the tool is on its allow-list, the
+        result is served from (or stored into) the cache. Arguments that
+        fail the tool's inputSchema raise ValidationError without a round
+        trip. Arguments holding FileText values or iterators are streamed
+        to the server and bypass validation and the cache.
+        """
+        arguments = arguments or {}
+        streamed = has_streams(arguments)
+        if self.validate and not streamed:
+            self.validators.check(name, arguments)
+        cache = self.cache if use_cache and self.cache is not None and not streamed else None
+        key = None
+        if cache is not None and cache.allows(name):
+            key = cache.key(self.server_key, name, arguments)
+            cached = cache.get(key)
+            if cached is not None:
+                event(log, logging.DEBUG, "cache hit", tool=name)
+                return cached
+
+        result = await self.request("tools/call", {"name": name, "arguments": arguments})
+
+        if key is not None and not result.get("isError"):
+            cache.put(key, name, result)
+        return result
+
+    def set_timeout(self, timeout):
+        """Change the request timeout of an open session, including its own HTTP client's"""
+        self.timeout = timeout
+        if self._owns_client and self._client is not None:
+            self._client.timeout = timeout
+
+    async def close(self):
+        """Stop the reader and close the event stream"""
+        if self.transfer.calls:
+            event(log, logging.INFO, "transfer", url=self.server_url, **self.transfer.summary())
+        # Closing the stream ends everything on the server; no need to cancel one by one
+        self._closing = True
+        for method in list(self._prefetched):
+            self._drop_prefetched(method)
+        if self._cancel_notices:
+            await asyncio.gather(*self._cancel_notices, return_exceptions=True)
+        if self._reader is not None:
+            self._reader.cancel()
+            try:
+                await self._reader
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._reader = None
+        if self._stream is not None:
+            await self._stream.__aexit__(None, None, None)
+            self._stream = None
+        if self._owns_client and self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        checkpoint(f"session-{self.session_id}")
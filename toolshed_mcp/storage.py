@@ -0,0 +1,34 @@
+"""
+Safe writes of the client's state files
+
+Discovery entries, scan and tool indexes and benchmark results are
+rewritten whole. Several CLI runs may save the same file at once, so each
+write goes to its own temporary file next to the target and is renamed
+over it; readers see the old file or the new one, never a mix.
+"""
+import os
+import tempfile
+
+
+def atomic_write(path, writer, binary=False):
+    """
+    Replace path with what writer(f) writes
+
+    Args:
+        path: File to replace; its directory is created if needed
+        writer: Called with the open temporary file
+        binary: Open the file in binary mode instead of UTF-8 text
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix=".tmp", dir=directory)
+    try:
+        with (open(fd, "wb") if binary else open(fd, "w", encoding="utf-8")) as f:
+            writer(f)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
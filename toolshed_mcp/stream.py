@@ -0,0 +1,169 @@
+"""
+Streaming JSON request bodies
+
+Large tool arguments do not have to exist as one Python string. Any
+value in a payload can be a FileText (a file's contents, sent as a JSON
+string) or an iterator (sent as a JSON array of its items), and
+iter_json() encodes the payload into fixed-size byte chunks as the
+request body is sent. Only one chunk per file is in memory at a time.
+"""
+import json
+import os
+import zlib
+
+DEFAULT_CHUNK_BYTES = 64 * 1024
+
+_encode_string = json.JSONEncoder(ensure_ascii=False).encode
+_encode_value = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"), allow_nan=False).encode
+
+
+class FileText:
+    """
+    A file's contents as a JSON string value, read while sending
+
+    len() is the file size in bytes, so size-based batching and sharding
+    work without reading the file.
+    """
+
+    def __init__(self, path, encoding="utf-8", errors="replace", chunk_chars=DEFAULT_CHUNK_BYTES):
+        self.path = path
+        self.encoding = encoding
+        self.errors = errors
+        self.chunk_chars = chunk_chars
+
+    def __len__(self):
+        return os.path.getsize(self.path)
+
+    def __repr__(self):
+        return f"FileText({self.path!r})"
+
+    def chunks(self):
+        with open(self.path, "r", encoding=self.encoding, errors=self.errors, newline="") as f:
+            while True:
+                text = f.read(self.chunk_chars)
+                if not text:
+                    return
+                yield text
+
+    def read(self):
+        return "".join(self.chunks())
+
+
+def has_streams(value):
+    """Whether a payload contains FileText values or iterators"""
+    if isinstance(value, FileText):
+        return True
+    if isinstance(value, dict):
+        return any(has_streams(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(has_streams(item) for item in value)
+    return not isinstance(value, (str, bytes, int, float, bool, type(None))) and hasattr(value, "__next__")
+
+
+def has_iterators(value):
+    """Whether a payload contains iterators, which can be encoded only once"""
+    if isinstance(value, FileText):
+        return False
+    if isinstance(value, dict):
+        return any(has_iterators(item) for item in value.values())
+    if isinstance(value, (list, tuple)):
+        return any(has_iterators(item) for item in value)
+    return not isinstance(value, (str, bytes, int, float, bool, type(None))) and hasattr(value, "__next__")
+
+
+def _pieces(value):
+    if isinstance(value, FileText):
+        yield '"'
+        for text in value.chunks():
+            # Encoding a chunk on its own gives the same escapes as the whole string
+            yield _encode_string(text)[1:-1]
+        yield '"'
+    elif isinstance(value, dict):
+        yield "{"
+        first = True
+        for key, item in value.items():
+            if not first:
+                yield ","
+            first = False
+            yield _encode_string(str(key))
+            yield ":"
+            yield from _pieces(item)
+        yield "}"
+    elif isinstance(value, (list, tuple)) or (hasattr(value, "__next__") and not isinstance(value, (str, bytes))):
+        yield "["
+        first = True
+        for item in value:
+            if not first:
+                yield ","
+            first = False
+            yield from _pieces(item)
+        yield "]"
+    else:
+        yield _encode_value(value)
+
+
+def iter_json(value, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Encode value as compact JSON, yielding UTF-8 chunks of about chunk_bytes"""
+    buffer = []
+    size = 0
+    for piece in _pieces(value):
+        buffer.append(piece)
+        size += len(piece)
+        if size >= chunk_bytes:
+            yield "".join(buffer).encode("utf-8")
+            buffer = []
+            size = 0
+    if buffer:
+        yield "".join(buffer).encode("utf-8")
+
+
+def compress_chunks(chunks, encoding):
+    """Compress an iterator of byte chunks as one gzip or zstd stream"""
+    if encoding == "gzip":
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    elif encoding == "zstd":
+        import zstandard
+
+        compressor = zstandard.ZstdCompressor(level=3).compressobj()
+        for chunk in chunks:
+            data = compressor.compress(chunk)
+            if data:
+                yield data
+        yield compressor.flush()
+    else:
+        raise ValueError(f"Unsupported content encoding {encoding!r}")
+
+
+class StreamedBody:
+    """
+    Async iterable request body that counts bytes before and after compression
+
+    The payload is re-encoded on every iteration, so a request can be
+    resent as long as it holds no one-shot iterators (see has_iterators).
+    """
+
+    def __init__(self, payload, encoding=None, chunk_bytes=DEFAULT_CHUNK_BYTES):
+        self.payload = payload
+        self.encoding = encoding
+        self.chunk_bytes = chunk_bytes
+        self.raw_bytes = 0
+        self.wire_bytes = 0
+
+    def _counted(self):
+        for chunk in iter_json(self.payload, self.chunk_bytes):
+            self.raw_bytes += len(chunk)
+            yield chunk
+
+    async def __aiter__(self):
+        self.raw_bytes = self.wire_bytes = 0
+        chunks = self._counted()
+        if self.encoding:
+            chunks = compress_chunks(chunks, self.encoding)
+        for chunk in chunks:
+            self.wire_bytes += len(chunk)
+            yield chunk
@@ -0,0 +1,149 @@
+"""
+Synchronous, thread-safe facade over one MCPSession
+
+For thread-based tooling (ThreadPoolExecutor workers, the
+requests-style scripts). One background thread runs an event loop that
+owns the session; its single SSE reader dispatches every response by id
+to the waiting call. Calling threads block on a concurrent future, so
+64 workers share one connection without per-call threads or streams.
+"""
+import asyncio
+import concurrent.futures
+import threading
+
+from .session import MCPSession
+
+
+class SyncSession:
+    """
+    Blocking MCP session that any number of threads may call at once
+
+    Args:
+        server_url: Base URL of the server
+        timeout: Seconds allowed for connecting and for each response
+        initialize: Run the initialize handshake when connecting
+        discovery: Optional DiscoveryCache used to connect
+        **session_kwargs: Passed on to MCPSession (cache, sse_path, record, ...)
+
+    Notification handlers registered with on_notification() run on the
+    session's loop thread and must not call back into the SyncSession.
+    The async iterators (iter_tools, iter_pages, ...) have no blocking
+    counterpart; list_* return every page instead.
+    """
+
+    def __init__(self, server_url, timeout=30.0, initialize=True, discovery=None, **session_kwargs):
+        self.server_url = server_url
+        self.timeout = timeout
+        self.initialize = initialize
+        self.discovery = discovery
+        self.session_kwargs = session_kwargs
+        self.session = None
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self.connect()
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def connect(self):
+        with self._lock:
+            if self._thread is not None:
+                return self
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name="toolshed-mcp-session",
+                                            daemon=True)
+            self._thread.start()
+            try:
+                self.session = self._run(self._open(), self.timeout * 2)
+            except BaseException:
+                self._stop_loop()
+                raise
+        return self
+
+    async def _open(self):
+        if self.discovery is not None:
+            session = await self.discovery.connect(self.server_url, timeout=self.timeout, **self.session_kwargs)
+        else:
+            session = MCPSession(self.server_url, timeout=self.timeout, **self.session_kwargs)
+            await session.connect()
+            if self.initialize:
+                try:
+                    await session.initialize()
+                except BaseException:
+                    await session.close()
+                    raise
+        return session
+
+    def _run(self, coro, timeout=None):
+        if self._loop is None:
+            coro.close()
+            raise RuntimeError("SyncSession is not connected")
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("SyncSession called from its own loop thread (e.g. a notification handler)")
+        future = asyncio.run_coroutine_threadsafe(coro, self._loop)
+        try:
+            # The session enforces its own timeout; this only guards a stuck loop
+            return future.result(None if timeout is None else timeout + 5.0)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"No response from {self.server_url} within {timeout} s") from None
+
+    def request(self, method, params=None, timeout=None):
+        timeout = timeout or self.timeout
+        return self._run(self.session.request(method, params, timeout), timeout)
+
+    def notify(self, method, params=None):
+        return self._run(self.session.notify(method, params), self.timeout)
+
+    def call_tool(self, name, arguments=None, use_cache=True):
+        return self._run(self.session.call_tool(name, arguments, use_cache), self.timeout)
+
+    # The methods below may make several requests (pages, subscribe then read);
+    # each request has the session's timeout, so the whole call gets no deadline of its own
+
+    def list_tools(self):
+        return self._run(self.session.list_tools())
+
+    def find_tool(self, name):
+        return self._run(self.session.find_tool(name))
+
+    def list_resources(self):
+        return self._run(self.session.list_resources())
+
+    def read_resource(self, uri, use_cache=True):
+        return self._run(self.session.read_resource(uri, use_cache))
+
+    def list_prompts(self):
+        return self._run(self.session.list_prompts())
+
+    def on_notification(self, handler):
+        self._loop.call_soon_threadsafe(self.session.on_notification, handler)
+        return handler
+
+    @property
+    def connected(self):
+        return self.session is not None and self.session.connected
+
+    def close(self):
+        with self._lock:
+            if self._loop is None:
+                return
+            if self.session is not None:
+                try:
+                    self._run(self.session.close(), self.timeout)
+                finally:
+                    self.session = None
+        self._stop_loop()
+
+    def _stop_loop(self):
+        loop, thread = self._loop, self._thread
+        self._loop = self._thread = None
+        if loop is None:
+            return
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
@@ -0,0 +1,105 @@
+import asyncio
+import json
+
+from toolshed_mcp.batch import BatchRunner, read_checkpoint
+from toolshed_mcp.session import MCPError
+
+
+class StubSession:
+    connected = True
+
+    def __init__(self, calls, failing):
+        self.calls = calls
+        self.failing = failing
+        self.cache = None
+
+    async def call_tool(self, name, arguments):
+        self.calls.append(arguments["n"])
+        if arguments["n"] in self.failing:
+            raise MCPError(-32000, "tool failed")
+        return {"n": arguments["n"]}
+
+    async def close(self):
+        pass
+
+
+class StubDiscovery:
+    def __init__(self, failing=()):
+        self.calls = []
+        self.failing = set(failing)
+
+    async def connect(self, server, timeout=None, validate=True):
+        return StubSession(self.calls, self.failing)
+
+
+def write_input(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+
+def call(n):
+    return json.dumps({"server": "http://stub", "tool": "echo", "arguments": {"n": n}})
+
+
+def run_batch(tmp_path, discovery, retry_errors=False):
+    async def run():
+        async with BatchRunner(str(tmp_path / "out.jsonl"), discovery=discovery, validate=False,
+                               retry_errors=retry_errors) as runner:
+            return await runner.run(str(tmp_path / "in.jsonl"))
+
+    return asyncio.run(run())
+
+
+def records(tmp_path):
+    with open(tmp_path / "out.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_torn_last_record_is_truncated(tmp_path):
+    out = tmp_path / "out.jsonl"
+    out.write_bytes(b'{"line":1,"result":{}}\n{"line":2,"error":{}}\nnot json\n{"line":3,"res')
+    assert read_checkpoint(str(out)) == {1, 2}
+    assert out.read_bytes() == b'{"line":1,"result":{}}\n{"line":2,"error":{}}\nnot json\n'
+    assert read_checkpoint(str(out), retry_errors=True) == {1}
+    assert read_checkpoint(str(tmp_path / "missing.jsonl")) == set()
+
+
+def test_resume_skips_finished_lines(tmp_path):
+    write_input(tmp_path / "in.jsonl", [call(1), call(2), "", call(3)])
+    # A previous run finished line 1 and crashed while writing line 2's record
+    (tmp_path / "out.jsonl").write_text('{"line":1,"result":{"n":1}}\n{"line":2,"re', encoding="utf-8")
+
+    discovery = StubDiscovery()
+    report = run_batch(tmp_path, discovery)
+    assert sorted(discovery.calls) == [2, 3]
+    assert report.summary()["lines"] == 3 and report.skipped == 1 and report.ok == 2
+    assert sorted(record["line"] for record in records(tmp_path)) == [1, 2, 4]
+
+
+def test_retry_errors_reruns_failed_lines(tmp_path):
+    write_input(tmp_path / "in.jsonl", [call(1), call(2)])
+    discovery = StubDiscovery(failing={2})
+    report = run_batch(tmp_path, discovery)
+    assert report.ok == 1 and report.errors == 1
+    assert [r["error"]["type"] for r in records(tmp_path) if "error" in r] == ["MCPError"]
+
+    # Without retry_errors the failed line counts as finished
+    discovery = StubDiscovery()
+    assert run_batch(tmp_path, discovery).skipped == 2 and discovery.calls == []
+
+    report = run_batch(tmp_path, discovery, retry_errors=True)
+    assert discovery.calls == [2] and report.skipped == 1 and report.ok == 1
+    # The newest record for the line wins, so a later plain run skips it too
+    assert read_checkpoint(str(tmp_path / "out.jsonl"), retry_errors=True) == {1, 2}
+
+
+def test_bad_lines_are_recorded_as_errors(tmp_path):
+    write_input(tmp_path / "in.jsonl", ["{not json", "[1, 2]", json.dumps({"tool": "echo"}), call(4)])
+    discovery = StubDiscovery()
+    report = run_batch(tmp_path, discovery)
+    assert discovery.calls == [4]
+    assert report.errors == 3 and report.ok == 1
+    errors = {r["line"]: r["error"] for r in records(tmp_path) if "error" in r}
+    assert sorted(errors) == [1, 2, 3]
+    assert errors[1]["type"] == "JSONDecodeError"
+    assert errors[2]["message"] == "Line is not a JSON object"
+    assert "server" in errors[3]["message"]
@@ -0,0 +1,30 @@
+from toolshed_mcp.cache import ResourceCache
+
+RESULT = {"contents": [{"uri": "file:///a.txt", "text": "old"}]}
+
+
+def test_entries_are_per_server_url():
+    cache = ResourceCache()
+    cache.put("http://10.0.0.1:8000", "file:///a.txt", RESULT, subscribed=True)
+    assert cache.get("http://10.0.0.1:8000", "file:///a.txt") == RESULT
+    assert cache.get("http://10.0.0.2:8000", "file:///a.txt") is None
+
+
+def test_update_during_read_is_not_cached():
+    cache = ResourceCache()
+    generation = cache.generation("http://a", "file:///a.txt")
+    cache.invalidate("http://a", "file:///a.txt")
+    cache.put("http://a", "file:///a.txt", RESULT, subscribed=True, generation=generation)
+    assert cache.get("http://a", "file:///a.txt") is None
+
+    generation = cache.generation("http://a", "file:///a.txt")
+    cache.put("http://a", "file:///a.txt", RESULT, subscribed=True, generation=generation)
+    assert cache.get("http://a", "file:///a.txt") == RESULT
+
+
+def test_stream_close_during_read_is_not_cached():
+    cache = ResourceCache()
+    generation = cache.generation("http://a", "file:///a.txt")
+    cache.invalidate_subscribed("http://a")
+    cache.put("http://a", "file:///a.txt", RESULT, subscribed=True, generation=generation)
+    assert cache.get("http://a", "file:///a.txt") is None
@@ -0,0 +1,105 @@
+import asyncio
+
+from toolshed_mcp.fleet import FleetClient, HashRing
+
+KEYS = [f"key-{i}" for i in range(10000)]
+
+
+def owners(ring):
+    return {key: ring.node_for(key) for key in KEYS}
+
+
+def test_adding_a_node_moves_about_one_nth_of_keys():
+    ring = HashRing([f"http://r{i}" for i in range(4)])
+    before = owners(ring)
+    ring.add("http://r4")
+    after = owners(ring)
+    moved = [key for key in KEYS if before[key] != after[key]]
+    # Only keys taken by the new node move, about 1/5 of them
+    assert all(after[key] == "http://r4" for key in moved)
+    assert 0.12 < len(moved) / len(KEYS) < 0.28
+
+
+def test_removing_a_node_moves_only_its_keys():
+    ring = HashRing([f"http://r{i}" for i in range(5)])
+    before = owners(ring)
+    ring.remove("http://r2")
+    after = owners(ring)
+    moved = [key for key in KEYS if before[key] != after[key]]
+    assert moved == [key for key in KEYS if before[key] == "http://r2"]
+    assert 0.12 < len(moved) / len(KEYS) < 0.28
+    assert "http://r2" not in ring and len(ring) == 4
+
+
+def test_route_spills_over_past_the_load_bound():
+    fleet = FleetClient([f"http://r{i}" for i in range(3)], load_factor=1.25)
+    home = fleet.route("tool:{}")
+    assert fleet.route("tool:{}") is home
+
+    for replica in fleet.replicas.values():
+        replica.in_flight = 2
+    # Load 3 against an average of (3 + 2 + 2 + 1) / 3: capacity ceil(1.25 * 8 / 3) = 4, so it stays
+    home.in_flight = 3
+    assert fleet.route("tool:{}") is home
+
+    # Load 4 reaches capacity ceil(1.25 * 9 / 3) = 4: the call goes to the next replica on the ring
+    home.in_flight = 4
+    spill = fleet.route("tool:{}")
+    assert spill is not home
+    assert spill.url == [url for url in fleet.ring.iter_nodes("tool:{}") if url != home.url][0]
+
+
+class StubSession:
+    connected = True
+
+    def __init__(self):
+        self.closed = False
+
+    async def close(self):
+        self.closed = True
+
+
+def test_remove_replica_waits_for_in_flight_calls():
+    async def run():
+        fleet = FleetClient(["http://r0", "http://r1"])
+        replica = fleet.route("k")
+        session = replica.session = StubSession()
+        release = asyncio.Event()
+        finished = []
+
+        async def slow(session):
+            await release.wait()
+            finished.append(session)
+            return "done"
+
+        call = asyncio.ensure_future(fleet._run("k", slow))
+        await asyncio.sleep(0)
+        assert replica.in_flight == 1
+
+        removal = asyncio.ensure_future(fleet.remove_replica(replica.url))
+        await asyncio.sleep(0.05)
+        # Draining: off the ring and out of routing, but not closed yet
+        assert not removal.done() and not session.closed
+        assert replica.url not in fleet.ring
+        assert fleet.route("k").url != replica.url
+
+        release.set()
+        assert await call == "done"
+        await removal
+        assert finished == [session] and session.closed
+        assert replica.url not in fleet.replicas
+
+    asyncio.run(run())
+
+
+def test_remove_replica_gives_up_after_drain_timeout():
+    async def run():
+        fleet = FleetClient(["http://r0"])
+        replica = fleet.replicas["http://r0"]
+        session = replica.session = StubSession()
+        replica.in_flight = 1
+        replica.idle.clear()
+        await fleet.remove_replica("http://r0", drain_timeout=0.05)
+        assert session.closed and not fleet.replicas
+
+    asyncio.run(run())
@@ -0,0 +1,21 @@
+from toolshed_mcp.health import DEGRADED, DOWN, HEALTHY, HealthMonitor
+
+URL = "http://10.0.0.1:8000"
+
+
+def test_call_outcomes_do_not_count_as_latency():
+    monitor = HealthMonitor([URL], max_latency=1.0)
+    monitor.record(URL, 0.05)
+    for _ in range(4):
+        monitor.record(URL, None, ok=True)
+    assert monitor.status(URL) == HEALTHY
+    assert monitor.table[URL].latency == 0.05
+
+
+def test_slow_probes_degrade_and_failures_take_down():
+    monitor = HealthMonitor([URL], max_latency=1.0, down_after=3)
+    monitor.record(URL, 1.5)
+    assert monitor.status(URL) == DEGRADED
+    for _ in range(3):
+        monitor.record(URL, None, ok=False, error="refused")
+    assert monitor.status(URL) == DOWN
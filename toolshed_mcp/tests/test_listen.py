@@ -0,0 +1,38 @@
+import pytest
+
+from toolshed_mcp.listen import EventDecoder
+
+STREAM = ("event: endpoint{nl}data: /messages/?session_id=1{nl}{nl}"
+          ": ping - 2025-01-01 00:00:00{nl}{nl}"
+          'data: {{"jsonrpc":"2.0","method":"notifications/progress","params":{{"progress":1}}}}{nl}{nl}'
+          'event: message{nl}data: {{"jsonrpc":"2.0","id":7,"result":{{}}}}{nl}{nl}')
+
+
+def decode(chunks):
+    decoder = EventDecoder(keep_data=True)
+    return [(r.kind, r.method, r.id, r.raw) for chunk in chunks for r in decoder.feed(chunk)]
+
+
+@pytest.mark.parametrize("nl", ["\r\n", "\n", "\r"])
+def test_line_endings(nl):
+    events = decode([STREAM.format(nl=nl).encode()])
+    assert [(kind, method, request_id) for kind, method, request_id, _ in events] == [
+        ("endpoint", None, None),
+        ("message", "notifications/progress", None),
+        ("message", None, 7),
+    ]
+    assert events[0][3] == b"/messages/?session_id=1"
+
+
+@pytest.mark.parametrize("nl", ["\r\n", "\n", "\r"])
+def test_every_chunk_boundary(nl):
+    data = STREAM.format(nl=nl).encode()
+    expected = decode([data])
+    for cut in range(1, len(data)):
+        assert decode([data[:cut], data[cut:]]) == expected
+    assert decode([data[i:i + 1] for i in range(len(data))]) == expected
+
+
+def test_bare_cr_stream_completes_without_more_input():
+    assert decode([b"event: endpoint\rdata: /messages/?session_id=1\r\r"]) == [
+        ("endpoint", None, None, b"/messages/?session_id=1")]
@@ -0,0 +1,134 @@
+import asyncio
+import json
+
+from toolshed_mcp.replay import REQUEST, START, ReplayServer, read_records
+from toolshed_mcp.session import MCPSession
+
+TOOLS = [{"name": "echo", "description": "Echo text",
+          "inputSchema": {"type": "object", "properties": {"text": {"type": "string"}}}}]
+
+
+class FakeServer:
+    """Just enough of an MCP SSE server: one session, echo tool"""
+
+    def __init__(self, delay=0.0):
+        self.queue = asyncio.Queue()
+        self.requests = []
+        self.delay = delay
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, "127.0.0.1", 0)
+        self.url = f"http://127.0.0.1:{self.server.sockets[0].getsockname()[1]}"
+
+    async def stop(self):
+        self.server.close()
+        self.queue.put_nowait(None)
+        await self.server.wait_closed()
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                head = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+                method, path, _ = head.split(" ", 2)
+                if method == "GET":
+                    await self.stream(writer)
+                    return
+                length = int(head.lower().split("content-length:")[1].split("\r\n")[0])
+                message = json.loads(await reader.readexactly(length))
+                self.requests.append(message)
+                writer.write(b"HTTP/1.1 202 Accepted\r\nContent-Length: 8\r\n\r\nAccepted")
+                await writer.drain()
+                if "id" in message:
+                    answer = {"jsonrpc": "2.0", "id": message["id"], "result": self.answer(message)}
+                    delay = self.delay if message["method"] == "tools/list" else 0.0
+                    asyncio.get_running_loop().call_later(delay, self.queue.put_nowait, answer)
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def stream(self, writer):
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nConnection: close\r\n\r\n"
+                     b"event: endpoint\r\ndata: /messages/?session_id=abc123\r\n\r\n")
+        await writer.drain()
+        while True:
+            message = await self.queue.get()
+            if message is None:
+                return
+            writer.write(f"event: message\r\ndata: {json.dumps(message)}\r\n\r\n".encode())
+            await writer.drain()
+
+    @staticmethod
+    def answer(message):
+        if message["method"] == "initialize":
+            return {"protocolVersion": "2024-11-05", "serverInfo": {"name": "fake", "version": "1.0"},
+                    "capabilities": {"tools": {}}}
+        if message["method"] == "tools/list":
+            return {"tools": TOOLS}
+        text = message["params"]["arguments"]["text"]
+        return {"content": [{"type": "text", "text": text}]}
+
+
+async def exercise(url, record=None):
+    async with MCPSession(url, timeout=5, record=record) as session:
+        await session.initialize()
+        return session.server_info, await session.list_tools(), [
+            await session.call_tool("echo", {"text": text}, use_cache=False) for text in ("one", "two ✓")
+        ]
+
+
+def test_record_then_replay(tmp_path):
+    path = str(tmp_path / "session.rec")
+
+    async def run():
+        fake = FakeServer()
+        await fake.start()
+        try:
+            recorded = await exercise(fake.url, record=path)
+        finally:
+            await fake.stop()
+        sent = len(fake.requests)
+
+        # The original server is gone; the replay answers the same calls on its own
+        async with ReplayServer(path, speed=None) as replay:
+            replayed = await asyncio.wait_for(exercise(replay.url), 5)
+        return recorded, replayed, sent
+
+    recorded, replayed, sent = asyncio.run(run())
+    assert recorded[0] == {"name": "fake", "version": "1.0"}
+    assert recorded[2][1]["content"][0]["text"] == "two ✓"
+    assert replayed == recorded
+
+    kinds = [kind for kind, _, _, _ in read_records(path)]
+    assert kinds[0] == START
+    # The event stream plus one POST per message the client sent
+    assert kinds.count(REQUEST) == sent + 1
+
+
+def test_replay_at_recorded_speed_keeps_the_gaps(tmp_path):
+    path = str(tmp_path / "session.rec")
+
+    async def run():
+        fake = FakeServer(delay=0.2)
+        await fake.start()
+        try:
+            async with MCPSession(fake.url, timeout=5, record=path) as session:
+                await session.initialize()
+                await session.list_tools()
+        finally:
+            await fake.stop()
+
+        loop = asyncio.get_running_loop()
+        timings = {}
+        for speed in (None, 1.0):
+            async with ReplayServer(path, speed=speed) as replay:
+                async with MCPSession(replay.url, timeout=5) as session:
+                    await session.initialize()
+                    started = loop.time()
+                    assert await session.list_tools() == TOOLS
+                    timings[speed] = loop.time() - started
+        return timings
+
+    timings = asyncio.run(run())
+    # The server took 0.2 s to answer tools/list in the recording
+    assert timings[1.0] >= 0.15 > timings[None]
@@ -0,0 +1,55 @@
+import asyncio
+import json
+
+from toolshed_mcp.scan import IncrementalScanner, match_path
+
+FILES = {"a.py": b"x = 1\n", "pkg/b.py": b"y = 2\n"}
+
+
+class StubBackend:
+    """call_tool returning one finding per submitted file, under the given directory"""
+
+    server_key = "stub"
+
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.submitted = []
+
+    async def call_tool(self, tool, arguments):
+        names = [f["filename"] for f in arguments["code_files"]]
+        self.submitted.append(names)
+        results = [{"check_id": "rule", "path": self.prefix + name, "start": {"line": 1}, "end": {"line": 1}}
+                   for name in names]
+        return {"content": [{"type": "text", "text": json.dumps({"results": results, "errors": []})}]}
+
+
+def scan(backend, index_path):
+    scanner = IncrementalScanner(backend, str(index_path))
+    return asyncio.run(scanner.scan(sorted(FILES), FILES.__getitem__))
+
+
+def test_match_path():
+    known = {"a.py", "pkg/b.py", "b.py"}
+    assert match_path("a.py", known) == "a.py"
+    assert match_path("/tmp/semgrep_scan_xyz/pkg/b.py", known) == "pkg/b.py"
+    assert match_path("/tmp/semgrep_scan_xyz/c.py", known) is None
+    assert match_path(None, known) is None
+
+
+def test_temp_dir_paths_are_matched_and_reused(tmp_path):
+    backend = StubBackend("/tmp/semgrep_scan_xyz/")
+    first = scan(backend, tmp_path / "index.json")
+    assert [f["path"] for f in first.findings] == ["a.py", "pkg/b.py"]
+    second = scan(backend, tmp_path / "index.json")
+    assert [f["path"] for f in second.findings] == ["a.py", "pkg/b.py"]
+    assert second.reused == ["a.py", "pkg/b.py"]
+    assert len(backend.submitted) == 1
+
+
+def test_unmatched_findings_keep_files_out_of_the_index(tmp_path):
+    backend = StubBackend("/elsewhere-")
+    first = scan(backend, tmp_path / "index.json")
+    assert len(first.findings) == 2
+    second = scan(backend, tmp_path / "index.json")
+    assert len(second.findings) == 2
+    assert second.scanned == ["a.py", "pkg/b.py"]
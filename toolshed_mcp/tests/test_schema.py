@@ -0,0 +1,107 @@
+import pytest
+
+from toolshed_mcp.schema import ValidationError, ValidatorCache, compile_schema
+
+
+def errors(schema, value):
+    return compile_schema(schema)(value)
+
+
+def test_type_and_required():
+    schema = {"type": "object", "properties": {"text": {"type": "string"}}, "required": ["text"]}
+    assert errors(schema, {"text": "hi"}) == []
+    assert errors(schema, {}) == [("", "missing required property 'text'")]
+    assert errors(schema, {"text": 1}) == [("text", "expected string, got int")]
+    assert errors(schema, []) == [("", "expected object, got list")]
+
+
+def test_integer_accepts_integral_floats_but_not_bools():
+    assert errors({"type": "integer"}, 3.0) == []
+    assert errors({"type": "integer"}, 3.5) != []
+    assert errors({"type": "integer"}, True) != []
+
+
+def test_unknown_type_name_accepts_anything():
+    assert errors({"type": ["string", "foo"]}, 1) == []
+    assert errors({"type": "foo"}, {"a": 1}) == []
+    assert errors({"type": ["string", "null"]}, 1) == [("", "expected string or null, got int")]
+
+
+def test_additional_properties_false():
+    schema = {"properties": {"a": {}}, "additionalProperties": False}
+    assert errors(schema, {"a": 1}) == []
+    assert errors(schema, {"a": 1, "b": 2}) == [("", "unexpected property 'b'")]
+
+
+def test_additional_properties_schema():
+    schema = {"properties": {"a": {}}, "additionalProperties": {"type": "integer"}}
+    assert errors(schema, {"b": 2}) == []
+    assert errors(schema, {"b": "x"}) == [("b", "expected integer, got str")]
+
+
+def test_pattern_properties_are_not_additional():
+    schema = {"patternProperties": {"^x-": {"type": "string"}}, "additionalProperties": False}
+    assert errors(schema, {"x-foo": "bar"}) == []
+    assert errors(schema, {"x-foo": 1}) == [("x-foo", "expected string, got int")]
+    assert errors(schema, {"y": "bar"}) == [("", "unexpected property 'y'")]
+
+
+def test_invalid_pattern_property_disables_additional_check():
+    schema = {"patternProperties": {"(": {}}, "additionalProperties": False}
+    assert errors(schema, {"anything": 1}) == []
+
+
+def test_local_ref_and_recursion():
+    schema = {
+        "$defs": {"node": {"type": "object", "properties": {
+            "name": {"type": "string"},
+            "children": {"type": "array", "items": {"$ref": "#/$defs/node"}},
+        }}},
+        "$ref": "#/$defs/node",
+    }
+    assert errors(schema, {"name": "a", "children": [{"name": "b", "children": []}]}) == []
+    assert errors(schema, {"name": "a", "children": [{"name": 2}]}) == [
+        ("children[0].name", "expected string, got int")]
+
+
+def test_remote_and_dangling_refs_accept():
+    assert errors({"$ref": "https://example.com/schema.json"}, 1) == []
+    assert errors({"$ref": "#/$defs/missing"}, 1) == []
+
+
+def test_one_of():
+    schema = {"oneOf": [{"type": "integer"}, {"type": "number", "minimum": 0}]}
+    assert errors(schema, 1.5) == []
+    assert errors(schema, -2) == []
+    assert errors(schema, 2) == [("", "must match exactly one of 2 schemas")]
+    assert errors(schema, -1.5) == [("", "must match exactly one of 2 schemas")]
+
+
+def test_any_of_and_not():
+    assert errors({"anyOf": [{"type": "string"}, {"type": "null"}]}, None) == []
+    assert errors({"anyOf": [{"type": "string"}, {"type": "null"}]}, 1) != []
+    assert errors({"not": {"type": "string"}}, 1) == []
+    assert errors({"not": {"type": "string"}}, "x") == [("", "must not match the 'not' schema")]
+
+
+def test_unknown_keywords_are_ignored():
+    assert errors({"unevaluatedProperties": False, "x-custom": 1}, {"a": 1}) == []
+
+
+def test_validator_cache_raises_for_listed_tools_only():
+    cache = ValidatorCache()
+    cache.update([{"name": "echo", "inputSchema": {"type": "object", "properties": {"text": {"type": "string"}}}}])
+    cache.check("echo", {"text": "hi"})
+    cache.check("unknown", {"text": 1})
+    with pytest.raises(ValidationError) as info:
+        cache.check("echo", {"text": 1})
+    assert info.value.errors == [("text", "expected string, got int")]
+
+
+def test_tuples_are_arrays():
+    schema = {"type": "array", "items": {"type": "integer"}, "minItems": 2}
+    assert errors(schema, (1, 2)) == []
+    assert errors(schema, (1, "x")) == [("[1]", "expected integer, got str")]
+    assert errors(schema, (1,)) == [("", "needs at least 2 items")]
+    assert errors({"enum": [[1, 2]]}, (1, 2)) == []
+    assert errors({"const": {"a": [1]}}, {"a": (1,)}) == []
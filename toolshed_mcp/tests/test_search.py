@@ -0,0 +1,83 @@
+from toolshed_mcp.search import ToolIndex
+
+
+def tool(name, description="", *properties):
+    return {"name": name, "description": description,
+            "inputSchema": {"type": "object", "properties": {p: {"type": "string"} for p in properties}}}
+
+
+AWS = [
+    tool("list_s3_buckets", "List the S3 buckets in an account", "region"),
+    tool("describe_ec2_instances", "Describe running EC2 instances", "instanceIds"),
+    tool("get_cost_report", "Monthly spend per service", "month"),
+]
+DOCS = [
+    tool("search_documentation", "Full text search of the AWS documentation", "query"),
+    tool("read_page", "Fetch one documentation page as markdown", "url"),
+]
+
+
+def names(results):
+    return [(result["server"], result["name"]) for result in results]
+
+
+def build(path=None):
+    index = ToolIndex(str(path) if path else None)
+    index.update("aws", AWS)
+    index.update("docs", DOCS)
+    return index
+
+
+def test_exact_prefix_and_typo_matches():
+    index = build()
+    assert names(index.search("buckets"))[0] == ("aws", "list_s3_buckets")
+    assert names(index.search("instanceIds"))[0] == ("aws", "describe_ec2_instances")
+    # Search as you type: a prefix of an indexed term
+    assert names(index.search("docum"))[0] == ("docs", "search_documentation")
+    # One typo, only once exact and prefix lookups find nothing
+    assert names(index.search("bukcets"))[0] == ("aws", "list_s3_buckets")
+    assert names(index.search("documantation"))[0] == ("docs", "search_documentation")
+    assert index.search("zzzzqqq") == []
+    assert names(index.search("documentation", server="aws")) == []
+
+
+def test_scores_rank_name_above_description():
+    index = build()
+    results = index.search("documentation page")
+    assert names(results)[0] == ("docs", "read_page")
+    assert results[0]["score"] >= results[-1]["score"]
+
+
+def test_update_replaces_and_removes_tools():
+    index = build()
+    counts = index.update("aws", [
+        tool("list_s3_buckets", "List the S3 buckets in an account", "region"),
+        tool("describe_ec2_instances", "Describe virtual machines", "instanceIds"),
+    ])
+    assert counts == {"added": 0, "changed": 1, "removed": 1, "unchanged": 1}
+    assert len(index) == 4 and index.dirty
+    # The replaced description and the removed tool no longer match
+    assert index.search("running") == []
+    assert index.search("spend") == []
+    assert names(index.search("virtual machines")) == [("aws", "describe_ec2_instances")]
+
+    index.remove_server("docs")
+    assert index.servers() == ["aws"]
+    assert index.search("markdown") == []
+
+
+def test_save_and_load_give_the_same_results(tmp_path):
+    path = tmp_path / "index.json.gz"
+    index = build(path)
+    index.update("aws", AWS[:2])
+    queries = ["buckets", "docum", "bukcets", "documentation page", "ec2", "cost"]
+    before = {query: index.search(query) for query in queries}
+    index.save()
+    assert not index.dirty and not list(tmp_path.glob(".*.tmp"))
+
+    loaded = ToolIndex(str(path))
+    assert len(loaded) == len(index) == 4
+    assert loaded.servers() == ["aws", "docs"]
+    assert {query: loaded.search(query) for query in queries} == before
+    # Digests survive the round trip, so an unchanged catalog is not re-indexed
+    assert loaded.update("docs", DOCS)["unchanged"] == 2 and not loaded.dirty
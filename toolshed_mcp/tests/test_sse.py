@@ -0,0 +1,38 @@
+import asyncio
+
+from toolshed_mcp.session import iter_lines, iter_sse
+
+
+def split(chunks):
+    async def source():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [line async for line in iter_lines(source())]
+
+    return asyncio.run(collect())
+
+
+def test_line_endings_split_across_chunks():
+    assert split([b"data: a\r", b"\n\r\n", b"data: b\rdata: c\n\n"]) == ["data: a", "", "data: b", "data: c", ""]
+
+
+def test_multibyte_character_split_across_chunks():
+    data = "data: café ✓\n".encode()
+    assert split([data[:10], data[10:12], data[12:]]) == ["data: café ✓"]
+
+
+def test_unterminated_last_line_is_kept():
+    assert split([b"data: x\r\n", b"data: y\r"]) == ["data: x", "data: y"]
+    assert split([b"data: x"]) == ["data: x"]
+
+
+def test_events_from_crlf_stream():
+    async def collect():
+        async def source():
+            yield b"event: endpoint\r\ndata: /messages/?session_id=1\r\n\r\n: ping\r\n\r\ndata: {}\r\n\r\n"
+
+        return [pair async for pair in iter_sse(iter_lines(source()))]
+
+    assert asyncio.run(collect()) == [("endpoint", "/messages/?session_id=1"), ("message", "{}")]
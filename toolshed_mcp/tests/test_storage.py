@@ -0,0 +1,44 @@
+import json
+import os
+import threading
+
+import pytest
+
+from toolshed_mcp.discovery import DiscoveryCache
+from toolshed_mcp.storage import atomic_write
+
+
+def test_concurrent_writers_leave_a_valid_file(tmp_path):
+    path = tmp_path / "state.json"
+
+    def write(n):
+        for i in range(50):
+            atomic_write(str(path), lambda f: json.dump({"writer": n, "i": i}, f))
+
+    threads = [threading.Thread(target=write, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert json.loads(path.read_text())["i"] == 49
+    assert os.listdir(tmp_path) == ["state.json"]
+
+
+def test_failed_write_keeps_the_old_file(tmp_path):
+    path = tmp_path / "state.json"
+    path.write_text("old")
+
+    def fail(f):
+        f.write("partial")
+        raise ValueError("boom")
+
+    with pytest.raises(ValueError):
+        atomic_write(str(path), fail)
+    assert path.read_text() == "old"
+    assert os.listdir(tmp_path) == ["state.json"]
+
+
+def test_corrupt_discovery_cache_is_empty(tmp_path):
+    path = tmp_path / "discovery.json"
+    path.write_text('{"torn')
+    assert DiscoveryCache(str(path)).entries == {}
@@ -0,0 +1,84 @@
+import asyncio
+import gzip
+import json
+
+import pytest
+
+from toolshed_mcp.stream import FileText, StreamedBody, has_iterators, has_streams, iter_json
+
+TEXT = 'line "one"\n\ttab \\ backslash \x00\x1f ctrl é ✓ 😀   end'
+
+
+def compact(value):
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def encode(value, chunk_bytes=8):
+    return b"".join(iter_json(value, chunk_bytes)).decode("utf-8")
+
+
+def collect(body):
+    async def run():
+        return b"".join([chunk async for chunk in body])
+
+    return asyncio.run(run())
+
+
+@pytest.fixture
+def source(tmp_path):
+    path = tmp_path / "source.py"
+    path.write_text(TEXT * 20, encoding="utf-8", newline="")
+    return path
+
+
+@pytest.mark.parametrize("chunk_chars", [1, 2, 3, 7, 64 * 1024])
+def test_file_text_escapes_match_json_dumps(source, chunk_chars):
+    value = {"code_files": [{"filename": "a.py", "content": FileText(str(source), chunk_chars=chunk_chars)}]}
+    assert encode(value) == compact({"code_files": [{"filename": "a.py", "content": TEXT * 20}]})
+
+
+@pytest.mark.parametrize("chunk_bytes", [1, 3, 5, 64])
+def test_chunks_are_whole_utf8(source, chunk_bytes):
+    value = {"text": TEXT, "file": FileText(str(source), chunk_chars=3)}
+    chunks = list(iter_json(value, chunk_bytes))
+    for chunk in chunks:
+        chunk.decode("utf-8")
+    assert json.loads(b"".join(chunks)) == {"text": TEXT, "file": TEXT * 20}
+
+
+def test_iterators_tuples_and_scalars():
+    value = {"items": (i for i in range(3)), "pair": (1, "b"), "nested": [[], {}, (None,)],
+             "scalars": [True, False, None, 1.5, -2, "ü"], 3: "key"}
+    assert encode(value) == compact({"items": [0, 1, 2], "pair": [1, "b"], "nested": [[], {}, [None]],
+                                     "scalars": [True, False, None, 1.5, -2, "ü"], "3": "key"})
+
+
+def test_nan_is_rejected():
+    with pytest.raises(ValueError):
+        encode({"x": float("nan")})
+
+
+def test_stream_detection(source):
+    assert has_streams({"a": [FileText(str(source))]})
+    assert not has_iterators({"a": [FileText(str(source))]})
+    assert has_streams({"a": iter([1])}) and has_iterators({"a": (x for x in [1])})
+    assert not has_streams({"a": ["text", 1, None, (2,)]})
+
+
+def test_streamed_body_counts_raw_and_wire_bytes(source):
+    payload = {"content": FileText(str(source)), "items": [1, 2]}
+    expected = compact({"content": TEXT * 20, "items": [1, 2]}).encode()
+
+    body = StreamedBody(payload)
+    assert collect(body) == expected
+    assert body.raw_bytes == body.wire_bytes == len(expected)
+
+    body = StreamedBody(payload, encoding="gzip", chunk_bytes=100)
+    wire = collect(body)
+    assert gzip.decompress(wire) == expected
+    assert body.raw_bytes == len(expected)
+    assert body.wire_bytes == len(wire) < len(expected)
+
+    # Re-iterating re-encodes and resets the counters, so the body can be resent
+    assert gzip.decompress(collect(body)) == expected
+    assert body.raw_bytes == len(expected)
@@ -0,0 +1,121 @@
+"""
+Peak memory of uploading a code bundle, streamed versus built in memory
+
+run_uploads() writes 1 MB source files up to the largest size, then, for
+each size and mode, uploads them in a fresh interpreter to a local sink
+that discards the body, and reports that process's peak RSS over its
+baseline. 'stream' sends the files as FileText values through a
+StreamedBody; 'buffered' reads them into a payload dict and posts it as
+one JSON body, the way the old scripts did.
+"""
+import asyncio
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+MODES = ("stream", "buffered")
+
+
+def write_sources(directory, megabytes):
+    """Write megabytes 1 MB Python files into directory"""
+    line = "def handler(event, context):  # a typical line of source code\n"
+    block = line * (1024 * 1024 // len(line))
+    for i in range(megabytes):
+        with open(os.path.join(directory, f"module_{i:04d}.py"), "w", encoding="utf-8") as f:
+            f.write(block)
+
+
+def run_uploads(sizes, modes=MODES):
+    """Yield one record per (size in MB, mode), each measured in its own interpreter"""
+    sizes = sorted(sizes)
+    directory = tempfile.mkdtemp(prefix="toolshed-upload-")
+    try:
+        write_sources(directory, sizes[-1])
+        for size in sizes:
+            for mode in modes:
+                output = subprocess.run(
+                    [sys.executable, "-m", "toolshed_mcp.uploadbench", mode, directory, str(size)],
+                    check=True, capture_output=True, text=True,
+                ).stdout
+                yield json.loads(output)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+async def _discard(reader, writer):
+    # Minimal HTTP/1.1 sink: read one request, chunked or sized, and answer 202
+    head = (await reader.readuntil(b"\r\n\r\n")).lower()
+    if b"transfer-encoding: chunked" in head:
+        while True:
+            size = int((await reader.readline()).split(b";")[0], 16)
+            last = size == 0
+            while size:
+                size -= len(await reader.read(min(size, 1 << 16)))
+            await reader.readline()
+            if last:
+                break
+    else:
+        length = int(head.split(b"content-length:")[1].split(b"\r\n")[0])
+        while length:
+            length -= len(await reader.read(min(length, 1 << 16)))
+    writer.write(b"HTTP/1.1 202 Accepted\r\nContent-Length: 0\r\n\r\n")
+    await writer.drain()
+    writer.close()
+
+
+async def _post(paths, mode):
+    import httpx
+
+    from .scan import scan_arguments
+    from .stream import FileText, StreamedBody
+
+    server = await asyncio.start_server(_discard, "127.0.0.1", 0)
+    url = f"http://127.0.0.1:{server.sockets[0].getsockname()[1]}/messages/"
+    try:
+        async with httpx.AsyncClient(timeout=300) as client:
+            if mode == "stream":
+                files = {os.path.basename(path): FileText(path) for path in paths}
+                payload = {"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                           "params": {"name": "semgrep_scan", "arguments": scan_arguments(files)}}
+                body = StreamedBody(payload)
+                await client.post(url, content=body, headers={"Content-Type": "application/json"})
+                return body.raw_bytes
+            files = {}
+            for path in paths:
+                with open(path, "r", encoding="utf-8") as f:
+                    files[os.path.basename(path)] = f.read()
+            payload = {"jsonrpc": "2.0", "id": 1, "method": "tools/call",
+                       "params": {"name": "semgrep_scan", "arguments": scan_arguments(files)}}
+            response = await client.post(url, json=payload)
+            return int(response.request.headers["content-length"])
+    finally:
+        server.close()
+
+
+def upload(directory, megabytes, mode):
+    """Upload the first megabytes files of directory in this process and measure it"""
+    import resource
+
+    from .metrics import rss_bytes
+
+    if mode not in MODES:
+        raise ValueError(f"Unknown upload mode {mode!r}, expected one of {MODES}")
+    paths = [os.path.join(directory, path) for path in sorted(os.listdir(directory))[:megabytes]]
+    baseline = rss_bytes()
+    started = time.perf_counter()
+    sent = asyncio.run(_post(paths, mode))
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == "darwin" else 1024)
+    return {
+        "mode": mode,
+        "payload_mb": round(sent / 1024 / 1024, 1),
+        "peak_rss_mb": round((peak - baseline) / 1024 / 1024, 1),
+        "seconds": round(time.perf_counter() - started, 2),
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(upload(sys.argv[2], int(sys.argv[3]), sys.argv[1])))